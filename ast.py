@@ -7,6 +7,7 @@ import sys
 import os
 
 from collections import namedtuple
+from cStringIO import StringIO
 from pprint import pprint
 
 import astparse
@@ -86,6 +87,8 @@ class ASTNode(object):
 
     self.rule_vals = OrderedDict(zip((label.lower() for label in active_labels),
                                      rule_vals))
+    # Fields added later by set_val come after these.
+    self._field_count = len(active_labels)
 
   @property
   def values(self):
@@ -95,6 +98,12 @@ class ASTNode(object):
   def items(self):
     return self.rule_vals.items()
 
+  @property
+  def schema_items(self):
+    """The items of the fields in the node's schema, without those
+    added by set_val."""
+    return self.rule_vals.items()[:self._field_count]
+
   def __getattr__(self, attr):
     if attr in self.__dict__:
       return self.__dict__[attr]
@@ -109,7 +118,11 @@ class ASTNode(object):
 
 
 def make_ast_node(elms_spec, type_index=1):
-  return lambda r, p: ASTNode(r, p[1:], elms_spec, type_index=type_index)
+  action = lambda r, p: ASTNode(r, p[1:], elms_spec, type_index=type_index)
+  # Keep the schema, so other node classes can be generated from it.
+  action.elms_spec = elms_spec
+  action.type_index = type_index
+  return action
 
 
 def make_list_node():
@@ -117,8 +130,10 @@ def make_list_node():
 
 
 def handle_list(r, p):
+  # Extend the list in place; copying it for every item is quadratic.
   if len(p) == 3:
-    return p[1] + [p[2]]
+    p[1].append(p[2])
+    return p[1]
   else:
     return [p[1]]
 
@@ -176,40 +191,232 @@ tuple_action_dict = {
 }
 
 
-def ast_to_str(ast_node, indent=0):
-  def recurse(e):
-    return ast_to_str(e, indent + 1)
+######################################################################
+# Compact node classes
+######################################################################
 
-  if type(ast_node) in [list, tuple]:
-    return ''.join(recurse(node) for node in ast_node)
-  elif not ast_node or type(ast_node) != ASTNode:
-    return ''
-  else:
-    if ast_node.type == 'expr':
-      pad = ' ' * indent
-      values = ast_node.values
-      return '%s%s%s %s\n' % (recurse(values[0]), pad, values[1], values[2])
+class SlotsNode(object):
+  """Base class for the node classes made by `func`:make_node_class.
+
+  Each field is kept in a slot, in schema order, so nodes are small and
+  reading a field is a plain attribute lookup.  Nodes can be weakly
+  referenced, so caches need not keep them alive.  The interface matches
+  `class`:ASTNode: rule, type, values, items, rule_vals and set_val.
+
+  """
+  __slots__ = ('_extra', '__weakref__')
+
+  # Set on each generated class.
+  rule = None
+  type = None
+  fields = ()
+  _slot_names = ()
+  _slot_of = {}
+
+  @property
+  def values(self):
+    values = [getattr(self, slot) for slot in self._slot_names]
+    if self._extra:
+      values.extend(self._extra.values())
+    return values
+
+  @property
+  def items(self):
+    items = zip(self.fields, self.values)
+    if self._extra:
+      items.extend(self._extra.items())
+    return items
+
+  @property
+  def schema_items(self):
+    return zip(self.fields, [getattr(self, slot) for slot in self._slot_names])
+
+  @property
+  def rule_vals(self):
+    """A copy of the fields, as an OrderedDict."""
+    return OrderedDict(self.items)
+
+  def __getattr__(self, attr):
+    # Only called for fields stored under another slot name, and for
+    # values added by set_val.
+    slot = self._slot_of.get(attr)
+    if slot is not None and slot != attr:
+      return getattr(self, slot)
+
+    if self._extra and attr in self._extra:
+      return self._extra[attr]
+
+    raise AttributeError('Unable to find %s' % attr)
+
+  def set_val(self, name, val):
+    slot = self._slot_of.get(name)
+    if slot is not None:
+      setattr(self, slot, val)
     else:
-      pad = ' ' * indent
-      def output_indent(elm):
-        return '%s%s\n' % (pad, elm)
-
-      out = ''
-      for kind, val in ast_node.items:
-        if kind in ['str_const', 'filename']:
-          out += output_indent('\"%s\"' % val)
-        elif kind == 'lineno':
-          out += output_indent('#%d' % val)
-        elif kind == 'actuals':
-          out += output_indent('(\n%s%s)' % (recurse(val), pad))
-        elif type(val) == ASTNode:
-          out += recurse(val)
-        elif type(val) in [list, tuple]:
-          out += ''.join(recurse(v) for v in val)
-        else:
-          out += output_indent(val)
+      if self._extra is None:
+        self._extra = OrderedDict()
+      self._extra[name] = val
 
-    return out
+
+# Fields that can't be slots under their own name, because they are
+# keywords or would hide part of the node interface.
+_renamed_fields = frozenset(['class', 'type', 'rule', 'fields', 'values',
+                             'items', 'rule_vals', 'set_val'])
+
+_node_class_template = """class %(name)s(SlotsNode):
+  __slots__ = %(slots)r
+
+  def __init__(self, %(args)s):
+    self._extra = None
+%(assignments)s
+"""
+
+
+def make_node_class(rule, type_name, labels):
+  """Generate a `class`:SlotsNode subclass for one kind of node.
+
+  labels are the schema's field labels, as used by make_ast_node.
+
+  """
+  fields = tuple(label.lower() for label in labels)
+  slots = tuple(field in _renamed_fields and field + '_' or field
+                for field in fields)
+  args = ['v%d' % i for i in xrange(len(fields))]
+  assignments = ''.join('    self.%s = %s\n' % (slot, arg)
+                        for slot, arg in zip(slots, args))
+
+  namespace = {'SlotsNode': SlotsNode}
+  exec _node_class_template % {
+    'name': type_name,
+    'slots': slots,
+    'args': ', '.join(args),
+    'assignments': assignments,
+  } in namespace
+
+  cls = namespace[type_name]
+  cls.__module__ = __name__
+  cls.rule = rule
+  cls.type = type_name
+  cls.fields = fields
+  cls._slot_names = slots
+  cls._slot_of = dict(zip(fields, slots))
+  return cls
+
+
+def make_slots_action_dict(action_dict=tuple_action_dict):
+  """Return a copy of action_dict that builds `class`:SlotsNode objects.
+
+  A node class is generated for each schema given to make_ast_node.
+  Returns the new action dict, and a dict of the classes by node type.
+
+  """
+  slots_actions = dict(action_dict)
+  classes = {}
+  for rule, action in action_dict.items():
+    spec = getattr(action, 'elms_spec', None)
+    if spec is None:
+      continue
+
+    if action.type_index is None:
+      cls = classes[rule] = make_node_class(rule, rule, spec)
+      slots_action = lambda r, p, cls=cls: cls(*p[1:])
+    else:
+      # The node type is the tag at type_index.
+      rule_classes = {}
+      for type_name, labels in spec.items():
+        rule_classes[type_name] = classes[type_name] = make_node_class(rule, type_name, labels)
+      index = action.type_index + 1
+      slots_action = (lambda r, p, rule_classes=rule_classes, index=index:
+                      rule_classes[p[index]](*p[1:]))
+
+    # The nodes have the same schema, so keep it.
+    slots_action.elms_spec = spec
+    slots_action.type_index = action.type_index
+    slots_actions[rule] = slots_action
+
+  return slots_actions, classes
+
+
+slots_action_dict, node_classes = make_slots_action_dict()
+
+
+######################################################################
+# Writing the Cool AST
+######################################################################
+
+def _is_node(value):
+  return hasattr(value, 'schema_items') and hasattr(value, 'type')
+
+
+def write_ast(ast_node, out, indent=0, chunk_size=1 << 16):
+  """Write ast_node to the file-like out, byte for byte as coolc dumps it.
+
+  ast_node can be any node with type and schema_items, like
+  `class`:ASTNode or `class`:SlotsNode, or a list of them.  Only the
+  fields of each node's schema are written, so values added with set_val,
+  like variable addresses, never end up in the dump.  The tree is walked
+  with an explicit stack, and the text is written in chunks of about
+  chunk_size, so neither deep nesting nor large trees are a problem.
+
+  """
+  buf = []
+  size = 0
+  # Items are (node, indent), or (text, None) for finished lines.
+  stack = [(ast_node, indent)]
+  while stack:
+    item, n = stack.pop()
+    if n is None:
+      buf.append(item)
+      size += len(item)
+      if size >= chunk_size:
+        out.write(''.join(buf))
+        buf = []
+        size = 0
+      continue
+
+    if isinstance(item, (list, tuple)):
+      stack.extend((node, n) for node in reversed(item))
+      continue
+    elif not _is_node(item):
+      continue
+
+    pad = ' ' * n
+    if item.type == 'expr':
+      # An expression is dumped at the indent of its parts, followed by
+      # its static type.
+      aux, colon, static_type = list(item.values)[:3]
+      stack.append(('%s%s %s\n' % (pad, colon, static_type), None))
+      stack.append((aux, n))
+      continue
+
+    parts = []
+    field_pad = ' ' * (n + 2)
+    for index, (kind, val) in enumerate(item.schema_items):
+      if kind == 'lineno':
+        parts.append(('%s#%d\n' % (pad, val), None))
+      elif index == 1:
+        parts.append(('%s%s\n' % (pad, val), None))
+      elif kind in ('str_const', 'filename'):
+        parts.append(('%s"%s"\n' % (field_pad, astparse.escape_string(val)), None))
+      elif kind == 'actuals':
+        parts.append(('%s(\n' % field_pad, None))
+        parts.append((val, n + 2))
+        parts.append(('%s)\n' % field_pad, None))
+      elif isinstance(val, (list, tuple)) or _is_node(val):
+        parts.append((val, n + 2))
+      else:
+        parts.append(('%s%s\n' % (field_pad, val), None))
+    parts.reverse()
+    stack.extend(parts)
+
+  out.write(''.join(buf))
+
+
+def ast_to_str(ast_node, indent=0):
+  """Return ast_node dumped as text; see `func`:write_ast."""
+  out = StringIO()
+  write_ast(ast_node, out, indent)
+  return out.getvalue()
 
 
 
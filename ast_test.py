@@ -0,0 +1,88 @@
+from StringIO import StringIO
+
+from nose.tools import eq_
+
+import ast
+import astparse
+import traverse
+from fixtures import sample_text
+
+
+def test_slots_nodes_match_ast_nodes():
+  text = sample_text('program.ast')
+  expected = astparse.parse_cool_ast(text, ast.tuple_action_dict)
+  program = astparse.parse_cool_ast(text, ast.slots_action_dict)
+
+  eq_(ast.ast_to_str(program), ast.ast_to_str(expected))
+
+  main = program.class_list[0]
+  expected_main = expected.class_list[0]
+  eq_(type(main), ast.node_classes['_class'])
+  eq_((main.rule, main.type), (expected_main.rule, expected_main.type))
+  eq_(main.name, expected_main.name)
+  eq_(getattr(main, 'class'), '_class')
+  eq_([k for k, v in main.items], [k for k, v in expected_main.items])
+  eq_(main.rule_vals.keys(), expected_main.rule_vals.keys())
+
+  expr = main.features[0].init
+  eq_(expr.type, 'expr')
+  eq_(expr.values[2], 'Int')
+  eq_(expr.expr_aux.int_const, 5)
+
+
+def test_slots_node_set_val():
+  node = ast.node_classes['expr'](None, ':', 'Int')
+  node.set_val('type', 'Bool')
+  eq_(node.values, [None, ':', 'Bool'])
+  eq_(node.type, 'expr')
+
+  node.set_val('checked', True)
+  eq_(node.checked, True)
+  eq_(node.items[-1], ('checked', True))
+
+  try:
+    node.missing
+  except AttributeError:
+    pass
+  else:
+    assert False, 'found a missing field'
+
+
+def test_write_ast_matches_coolc_dump():
+  text = sample_text('program.ast')
+  for action_dict in (ast.tuple_action_dict, ast.slots_action_dict):
+    program = astparse.parse_cool_ast(text, action_dict)
+    eq_(ast.ast_to_str(program), text)
+
+    out = StringIO()
+    ast.write_ast(program, out, chunk_size=10)
+    eq_(out.getvalue(), text)
+
+
+def test_write_ast_skips_added_fields():
+  text = sample_text('program.ast')
+  for action_dict in (ast.tuple_action_dict, ast.slots_action_dict):
+    program = astparse.parse_cool_ast(text, action_dict)
+    for node in list(traverse.preorder(program)):
+      node.set_val('note', 'added')
+      node.set_val('children', [node])
+      node.set_val('pair', (node, 1))
+    eq_(ast.ast_to_str(program), text)
+
+
+def test_write_ast_escapes_strings():
+  node = ast.node_classes['_string'](3, '_string', 'a\\b"c\n\t\b\f\033\xff')
+  eq_(ast.ast_to_str(node), '#3\n_string\n  "a\\\\b\\"c\\n\\t\\b\\f\\033\\377"\n')
+
+
+def test_write_ast_does_not_recurse():
+  depth = 5000
+  text = ('#1\n_program\n  #1\n  _class\n    Main\n    Object\n    "a.cl"\n    (\n' +
+          '    #1\n    _attr\n      x\n      Int\n' +
+          ''.join('      %s#1\n      %s_neg\n' % (' ' * (2 * i), ' ' * (2 * i))
+                  for i in xrange(depth)) +
+          '      %s#1\n      %s_int\n        %s0\n      %s: Int\n' % ((' ' * (2 * depth),) * 4) +
+          ''.join('      %s: Int\n' % (' ' * (2 * i)) for i in reversed(xrange(depth))) +
+          '    )\n')
+  program = astparse.parse_cool_ast(text, ast.slots_action_dict, 'll')
+  eq_(ast.ast_to_str(program), text)
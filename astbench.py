@@ -0,0 +1,792 @@
+#!/usr/bin/env python
+"""Benchmarks for the Cool AST parser.
+
+Pass the names of the benchmarks to run, or nothing to run all of them:
+
+  python astbench.py strings
+
+The suite benchmark runs every stage on synthetic programs of several
+sizes and prints the results as JSON, to compare between versions:
+
+  python astbench.py suite > before.json
+
+"""
+
+import gc
+import json
+import marshal
+import mmap
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import ast
+import astbinary
+import astcache
+import astcolumns
+import astgen
+import astindex
+import astparse
+import hashcons
+import inheritance
+import layout
+import resolve
+import semant
+import stringtab
+import symboltable
+import traverse
+
+
+def best_time(fn, repeat=3):
+  """Return the fastest of repeat runs of fn, in seconds."""
+  best = None
+  for _ in xrange(repeat):
+    start = time.time()
+    fn()
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+
+  return best
+
+
+def report(name, seconds, size, count, unit):
+  print '%-34s %8.3fs %9.2f MB/s %12.0f %s/s' % (
+    name, seconds, size / seconds / 1e6, count / seconds, unit)
+
+
+######################################################################
+# String constants
+######################################################################
+
+def string_heavy_ast(count, length):
+  """Return an AST dump made up of count string constants of length chars."""
+  # Only use escapes the legacy lexer understands, so both can run it.
+  chunk = 'Hello, world!\\n\\tabc '
+  literal = (chunk * (length // len(chunk) + 1))[:length].rstrip('\\')
+
+  lines = []
+  for i in xrange(count):
+    lines.append('#%d\n_string\n  "%s"\n: String\n' % (i + 1, literal))
+
+  return ''.join(lines)
+
+
+def lex_tokens(lexer, text):
+  lexer.input(text)
+  count = 0
+  for _ in iter(lexer.token, None):
+    count += 1
+  return count
+
+
+def bench_strings():
+  """Lex string constants with the fast and the per-character lexer."""
+  for count, length in ((2000, 16), (200, 1000), (20, 20000)):
+    text = string_heavy_ast(count, length)
+    for fast_strings in (True, False):
+      lexer = astparse.build_ast_lexer(fast_strings=fast_strings)
+      seconds = best_time(lambda: lex_tokens(lexer, text))
+      name = 'strings %dx%d %s' % (count, length,
+                                   fast_strings and 'fast' or 'per-char')
+      report(name, seconds, len(text), lex_tokens(lexer, text), 'tokens')
+
+
+######################################################################
+# Parser engines
+######################################################################
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata')
+
+
+def replicated_program(copies):
+  """Return testdata/program.ast with its classes repeated copies times."""
+  text = open(os.path.join(TESTDATA, 'program.ast')).read()
+  head, classes = text.split('_program\n', 1)
+  return head + '_program\n' + ''.join(classes.replace('Main', 'Main%d' % i)
+                                       for i in xrange(copies))
+
+
+# Actions that build nothing, to time the parser alone.
+null_action_dict = dict((rule, lambda r, p: None) for rule in ast.simple_action_dict)
+
+
+def bench_engines():
+  """Parse with the LALR and the table-free engine, each in a process of
+  its own."""
+  text = replicated_program(300)
+  nodes = text.count('#')
+
+  def parse(action_dict, engine):
+    def run():
+      astparse.get_parser(action_dict, engine).parse(text)
+      return nodes
+    return run
+
+  for name, action_dict in (('null', null_action_dict),
+                            ('simple', ast.simple_action_dict),
+                            ('tuple', ast.tuple_action_dict)):
+    for engine in ('lalr', 'll'):
+      seconds, count, peak_rss, rss_growth = measure(parse(action_dict, engine))
+      report('engine %s %s' % (engine, name), seconds, len(text), count, 'nodes')
+      print '  peak RSS %d kB, grew %d kB' % (peak_rss, rss_growth)
+
+
+def bench_profile():
+  """Profile a parse by rule, and time what profiling costs."""
+  text = replicated_program(300)
+  for engine in ('lalr', 'll'):
+    plain = best_time(lambda: astparse.parse_cool_ast(text, ast.tuple_action_dict, engine))
+    profiled = best_time(lambda: astparse.parse_cool_ast(
+      text, ast.tuple_action_dict, engine, stats=astparse.ParseStats()))
+    report('profile %s plain' % engine, plain, len(text), text.count('#'), 'nodes')
+    report('profile %s profiled' % engine, profiled, len(text), text.count('#'), 'nodes')
+
+  stats = astparse.ParseStats()
+  astparse.parse_cool_ast(text, ast.tuple_action_dict, stats=stats)
+  print stats.report()
+
+
+def signature_pass(text, lazy):
+  """Parse text and lay out its classes, which reads only signatures."""
+  program = astparse.parse_cool_ast(text, ast.slots_action_dict, 'll', lazy=lazy)
+  layout.ProgramLayout(program.class_list)
+  return text.count('#')
+
+
+def bench_lazy():
+  """Run a signature-only pass over an eagerly and a lazily parsed program."""
+  text = astgen.generate_program(classes=400)
+  for lazy in (False, True):
+    seconds, count, peak_rss, rss_growth = measure(lambda: signature_pass(text, lazy))
+    report('signatures %s' % (lazy and 'lazy' or 'eager'), seconds, len(text),
+           count, 'nodes')
+    print '  peak RSS %d kB, grew %d kB' % (peak_rss, rss_growth)
+
+
+def bench_incremental():
+  """Parse a program again after editing one of its classes."""
+  text = astgen.generate_program(classes=400)
+  start = text.index('"', text.index('_class\n    C200'))
+  edited = text[:start + 1] + 'edited ' + text[start + 1:]
+  previous = astparse.parse_incremental(text, ast.slots_action_dict)
+
+  full = best_time(lambda: astparse.parse_cool_ast(edited, ast.slots_action_dict, 'll'))
+  report('incremental full', full, len(edited), 401, 'classes')
+  incremental = best_time(lambda: astparse.parse_incremental(
+    edited, ast.slots_action_dict, previous))
+  report('incremental edit', incremental, len(edited), 401, 'classes')
+  result = astparse.parse_incremental(edited, ast.slots_action_dict, previous)
+  print '  reused %d, rebuilt %s' % (len(result.reused), ', '.join(result.rebuilt))
+
+
+def bench_cache():
+  """Parse through a cold and a warm on-disk parse cache."""
+  text = astgen.generate_program(classes=400)
+  directory = tempfile.mkdtemp()
+  try:
+    cache = astcache.ParseCache(directory)
+    plain = best_time(lambda: astparse.parse_cool_ast(text, ast.slots_action_dict, 'll'))
+    report('cache none', plain, len(text), text.count('#'), 'nodes')
+
+    def miss():
+      cache.clear()
+      cache.parse(text, ast.slots_action_dict)
+    report('cache miss', best_time(miss), len(text), text.count('#'), 'nodes')
+
+    hit = best_time(lambda: cache.parse(text, ast.slots_action_dict))
+    report('cache hit', hit, len(text), text.count('#'), 'nodes')
+    print '  %d hits, %d misses, %d bytes' % (cache.hits, cache.misses, cache.size())
+  finally:
+    shutil.rmtree(directory)
+
+
+def bench_interning():
+  """Build a tree with and without interning its identifiers and constants."""
+  text = astgen.generate_program(classes=400)
+
+  def build(interned):
+    def run():
+      tables = interned and stringtab.Tables() or None
+      program = astparse.parse_cool_ast(text, ast.slots_action_dict, 'll',
+                                        tables=tables)
+      # Keep the tree until the peak RSS is read.
+      run.program = program
+      return text.count('#')
+    return run
+
+  for interned in (False, True):
+    seconds, count, peak_rss, rss_growth = measure(build(interned))
+    report('interning %s' % (interned and 'on' or 'off'), seconds, len(text),
+           count, 'nodes')
+    print '  peak RSS %d kB, grew %d kB' % (peak_rss, rss_growth)
+
+  tables = stringtab.Tables()
+  astparse.parse_cool_ast(text, ast.slots_action_dict, 'll', tables=tables)
+  print '  %d identifiers, %d strings, %d integers' % (
+    len(tables.idtable), len(tables.stringtable), len(tables.inttable))
+
+
+def bench_mmap():
+  """Parse a large dump read whole into a str, through an mmap, and a
+  piece at a time, against reading it whole for the PLY lexer and LALR
+  parser."""
+  fd, path = tempfile.mkstemp(suffix='.ast')
+  try:
+    with os.fdopen(fd, 'w') as out:
+      astgen.write_program(out, classes=2000)
+    size = os.path.getsize(path)
+    nodes = open(path).read().count('#')
+
+    def read_lalr(action_dict):
+      def run():
+        astparse.parse_cool_ast(open(path).read(), action_dict, 'lalr')
+        return nodes
+      return run
+
+    def read_whole(action_dict):
+      def run():
+        astparse.parse_cool_ast(open(path).read(), action_dict, 'll')
+        return nodes
+      return run
+
+    def mapped(action_dict):
+      def run():
+        with open(path, 'rb') as ast_file:
+          data = mmap.mmap(ast_file.fileno(), 0, access=mmap.ACCESS_READ)
+        astparse.parse_cool_buffer(data, action_dict)
+        data.close()
+        return nodes
+      return run
+
+    def chunked(action_dict):
+      def run():
+        astparse.parse_cool_file(path, action_dict)
+        return nodes
+      return run
+
+    for name, action_dict in (('null', null_action_dict), ('slots', ast.slots_action_dict)):
+      for how, fn in (('read lalr', read_lalr), ('read', read_whole),
+                      ('mmap', mapped), ('file', chunked)):
+        seconds, count, peak_rss, rss_growth = measure(fn(action_dict), repeat=1)
+        report('input %s %s' % (how, name), seconds, size, count, 'nodes')
+        print '  peak RSS %d kB, grew %d kB' % (peak_rss, rss_growth)
+  finally:
+    os.remove(path)
+
+
+def bench_hashcons():
+  """Build trees with and without sharing identical subtrees."""
+  text = astgen.generate_program(classes=400)
+  nodes = text.count('#')
+
+  def build(action_dict, shared):
+    conser = hashcons.HashConser()
+    def run():
+      run.program = None
+      if shared:
+        run.program = conser.parse(text, action_dict, 'll')
+      else:
+        run.program = astparse.parse_cool_ast(text, action_dict, 'll')
+      return nodes
+    return run
+
+  for name, action_dict in (('ASTNode', ast.tuple_action_dict),
+                            ('SlotsNode', ast.slots_action_dict)):
+    for shared in (False, True):
+      seconds, count, peak_rss, rss_growth = measure(build(action_dict, shared))
+      report('hashcons %s %s' % (name, shared and 'shared' or 'plain'), seconds,
+             len(text), count, 'nodes')
+      print '  peak RSS %d kB, grew %d kB' % (peak_rss, rss_growth)
+
+  conser = hashcons.HashConser()
+  program = conser.parse(text, ast.tuple_action_dict, 'll')
+  print '  ' + conser.report()
+
+
+def walk_method(root, target):
+  """Find the method around target by searching the whole tree."""
+  stack = [(root, None)]
+  while stack:
+    node, method = stack.pop()
+    if node.type == '_method':
+      method = node
+    if node is target:
+      return method
+    stack.extend((child, method) for child in traverse.children(node))
+
+
+def bench_index():
+  """Look up the methods and lines of nodes with and without an index."""
+  program = astparse.parse_cool_ast(astgen.generate_program(classes=100),
+                                    ast.slots_action_dict, 'll')
+  nodes = list(traverse.preorder(program))
+  targets = random.Random(0).sample(nodes, 50)
+
+  seconds = best_time(lambda: astindex.AstIndex(program), repeat=1)
+  report('index build', seconds, 0, len(nodes), 'nodes')
+  index = astindex.AstIndex(program)
+
+  seconds = best_time(lambda: [walk_method(program, node) for node in targets])
+  report('index walk method', seconds, 0, len(targets), 'queries')
+  seconds = best_time(lambda: [index.enclosing_method(node) for node in targets])
+  report('index enclosing method', seconds, 0, len(targets), 'queries')
+
+  lines = [node.lineno for node in targets if hasattr(node, 'lineno')]
+  seconds = best_time(lambda: [[node for node in nodes
+                                if getattr(node, 'lineno', None) == lineno]
+                               for lineno in lines])
+  report('index scan line', seconds, 0, len(lines), 'queries')
+  seconds = best_time(lambda: [index.nodes_on_line(lineno) for lineno in lines])
+  report('index nodes on line', seconds, 0, len(lines), 'queries')
+
+
+def bench_resolve():
+  """Resolve variables to addresses once, against looking them up by name."""
+  program = astparse.parse_cool_ast(astgen.generate_program(classes=100),
+                                    ast.slots_action_dict, 'll')
+  objects = [node for node in traverse.preorder(program) if node.type == '_object']
+
+  def lookups():
+    for cls in program.class_list:
+      SymbolLookups(symboltable.ShadowSymbolTable()).visit(cls)
+
+  seconds = best_time(lookups)
+  report('resolve scoped lookups', seconds, 0, len(objects), 'refs')
+  seconds = best_time(lambda: resolve.resolve_program(program))
+  report('resolve pass', seconds, 0, len(objects), 'refs')
+
+  # What a run time read costs once each reference has its address.
+  frame = [0] * 64
+  def reads():
+    for node in objects:
+      frame[node.address.index]
+  seconds = best_time(reads)
+  report('resolve addressed reads', seconds, 0, len(objects), 'refs')
+
+
+######################################################################
+# Parallel parsing
+######################################################################
+
+def bench_parallel():
+  """Parse thousands of classes in one process and in a pool of workers."""
+  text = replicated_program(2000)
+  processes = multiprocessing.cpu_count()
+  pool = multiprocessing.Pool(processes)
+  events = marshal.loads(astparse._parse_classes(text.split('_program\n', 1)[1]))
+  try:
+    for name, action_dict in (('simple', ast.simple_action_dict),
+                              ('slots', ast.slots_action_dict),
+                              ('tuple', ast.tuple_action_dict)):
+      serial = best_time(lambda: astparse.parse_cool_ast(text, action_dict, 'll'))
+      report('serial %s' % name, serial, len(text), text.count('#'), 'nodes')
+      parallel = best_time(lambda: astparse.parse_parallel(text, action_dict, pool))
+      report('parallel %s x%d' % (name, processes), parallel, len(text),
+             text.count('#'), 'nodes')
+      print '%-34s %8.2fx' % ('speedup %s' % name, serial / parallel)
+      # The actions still run in this process, which bounds the speedup.
+      replay = best_time(lambda: astparse.replay_events(events, action_dict))
+      print '%-34s %8.2fx' % ('bound %s' % name, serial / replay)
+  finally:
+    pool.terminate()
+    pool.join()
+
+
+######################################################################
+# Node classes
+######################################################################
+
+node_types = (ast.ASTNode, ast.SlotsNode)
+
+
+def iter_nodes(root):
+  """Yield every node of the tree under root."""
+  stack = [root]
+  while stack:
+    node = stack.pop()
+    if isinstance(node, node_types):
+      yield node
+      stack.extend(node.values)
+    elif isinstance(node, list):
+      stack.extend(node)
+
+
+def node_size(node):
+  """Return the bytes used by node itself, not counting its children."""
+  seen = set()
+  size = 0
+  stack = [node]
+  while stack:
+    obj = stack.pop()
+    if id(obj) in seen or (obj is not node and isinstance(obj, node_types)):
+      continue
+    seen.add(id(obj))
+    size += sys.getsizeof(obj)
+    for child in gc.get_referents(obj):
+      # Classes, and the strings and numbers tokens hold, aren't per node.
+      if not isinstance(child, (type, basestring, int, long, float)):
+        stack.append(child)
+
+  return size
+
+
+def walk_fields(nodes):
+  count = 0
+  for node in nodes:
+    if node.type == 'expr':
+      count += node.expr_aux.lineno
+    elif node.type in ('_plus', '_sub', '_mul', '_divide', '_lt', '_leq', '_eq'):
+      count += node.expr1 is not node.expr2
+
+  return count
+
+
+def bench_nodes():
+  """Compare the memory and field access time of ASTNode and SlotsNode."""
+  text = replicated_program(300)
+  for name, action_dict in (('ASTNode', ast.tuple_action_dict),
+                            ('SlotsNode', ast.slots_action_dict)):
+    parser = astparse.get_parser(action_dict, 'll')
+    seconds = best_time(lambda: parser.parse(text))
+    report('build %s' % name, seconds, len(text), text.count('#'), 'nodes')
+
+    nodes = list(iter_nodes(parser.parse(text)))
+    size = sum(node_size(node) for node in nodes)
+    print '%-34s %8d nodes %9.1f MB %6d bytes/node' % (
+      'memory %s' % name, len(nodes), size / 1e6, size // len(nodes))
+
+    seconds = best_time(lambda: walk_fields(nodes))
+    report('fields %s' % name, seconds, len(text), len(nodes), 'nodes')
+
+
+######################################################################
+# Columnar trees
+######################################################################
+
+def columnar_size(tree):
+  size = 0
+  for name in ('kind', 'lineno', 'static_type', 'first_child', 'next_sibling',
+               'first_scalar', 'scalars'):
+    column = getattr(tree, name)
+    size += column.itemsize * len(column)
+  for table in (tree.names, tree.constants):
+    size += sys.getsizeof(table.values) + sys.getsizeof(table.ids)
+
+  return size
+
+
+def bench_columns():
+  """Compare bulk queries over a columnar tree with tree walks."""
+  text = replicated_program(300)
+  nodes = list(iter_nodes(astparse.parse_cool_ast(text, ast.slots_action_dict, 'll')))
+
+  tree = astcolumns.ColumnarAst()
+  parser = astparse.LLAstParser(tree.action_dict)
+  parser.parse(text)
+  size = columnar_size(tree)
+  print '%-34s %8d nodes %9.1f MB %6d bytes/node' % (
+    'memory columnar', len(tree), size / 1e6, size // len(tree))
+
+  seconds = best_time(lambda: sum(1 for node in nodes if node.type == '_dispatch'))
+  report('count _dispatch walk', seconds, len(text), len(nodes), 'nodes')
+  seconds = best_time(lambda: tree.count_kind('_dispatch'))
+  report('count _dispatch columnar', seconds, len(text), len(tree), 'nodes')
+
+  seconds = best_time(lambda: [node for node in nodes
+                               if 5 <= getattr(node, 'lineno', -1) <= 8])
+  report('lines 5-8 walk', seconds, len(text), len(nodes), 'nodes')
+  seconds = best_time(lambda: tree.find_lines(5, 8))
+  report('lines 5-8 columnar', seconds, len(text), len(tree), 'nodes')
+
+
+######################################################################
+# Binary files
+######################################################################
+
+def touch_classes(path):
+  with astbinary.load_ast(path) as tree:
+    return [cls.name for cls in tree.root.class_list]
+
+
+def bench_binary():
+  """Compare loading a binary AST with parsing the text dump again."""
+  text = replicated_program(300)
+  program = astparse.parse_cool_ast(text, ast.tuple_action_dict, 'll')
+  fd, path = tempfile.mkstemp(suffix='.coolast')
+  try:
+    with os.fdopen(fd, 'wb') as out:
+      astbinary.dump_ast(program, out)
+    size = os.path.getsize(path)
+    print '%-34s %8d bytes %9.1f%% of text' % ('size binary', size,
+                                               100.0 * size / len(text))
+
+    seconds = best_time(lambda: astparse.parse_cool_ast(text, ast.tuple_action_dict, 'll'))
+    report('reparse text', seconds, len(text), text.count('#'), 'nodes')
+    seconds = best_time(lambda: astbinary.load_ast(path).close())
+    report('load binary', seconds, size, text.count('#'), 'nodes')
+    seconds = best_time(lambda: touch_classes(path))
+    report('load binary, read class names', seconds, size, text.count('#'), 'nodes')
+    seconds = best_time(lambda: ast.ast_to_str(astbinary.load_ast(path).root))
+    report('load binary, read all', seconds, size, text.count('#'), 'nodes')
+  finally:
+    os.remove(path)
+
+
+######################################################################
+# Symbol tables
+######################################################################
+
+def let_chain(table_class, depth):
+  """Nest depth scopes, like a chain of lets, and look up outer symbols in each."""
+  st = table_class()
+  st.add('self', 0)
+  for i in xrange(depth):
+    st.enter_scope()
+    st.add('x%d' % i, i)
+    st.find('self')
+    st.find('x0')
+  for i in xrange(depth):
+    st.leave_scope()
+
+
+def bench_symbols():
+  """Time lookups at increasing scope depths with both symbol tables."""
+  for depth in (10, 100, 1000, 4000):
+    for table_class in (symboltable.SymbolTable, symboltable.ShadowSymbolTable):
+      seconds = best_time(lambda: let_chain(table_class, depth))
+      print '%-34s %8.4fs %9.2f us/scope' % (
+        'let chain %d %s' % (depth, table_class.__name__), seconds,
+        seconds / depth * 1e6)
+
+
+######################################################################
+# Class hierarchies
+######################################################################
+
+class ClassStub(object):
+
+  def __init__(self, name, parent):
+    self.name = name
+    self.parent = parent
+
+
+def hierarchy(shape, count):
+  """Return count classes in a 'deep' chain, a 'wide' fan or a 'random' tree."""
+  rand = random.Random(count)
+  classes = []
+  for i in xrange(count):
+    if shape == 'deep':
+      parent = i and 'C%d' % (i - 1) or 'Object'
+    elif shape == 'wide':
+      parent = 'Object'
+    else:
+      parent = i and 'C%d' % rand.randrange(i) or 'Object'
+    classes.append(ClassStub('C%d' % i, parent))
+  return classes
+
+
+def walk_lub(parents, a, b):
+  ancestors = set()
+  while a is not None:
+    ancestors.add(a)
+    a = parents[a]
+  while b not in ancestors:
+    b = parents[b]
+  return b
+
+
+def bench_inheritance():
+  """Compare conforms and lub queries with walks up the parent chains."""
+  for shape in ('deep', 'wide', 'random'):
+    classes = hierarchy(shape, 5000)
+    seconds = best_time(lambda: inheritance.InheritanceGraph(classes))
+    print '%-34s %8.4fs %9.2f us/class' % ('build %s graph' % shape,
+                                           seconds, seconds / len(classes) * 1e6)
+
+    graph = inheritance.InheritanceGraph(classes)
+    rand = random.Random(0)
+    names = sorted(graph.parents)
+    pairs = [(rand.choice(names), rand.choice(names)) for _ in xrange(2000)]
+    parents = graph.parents
+
+    seconds = best_time(lambda: [b in graph.ancestors(a) for a, b in pairs])
+    print '%-34s %8.4fs %9.2f us/query' % ('conforms %s walk' % shape,
+                                           seconds, seconds / len(pairs) * 1e6)
+    seconds = best_time(lambda: [graph.conforms(a, b) for a, b in pairs])
+    print '%-34s %8.4fs %9.2f us/query' % ('conforms %s graph' % shape,
+                                           seconds, seconds / len(pairs) * 1e6)
+    seconds = best_time(lambda: [walk_lub(parents, a, b) for a, b in pairs])
+    print '%-34s %8.4fs %9.2f us/query' % ('lub %s walk' % shape,
+                                           seconds, seconds / len(pairs) * 1e6)
+    seconds = best_time(lambda: [graph.lub(a, b) for a, b in pairs])
+    print '%-34s %8.4fs %9.2f us/query' % ('lub %s graph' % shape,
+                                           seconds, seconds / len(pairs) * 1e6)
+
+
+######################################################################
+# Type checking
+######################################################################
+
+def bench_semant():
+  """Time each phase of type checking a program with thousands of classes."""
+  text = astgen.generate_program(classes=1000)
+  for name, action_dict in (('tuple', ast.tuple_action_dict),
+                            ('slots', ast.slots_action_dict)):
+    program = astparse.parse_cool_ast(text, action_dict, 'll')
+    start = time.time()
+    checker = semant.check_program(program)
+    seconds = time.time() - start
+    # Time the checks of a valid program, not the error path.
+    assert not checker.errors, checker.errors[0]
+    report('semant %s' % name, seconds, len(text), text.count('#'), 'nodes')
+    for phase, seconds in checker.timings.items():
+      print '  %-32s %8.3fs' % (phase, seconds)
+
+
+######################################################################
+# Suite
+######################################################################
+
+# Knobs for astgen.generate_program, by size.
+SIZES = (
+  ('small', dict(classes=5, depth=4, methods=2, method_size=5, nesting=6,
+                 string_length=32)),
+  ('medium', dict(classes=25, depth=4, methods=2, method_size=5, nesting=6,
+                  string_length=32)),
+  ('large', dict(classes=100, depth=4, methods=2, method_size=5, nesting=6,
+                 string_length=32)),
+)
+
+
+class SymbolLookups(traverse.ScopedVisitor):
+  """Looks up every object an expression names."""
+
+  def visit_object(self, node):
+    self.symbols.find(node.name)
+
+
+def measure(fn, repeat=3):
+  """Run fn repeat times in a child process.
+
+  Returns the fastest time, what fn returned, and the child's peak RSS
+  and how much it grew while running fn, in kB.
+
+  """
+  read_end, write_end = os.pipe()
+  pid = os.fork()
+  if pid == 0:
+    os.close(read_end)
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result = [None]
+    def run():
+      result[0] = fn()
+    seconds = best_time(run, repeat)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    os.write(write_end, json.dumps([seconds, result[0], peak_rss,
+                                    peak_rss - start_rss]))
+    os._exit(0)
+
+  os.close(write_end)
+  data = ''.join(iter(lambda: os.read(read_end, 1 << 16), ''))
+  os.close(read_end)
+  os.waitpid(pid, 0)
+  return json.loads(data)
+
+
+def suite_stages(text):
+  """Return the (name, fn) pairs of the stages to time on text.
+
+  Each fn returns how many items it handled; the unit is in the name.
+
+  """
+  nodes = text.count('#')
+  lexer = astparse.build_ast_lexer()
+  lalr = astparse.get_parser(null_action_dict, 'lalr')
+  ll = astparse.get_parser(null_action_dict, 'll')
+  tuple_parser = astparse.get_parser(ast.tuple_action_dict, 'll')
+  slots_parser = astparse.get_parser(ast.slots_action_dict, 'll')
+  program = tuple_parser.parse(text)
+
+  def lookups(table_class):
+    def run():
+      SymbolLookups(table_class()).visit(program)
+      return nodes
+    return run
+
+  return [
+    ('lex tokens', lambda: lex_tokens(lexer, text)),
+    ('parse lalr nodes', lambda: lalr.parse(text) or nodes),
+    ('parse ll nodes', lambda: ll.parse(text) or nodes),
+    ('build ASTNode nodes', lambda: tuple_parser.parse(text) and nodes),
+    ('build SlotsNode nodes', lambda: slots_parser.parse(text) and nodes),
+    ('ast_to_str nodes', lambda: ast.ast_to_str(program) and nodes),
+    ('SymbolTable nodes', lookups(symboltable.SymbolTable)),
+    ('ShadowSymbolTable nodes', lookups(symboltable.ShadowSymbolTable)),
+  ]
+
+
+def bench_suite():
+  """Time every stage on each size of synthetic program, printing JSON."""
+  results = []
+  for size, knobs in SIZES:
+    text = astgen.generate_program(**knobs)
+    for name, fn in suite_stages(text):
+      stage, unit = name.rsplit(' ', 1)
+      seconds, count, peak_rss, rss_growth = measure(fn)
+      results.append({
+        'stage': stage,
+        'size': size,
+        'knobs': knobs,
+        'bytes': len(text),
+        'seconds': seconds,
+        unit: count,
+        unit + '_per_s': count / seconds,
+        'mb_per_s': len(text) / seconds / 1e6,
+        'peak_rss_kb': peak_rss,
+        'rss_growth_kb': rss_growth,
+      })
+
+  print json.dumps({
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'results': results,
+  }, indent=2, sort_keys=True)
+
+
+BENCHMARKS = {
+  'binary': bench_binary,
+  'cache': bench_cache,
+  'columns': bench_columns,
+  'engines': bench_engines,
+  'hashcons': bench_hashcons,
+  'incremental': bench_incremental,
+  'index': bench_index,
+  'inheritance': bench_inheritance,
+  'interning': bench_interning,
+  'lazy': bench_lazy,
+  'mmap': bench_mmap,
+  'nodes': bench_nodes,
+  'parallel': bench_parallel,
+  'profile': bench_profile,
+  'resolve': bench_resolve,
+  'semant': bench_semant,
+  'strings': bench_strings,
+  'suite': bench_suite,
+  'symbols': bench_symbols,
+}
+
+
+def main(argv):
+  for name in argv or sorted(BENCHMARKS):
+    BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,277 @@
+"""
+A compact, versioned binary format for parsed Cool ASTs.
+
+Stages that would otherwise parse the same text dump again can save the
+tree once with `func`:dump_ast and open it with `func`:load_ast.  Loading
+maps the file into memory and decodes nothing up front: nodes and
+strings are read from the mapping when they are first touched, so
+opening a large program is fast and only what is used gets decoded.
+
+The file is laid out as:
+
+  header        HEADER: magic, version, kind, node and string counts
+  records       one RECORD per node, in pre-order, the root first
+  offsets       string_count + 1 little endian uint32s into the blob
+  blob          the UTF-8 bytes of the strings, back to back
+
+The first kind_count strings are the names of the node kinds, so a
+record's kind is an index into them.  A record holds the node's kind,
+its line number, its first child and next sibling (-1 if none), and the
+string ids of its names, types and constants in schema order, or -1
+for None.
+
+"""
+
+import mmap
+import os
+import struct
+
+import ast
+import astcolumns
+from astcolumns import (CHILD, CONSTANT, IMPLIED, LINENO, LIST_KIND, NAME,
+                        TYPE, InternTable, NodeView)
+
+MAGIC = 'COOLAST\0'
+
+# Bump whenever the layout changes.
+VERSION = 1
+
+HEADER = struct.Struct('<8sIIII')
+
+# kind, scalar count, lineno, first child, next sibling, then the scalars.
+MAX_SCALARS = 3
+RECORD = struct.Struct('<HHiii%di' % MAX_SCALARS)
+
+_OFFSET = struct.Struct('<II')
+
+_STORED = (NAME, TYPE, CONSTANT)
+
+
+def _scalar_fields(schema):
+  """Return the indexes of the fields schema stores as strings."""
+  return [i for i, role in enumerate(schema.roles) if role in _STORED]
+
+
+def _string_id(strings, value):
+  """Return the id of value in strings, or -1 for None."""
+  if value is None:
+    return -1
+  if not isinstance(value, basestring):
+    value = str(value)
+  return strings.intern(value)
+
+
+def dump_ast(ast_node, out, action_dict=ast.tuple_action_dict):
+  """Write the tree under ast_node to the binary file out.
+
+  ast_node can be any node with type and values, like ast.ASTNode, whose
+  kinds have schemas in action_dict.
+
+  """
+  schemas = astcolumns.node_schemas(action_dict)
+  kinds = sorted(schemas)
+  kind_ids = dict((kind, i) for i, kind in enumerate(kinds))
+  scalar_fields = dict((kind, _scalar_fields(schema))
+                       for kind, schema in schemas.items())
+
+  strings = InternTable()
+  for kind in kinds:
+    strings.intern(kind)
+
+  # Records are [kind, lineno, first_child, next_sibling, scalars].
+  records = []
+  last_child = []
+  # Items are (node or list, parent index).
+  stack = [(ast_node, -1)]
+  while stack:
+    node, parent = stack.pop()
+    index = len(records)
+    if isinstance(node, list):
+      kind = LIST_KIND
+      lineno = -1
+      scalars = []
+      children = node
+    else:
+      kind = node.type
+      schema = schemas[kind]
+      values = list(node.values)
+      lineno = -1
+      if LINENO in schema.roles:
+        lineno = values[schema.roles.index(LINENO)]
+      scalars = [_string_id(strings, values[i]) for i in scalar_fields[kind]]
+      if len(scalars) > MAX_SCALARS:
+        raise ValueError('%s nodes have %d string fields, a record holds %d' %
+                         (kind, len(scalars), MAX_SCALARS))
+      children = [value for value, role in zip(values, schema.roles)
+                  if role == CHILD]
+
+    records.append([kind_ids[kind], lineno, -1, -1, scalars])
+    last_child.append(-1)
+    if parent != -1:
+      if last_child[parent] == -1:
+        records[parent][2] = index
+      else:
+        records[last_child[parent]][3] = index
+      last_child[parent] = index
+
+    stack.extend((child, index) for child in reversed(children))
+
+  out.write(HEADER.pack(MAGIC, VERSION, len(kinds), len(records), len(strings)))
+
+  padding = [-1] * MAX_SCALARS
+  for kind, lineno, first_child, next_sibling, scalars in records:
+    out.write(RECORD.pack(kind, len(scalars), lineno, first_child, next_sibling,
+                          *(scalars + padding[len(scalars):])))
+
+  blobs = [value.encode('utf-8') if isinstance(value, unicode) else value
+           for value in strings.values]
+  offset = 0
+  offsets = [0]
+  for blob in blobs:
+    offset += len(blob)
+    offsets.append(offset)
+  out.write(struct.pack('<%dI' % len(offsets), *offsets))
+  out.write(''.join(blobs))
+
+
+class BinaryAst(object):
+  """A tree saved by `func`:dump_ast, read lazily through mmap.
+
+  root is an astcolumns.NodeView of the program.  The tree is read only;
+  close it, or use it in a with statement, when done.
+
+  """
+
+  def __init__(self, path, action_dict=ast.tuple_action_dict):
+    self.file = open(path, 'rb')
+    self.data = None
+    try:
+      self._open(path, action_dict)
+    except Exception:
+      self.close()
+      raise
+
+  def _open(self, path, action_dict):
+    # mmap can't map an empty file.
+    if os.fstat(self.file.fileno()).st_size < HEADER.size:
+      raise ValueError('%s is not a binary Cool AST' % path)
+    self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, kind_count, self.node_count, string_count = \
+        HEADER.unpack_from(self.data, 0)
+    if magic != MAGIC:
+      raise ValueError('%s is not a binary Cool AST' % path)
+    if version != VERSION:
+      raise ValueError('%s has version %d, expected %d' % (path, version, VERSION))
+
+    self.records_start = HEADER.size
+    self.offsets_start = self.records_start + self.node_count * RECORD.size
+    self.blob_start = self.offsets_start + (string_count + 1) * 4
+    # The last offset is where the blob ends.
+    if (len(self.data) < self.blob_start or
+        len(self.data) < self.blob_start + struct.unpack_from(
+            '<I', self.data, self.blob_start - 4)[0]):
+      raise ValueError('%s is truncated' % path)
+    self._strings = {}
+    self._children = {}
+
+    schemas = astcolumns.node_schemas(action_dict)
+    self.kinds = [self.string(i) for i in xrange(kind_count)]
+    for kind in self.kinds:
+      if kind not in schemas:
+        raise ValueError('%s has unknown node kind %s' % (path, kind))
+    self._by_id = [schemas[kind] for kind in self.kinds]
+    self._list_id = self.kinds.index(LIST_KIND)
+    self._scalar_offsets = []
+    for schema in self._by_id:
+      offsets = [None] * len(schema.fields)
+      for offset, index in enumerate(_scalar_fields(schema)):
+        offsets[index] = offset
+      self._scalar_offsets.append(offsets)
+
+    self.root = self.node_count and NodeView(self, 0) or None
+
+  def __len__(self):
+    return self.node_count
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def close(self):
+    if self.data is not None:
+      self.data.close()
+    self.file.close()
+
+  def string(self, index):
+    """Return string number index, decoding it on first use."""
+    try:
+      return self._strings[index]
+    except KeyError:
+      start, end = _OFFSET.unpack_from(self.data, self.offsets_start + index * 4)
+      value = self.data[self.blob_start + start:self.blob_start + end]
+      self._strings[index] = value
+      return value
+
+  def record(self, node):
+    return RECORD.unpack_from(self.data, self.records_start + node * RECORD.size)
+
+  def children(self, node):
+    """Return the indexes of the children of node, in order, walking
+    the sibling links only the first time."""
+    try:
+      return self._children[node]
+    except KeyError:
+      children = []
+      child = self.record(node)[3]
+      while child != -1:
+        children.append(child)
+        child = self.record(child)[4]
+      self._children[node] = children
+      return children
+
+  def schema(self, node):
+    return self._by_id[self.record(node)[0]]
+
+  def node_type(self, node):
+    return self.kinds[self.record(node)[0]]
+
+  def node_lineno(self, node):
+    return self.record(node)[2]
+
+  def field(self, node, index):
+    """Return the value of field number index of node.
+
+    Child nodes are returned as NodeView objects, and list fields as
+    lists of them.
+
+    """
+    record = self.record(node)
+    schema = self._by_id[record[0]]
+    role = schema.roles[index]
+    if role == IMPLIED:
+      return schema.implied[index]
+    elif role == LINENO:
+      return record[2]
+    elif role == CHILD:
+      child = self.children(node)[schema.offsets[index]]
+      if self.record(child)[0] == self._list_id:
+        return [NodeView(self, item) for item in self.children(child)]
+      return NodeView(self, child)
+
+    scalar = record[5 + self._scalar_offsets[record[0]][index]]
+    if scalar == -1:
+      return None
+    value = self.string(scalar)
+    if role == CONSTANT and schema.fields[index] == 'int_const':
+      return int(value)
+    return value
+
+  def set_field(self, node, name, val):
+    raise ValueError('A binary Cool AST is read only')
+
+
+def load_ast(path, action_dict=ast.tuple_action_dict):
+  """Open the binary AST at path; see `class`:BinaryAst."""
+  return BinaryAst(path, action_dict)
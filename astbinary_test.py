@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+
+from nose.tools import eq_, raises
+
+import ast
+import astbinary
+import astparse
+from fixtures import sample_text, plain
+
+
+class TestBinaryAst(object):
+
+  def setup(self):
+    self.dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.dir, 'program.bin')
+    self.text = sample_text('program.ast')
+    self.program = astparse.parse_cool_ast(self.text, ast.tuple_action_dict)
+    with open(self.path, 'wb') as out:
+      astbinary.dump_ast(self.program, out)
+
+  def teardown(self):
+    shutil.rmtree(self.dir)
+
+  def test_roundtrip(self):
+    with astbinary.load_ast(self.path) as tree:
+      eq_(plain(tree.root), plain(self.program))
+      eq_(ast.ast_to_str(tree.root), self.text)
+
+  def test_lazy_fields(self):
+    with astbinary.load_ast(self.path) as tree:
+      main = tree.root.class_list[0]
+      eq_(main.name, 'Main')
+      eq_(main.lineno, 1)
+      eq_(main.features[0].init.expr_aux.int_const, 5)
+      eq_(main.features[0].init.rule_vals['type'], 'Int')
+
+  @raises(ValueError)
+  def test_read_only(self):
+    with astbinary.load_ast(self.path) as tree:
+      tree.root.class_list[0].set_val('name', 'Other')
+
+  @raises(ValueError)
+  def test_bad_magic(self):
+    with open(self.path, 'wb') as out:
+      out.write('not an ast' * 4)
+    astbinary.load_ast(self.path)
+
+  def test_bad_files_are_closed(self):
+    with open(self.path, 'rb') as dump:
+      good = dump.read()
+    fds = os.listdir('/proc/self/fd') if os.path.isdir('/proc/self/fd') else None
+    for data in ('', 'not an ast' * 4, good[:8] + '\xff' * 4 + good[12:]):
+      with open(self.path, 'wb') as out:
+        out.write(data)
+      try:
+        astbinary.load_ast(self.path)
+      except ValueError:
+        pass
+      else:
+        assert False, 'expected ValueError for %r' % data[:12]
+    if fds is not None:
+      eq_(len(os.listdir('/proc/self/fd')), len(fds))
+
+  def test_children_are_cached(self):
+    with astbinary.load_ast(self.path) as tree:
+      eq_(tree.children(0) is tree.children(0), True)
+      eq_(len(tree.children(tree.children(0)[0])), len(self.program.class_list))
+
+  @raises(ValueError)
+  def test_too_many_scalars(self):
+    old = astbinary.MAX_SCALARS
+    astbinary.MAX_SCALARS = 1
+    try:
+      with open(self.path, 'wb') as out:
+        astbinary.dump_ast(self.program, out)
+    finally:
+      astbinary.MAX_SCALARS = old
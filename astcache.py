@@ -0,0 +1,224 @@
+"""
+An on-disk cache of parsed Cool AST dumps.
+
+`class`:ParseCache keeps what parsing a dump produced under a digest of
+its text and of the action dict's node schemas, so parsing the same
+text again, in any process, is a load instead of a parse.
+
+Trees of action dicts with node schemas, like ast.tuple_action_dict and
+ast.slots_action_dict, are kept in the astbinary format: a hit maps the
+file and decodes nodes as they are read, so it costs about the same
+however large the program is.  For other action dicts, like
+ast.simple_action_dict, the action calls of the parse are kept, in the
+transfer format of astparse.replay_events, and a hit replays them; that
+skips lexing and parsing but still builds the whole tree.
+
+"""
+
+import errno
+import hashlib
+import marshal
+import os
+import struct
+
+import astbinary
+import astcolumns
+import astparse
+
+# Bump whenever the grammar or the entry formats change, so old entries
+# are never picked up.
+VERSION = 2
+
+SUFFIX = '.parse'
+
+# The default size limit of a cache, in bytes.
+MAX_SIZE = 256 << 20
+
+
+def cache_dir():
+  """Return the default directory of a `class`:ParseCache: parses under
+  astparse.table_cache_dir."""
+  return os.path.join(astparse.table_cache_dir(), 'parses')
+
+
+def schema_version(action_dict):
+  """Return a digest of the node schemas of action_dict, or None if it
+  has none, as for ast.simple_action_dict and plain dicts."""
+  if action_dict is None:
+    return None
+  schemas = astcolumns.node_schemas(action_dict)
+  if len(schemas) == 1:
+    # Only the one for lists.
+    return None
+  digest = hashlib.sha1()
+  for kind in sorted(schemas):
+    schema = schemas[kind]
+    digest.update(repr((kind, schema.rule, schema.fields, schema.roles)))
+  return digest.hexdigest()
+
+
+class ParseCache(object):
+  """Parses of AST dumps, kept in directory, by `func`:ParseCache.key.
+
+  When the files in the directory grow past max_size bytes, the least
+  recently used ones are removed.  A file's modification time records
+  its last use.  Entries are written to a private file and renamed into
+  place, so processes sharing the directory never read half an entry.
+
+  hits, misses and evictions count what this cache object has done.
+
+  """
+
+  def __init__(self, directory=None, max_size=MAX_SIZE):
+    if directory is None:
+      directory = cache_dir()
+    self.directory = directory
+    self.max_size = max_size
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def key(self, ast_text, action_dict=None):
+    """Return the name of the entry for parsing ast_text with action_dict."""
+    digest = hashlib.sha1('coolast %d %s\0' % (VERSION, schema_version(action_dict)))
+    digest.update(ast_text)
+    return digest.hexdigest()
+
+  def path(self, key):
+    return os.path.join(self.directory, key + SUFFIX)
+
+  def parse(self, ast_text, action_dict):
+    """Return what astparse.parse_cool_ast(ast_text, action_dict) would,
+    loading the parse from the cache if it is there.
+
+    A hit for an action dict with node schemas returns the root of an
+    astbinary.BinaryAst: a read only view with the interface of the
+    nodes, whose file stays open until it is collected.  Misses, and
+    hits for other action dicts, return a tree built by the actions.
+
+    Misses are parsed with the table-free parser, which raises
+    SyntaxError on malformed input; nothing is kept for those.
+
+    """
+    if schema_version(action_dict) is None:
+      return self._parse_events(ast_text, action_dict)
+
+    key = self.key(ast_text, action_dict)
+    tree = self.load(key, action_dict)
+    if tree is not None:
+      self.hits += 1
+      return tree.root
+
+    self.misses += 1
+    program = astparse.parse_cool_ast(ast_text, action_dict, 'll')
+    self.store(key, lambda out: astbinary.dump_ast(program, out, action_dict))
+    return program
+
+  def _parse_events(self, ast_text, action_dict):
+    key = self.key(ast_text)
+    events = self.load(key)
+    if events is None:
+      self.misses += 1
+      events = astparse.parse_events(ast_text)
+      self.store(key, lambda out: marshal.dump(events, out))
+    else:
+      self.hits += 1
+
+    return astparse.replay_events(events, action_dict)[0]
+
+  def load(self, key, action_dict=None):
+    """Return what is kept under key, or None if there is nothing.
+
+    That is an astbinary.BinaryAst of the tree if action_dict has node
+    schemas, else the events of the parse.
+
+    """
+    path = self.path(key)
+    try:
+      if schema_version(action_dict) is not None:
+        kept = astbinary.load_ast(path, action_dict)
+      else:
+        with open(path, 'rb') as entry:
+          data = entry.read()
+        kept = marshal.loads(data)
+    except (IOError, OSError, EOFError, ValueError, TypeError, struct.error):
+      # Missing, or truncated by hand; either way, parse again.
+      return None
+
+    try:
+      os.utime(path, None)
+    except OSError:
+      # Evicted by another process since; what was read is still good.
+      pass
+    return kept
+
+  def store(self, key, dump):
+    """Keep what dump writes to a file under key, then evict down to
+    max_size."""
+    try:
+      os.makedirs(self.directory)
+    except OSError as e:
+      if e.errno != errno.EEXIST:
+        return
+
+    path = self.path(key)
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+      with open(tmp_path, 'wb') as out:
+        dump(out)
+      os.rename(tmp_path, path)
+    except (IOError, OSError):
+      # The cache is an optimization; a read-only or full disk isn't fatal.
+      if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+      return
+
+    self.evict()
+
+  def entries(self):
+    """Return the (last use, size, path) of every entry, oldest first."""
+    entries = []
+    try:
+      names = os.listdir(self.directory)
+    except OSError:
+      return entries
+
+    for name in names:
+      if not name.endswith(SUFFIX):
+        continue
+      path = os.path.join(self.directory, name)
+      try:
+        stat = os.stat(path)
+      except OSError:
+        continue
+      entries.append((stat.st_mtime, stat.st_size, path))
+
+    entries.sort()
+    return entries
+
+  def size(self):
+    """Return the bytes the entries take up."""
+    return sum(size for _, size, _ in self.entries())
+
+  def evict(self):
+    """Remove the least recently used entries until they fit in max_size."""
+    entries = self.entries()
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+      if total <= self.max_size:
+        break
+      try:
+        os.remove(path)
+        self.evictions += 1
+      except OSError:
+        # Another process got to it first.
+        pass
+      total -= size
+
+  def clear(self):
+    """Remove every entry."""
+    for _, _, path in self.entries():
+      try:
+        os.remove(path)
+      except OSError:
+        pass
@@ -0,0 +1,102 @@
+import marshal
+import os
+import shutil
+import tempfile
+
+from nose.tools import eq_
+
+import ast
+import astcache
+import astcolumns
+import astparse
+from fixtures import sample_text
+
+
+class TestParseCache(object):
+
+  def setup(self):
+    self.dir = tempfile.mkdtemp()
+    self.cache = astcache.ParseCache(os.path.join(self.dir, 'parses'))
+    self.text = sample_text('program.ast')
+
+  def teardown(self):
+    shutil.rmtree(self.dir)
+
+  def test_hit_matches_parse(self):
+    for action_dict in (ast.simple_action_dict, ast.tuple_action_dict):
+      expected = ast.ast_to_str(astparse.parse_cool_ast(self.text, action_dict))
+      for i in range(2):
+        eq_(ast.ast_to_str(self.cache.parse(self.text, action_dict)), expected)
+
+    eq_((self.cache.hits, self.cache.misses), (2, 2))
+    eq_(self.cache.parse(self.text, ast.simple_action_dict),
+        astparse.parse_cool_ast(self.text, ast.simple_action_dict))
+
+    # Another cache over the same directory shares the entries.
+    other = astcache.ParseCache(self.cache.directory)
+    other.parse(self.text, ast.simple_action_dict)
+    eq_((other.hits, other.misses), (1, 0))
+
+  def test_schema_hit_loads_tree(self):
+    program = self.cache.parse(self.text, ast.slots_action_dict)
+    assert isinstance(program, ast.SlotsNode)
+    for action_dict in (ast.tuple_action_dict, ast.slots_action_dict):
+      program = self.cache.parse(self.text, action_dict)
+      assert isinstance(program, astcolumns.NodeView)
+      eq_(ast.ast_to_str(program), self.text)
+    eq_((self.cache.hits, self.cache.misses), (2, 1))
+
+    # Trees with the same schemas share an entry; the events have their own.
+    eq_(astcache.schema_version(ast.tuple_action_dict),
+        astcache.schema_version(ast.slots_action_dict))
+    eq_(astcache.schema_version(ast.simple_action_dict), None)
+    self.cache.parse(self.text, ast.simple_action_dict)
+    eq_(len(self.cache.entries()), 2)
+
+  def test_bad_schema_entry_is_a_miss(self):
+    self.cache.parse(self.text, ast.tuple_action_dict)
+    path = self.cache.path(self.cache.key(self.text, ast.tuple_action_dict))
+    with open(path, 'r+b') as entry:
+      entry.truncate(os.path.getsize(path) - 1)
+
+    eq_(ast.ast_to_str(self.cache.parse(self.text, ast.tuple_action_dict)), self.text)
+    eq_(self.cache.misses, 2)
+    eq_(ast.ast_to_str(self.cache.parse(self.text, ast.tuple_action_dict)), self.text)
+    eq_(self.cache.hits, 1)
+
+  def test_lru_eviction(self):
+    # Four programs whose entries are the same size.
+    texts = [self.text.replace('"test.cl"', '"test%d.cl"' % i) for i in range(4)]
+    size = len(marshal.dumps(astparse.parse_events(texts[0])))
+    self.cache.max_size = 2 * size
+
+    def use(text, last_use):
+      self.cache.parse(text, ast.simple_action_dict)
+      os.utime(self.cache.path(self.cache.key(text)), (last_use, last_use))
+
+    use(texts[0], 1)
+    use(texts[1], 2)
+    use(texts[0], 3)
+    use(texts[2], 4)
+    eq_(self.cache.evictions, 1)
+    use(texts[3], 5)
+    eq_(self.cache.evictions, 2)
+
+    kept = set(path for _, _, path in self.cache.entries())
+    eq_([self.cache.path(self.cache.key(text)) in kept for text in texts],
+        [False, False, True, True])
+    eq_((self.cache.hits, self.cache.misses), (1, 4))
+
+  def test_bad_entry_is_a_miss(self):
+    self.cache.parse(self.text, ast.simple_action_dict)
+    path = self.cache.path(self.cache.key(self.text))
+    with open(path, 'r+b') as entry:
+      entry.truncate(10)
+
+    eq_(self.cache.parse(self.text, ast.simple_action_dict),
+        astparse.parse_cool_ast(self.text, ast.simple_action_dict))
+    eq_(self.cache.misses, 2)
+    eq_(os.listdir(self.cache.directory), [os.path.basename(path)])
+
+    self.cache.clear()
+    eq_(self.cache.size(), 0)
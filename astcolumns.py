@@ -0,0 +1,451 @@
+"""
+A columnar representation of the Cool AST, for very large programs.
+
+Instead of one Python object per node, a `class`:ColumnarAst keeps each
+node's kind, line number, static type and tree links in parallel arrays,
+and the names and constants it holds in interned tables.  Whole-tree
+queries, like counting the _dispatch nodes, then run over the arrays
+(with NumPy, if it is installed) instead of walking the tree.
+
+`class`:NodeView gives the same field access as `class`:ast.ASTNode on
+top of the arrays.
+
+"""
+
+import weakref
+
+from array import array
+
+import ast
+import astparse
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+
+class InternTable(object):
+  """Give each distinct value a small, stable integer id."""
+
+  def __init__(self):
+    self.values = []
+    self.ids = {}
+
+  def intern(self, value):
+    """Return the id of value, adding it to the table if it's new."""
+    try:
+      return self.ids[value]
+    except KeyError:
+      index = self.ids[value] = len(self.values)
+      self.values.append(value)
+      return index
+
+  def find(self, value):
+    """Return the id of value, or -1 if it isn't in the table."""
+    return self.ids.get(value, -1)
+
+  def __getitem__(self, index):
+    return self.values[index]
+
+  def __len__(self):
+    return len(self.values)
+
+
+# How each field of a node is stored.
+LINENO = 0     # in the lineno column
+IMPLIED = 1    # fixed by the node's kind, like its tag, so not stored
+TYPE = 2       # the static type of an expr, in the static_type column
+CHILD = 3      # a child node, or a list of them, linked as children
+NAME = 4       # an identifier, type or file name, in the names table
+CONSTANT = 5   # a string or integer constant, in the constants table
+
+_child_fields = frozenset(['class_list', 'features', 'case_list', 'expr',
+                           'expr1', 'expr2', 'expr3', 'expr_list', 'actuals',
+                           'formals', 'init', 'expr_aux'])
+
+_constant_fields = frozenset(['int_const', 'str_const'])
+
+_implied_values = {'lparen': '(', 'rparen': ')', 'colon': ':'}
+
+# The kind of the nodes that hold the items of list fields.
+LIST_KIND = '_list'
+
+
+class NodeSchema(object):
+  """The fields of one kind of node, and how each is stored."""
+
+  def __init__(self, kind, rule, labels, tag_index):
+    self.kind = kind
+    self.rule = rule
+    self.fields = tuple(label.lower() for label in labels)
+    self.roles = []
+    self.implied = {}
+    for index, field in enumerate(self.fields):
+      if index == tag_index:
+        self.implied[index] = kind
+        role = IMPLIED
+      elif field in _implied_values:
+        self.implied[index] = _implied_values[field]
+        role = IMPLIED
+      elif field == 'lineno':
+        role = LINENO
+      elif field == 'type' and rule == 'expr':
+        role = TYPE
+      elif field in _child_fields:
+        role = CHILD
+      elif field in _constant_fields:
+        role = CONSTANT
+      else:
+        role = NAME
+      self.roles.append(role)
+
+    self.roles = tuple(self.roles)
+    self.field_index = dict((field, i) for i, field in enumerate(self.fields))
+
+    # Where each stored field is among the node's children or scalars.
+    self.offsets = []
+    children = scalars = 0
+    for role in self.roles:
+      if role == CHILD:
+        self.offsets.append(children)
+        children += 1
+      elif role == NAME or role == CONSTANT:
+        self.offsets.append(scalars)
+        scalars += 1
+      else:
+        self.offsets.append(None)
+
+
+def node_schemas(action_dict=ast.tuple_action_dict):
+  """Return the `class`:NodeSchema of each kind of node, by kind.
+
+  The schemas are the ones make_ast_node attached to the actions of
+  action_dict, plus one for LIST_KIND.
+
+  """
+  schemas = {}
+  for rule, action in action_dict.items():
+    spec = getattr(action, 'elms_spec', None)
+    if spec is None:
+      continue
+    if action.type_index is None:
+      schemas[rule] = NodeSchema(rule, rule, spec, None)
+    else:
+      for kind, labels in spec.items():
+        schemas[kind] = NodeSchema(kind, rule, labels, action.type_index)
+
+  schemas[LIST_KIND] = NodeSchema(LIST_KIND, None, (), None)
+  return schemas
+
+
+class ColumnarAst(object):
+  """A whole AST stored column by column.
+
+  Build one by parsing with its action_dict:
+
+    tree = ColumnarAst()
+    program = astparse.parse_cool_ast(text, tree.action_dict)
+
+  The program action returns a `class`:NodeView of the root; every other
+  action returns the index of the node it added.  Nodes are numbered in
+  the order they are completed, so children come before their parents.
+  Fields holding lists are stored as a child node of kind LIST_KIND.
+
+  The columns, all indexed by node, are:
+    kind           index into kinds
+    lineno         the node's line number, or -1 if it has none
+    static_type    for expr nodes, index of the type in names, else -1
+    first_child    index of the first child node, or -1
+    next_sibling   index of the next child of the same parent, or -1
+    first_scalar   where the node's names and constants start in scalars
+
+  """
+
+  def __init__(self, action_dict=ast.tuple_action_dict):
+    self.schemas = node_schemas(action_dict)
+    self.kinds = sorted(self.schemas)
+    self.kind_ids = dict((kind, i) for i, kind in enumerate(self.kinds))
+    self._by_id = [self.schemas[kind] for kind in self.kinds]
+
+    self.kind = array('H')
+    self.lineno = array('i')
+    self.static_type = array('i')
+    self.first_child = array('i')
+    self.next_sibling = array('i')
+    self.first_scalar = array('i')
+    self.scalars = array('i')
+    self.names = InternTable()
+    self.constants = InternTable()
+    self.root = -1
+
+    self.action_dict = self._make_action_dict(action_dict)
+
+  def __len__(self):
+    return len(self.kind)
+
+  def _make_action_dict(self, action_dict):
+    # The actions only reach the tree through a proxy, and the parsers
+    # built for them live on the dict, so nothing outlives the tree.
+    tree = weakref.proxy(self)
+    actions = astparse.ActionDict(action_dict)
+    for rule, action in action_dict.items():
+      spec = getattr(action, 'elms_spec', None)
+      if spec is None:
+        continue
+      if action.type_index is None:
+        actions[rule] = lambda r, p, kind=rule: tree.add_node(kind, p[1:])
+      else:
+        actions[rule] = (lambda r, p, index=action.type_index + 1:
+                         tree.add_node(p[index], p[1:]))
+
+    build_program = actions['program']
+    def program(r, p):
+      if len(p) == 1:
+        return None
+      tree.root = build_program(r, p)
+      return tree.view(tree.root)
+    actions['program'] = program
+
+    return actions
+
+  def _new_node(self, schema):
+    node = len(self.kind)
+    self.kind.append(self.kind_ids[schema.kind])
+    self.lineno.append(-1)
+    self.static_type.append(-1)
+    self.first_child.append(-1)
+    self.next_sibling.append(-1)
+    self.first_scalar.append(len(self.scalars))
+    return node
+
+  def _link_children(self, node, children):
+    prev = -1
+    for child in children:
+      if prev == -1:
+        self.first_child[node] = child
+      else:
+        self.next_sibling[prev] = child
+      prev = child
+
+  def add_list(self, items):
+    """Add a LIST_KIND node holding the node indexes in items."""
+    node = self._new_node(self.schemas[LIST_KIND])
+    self._link_children(node, items)
+    return node
+
+  def add_node(self, kind, values):
+    """Add a node of kind with the field values of its schema.
+
+    Child fields hold node indexes, or lists of them.
+
+    """
+    schema = self.schemas[kind]
+    node = self._new_node(schema)
+    children = []
+    for role, value in zip(schema.roles, values):
+      if role == CHILD:
+        if value.__class__ is list:
+          value = self.add_list(value)
+        children.append(value)
+      elif role == NAME:
+        self.scalars.append(self.names.intern(value))
+      elif role == CONSTANT:
+        self.scalars.append(self.constants.intern(value))
+      elif role == LINENO:
+        self.lineno[node] = value
+      elif role == TYPE:
+        self.static_type[node] = self.names.intern(value)
+
+    self._link_children(node, children)
+    return node
+
+  def view(self, node):
+    """Return a `class`:NodeView of the node at index node."""
+    return NodeView(self, node)
+
+  def children(self, node):
+    """Return the indexes of the children of node, in order."""
+    children = []
+    child = self.first_child[node]
+    while child != -1:
+      children.append(child)
+      child = self.next_sibling[child]
+    return children
+
+  def schema(self, node):
+    return self._by_id[self.kind[node]]
+
+  def node_type(self, node):
+    return self.kinds[self.kind[node]]
+
+  def node_lineno(self, node):
+    return self.lineno[node]
+
+  def field(self, node, index):
+    """Return the value of field number index of node.
+
+    Child nodes are returned as `class`:NodeView objects, and list fields
+    as lists of them.
+
+    """
+    schema = self._by_id[self.kind[node]]
+    role = schema.roles[index]
+    if role == IMPLIED:
+      return schema.implied[index]
+    elif role == LINENO:
+      return self.lineno[node]
+    elif role == TYPE:
+      return self.names[self.static_type[node]]
+    elif role == CHILD:
+      child = self.children(node)[schema.offsets[index]]
+      if self.kind[child] == self.kind_ids[LIST_KIND]:
+        return [NodeView(self, item) for item in self.children(child)]
+      return NodeView(self, child)
+
+    scalar = self.scalars[self.first_scalar[node] + schema.offsets[index]]
+    if role == NAME:
+      return self.names[scalar]
+    return self.constants[scalar]
+
+  def set_field(self, node, name, val):
+    """Change a stored field of node other than a child."""
+    schema = self.schema(node)
+    index = schema.field_index.get(name)
+    if index is None:
+      raise ValueError('%s has no field %s' % (self.node_type(node), name))
+
+    role = schema.roles[index]
+    if role == TYPE:
+      self.static_type[node] = self.names.intern(val)
+    elif role == LINENO:
+      self.lineno[node] = val
+    elif role == NAME:
+      self.scalars[self.first_scalar[node] + schema.offsets[index]] = \
+          self.names.intern(val)
+    elif role == CONSTANT:
+      self.scalars[self.first_scalar[node] + schema.offsets[index]] = \
+          self.constants.intern(val)
+    else:
+      raise ValueError('Field %s of %s can not be set' % (name, self.node_type(node)))
+
+  ####################################################################
+  # Bulk queries
+  ####################################################################
+
+  def column(self, name):
+    """Return a column as a NumPy array, sharing its memory.
+
+    Without NumPy, the array.array itself is returned.
+
+    """
+    column = getattr(self, name)
+    if numpy is None:
+      return column
+    return numpy.frombuffer(column, dtype=column.typecode)
+
+  def count_kind(self, kind):
+    """Return the number of nodes of kind, like '_dispatch'."""
+    kind_id = self.kind_ids.get(kind)
+    if kind_id is None:
+      return 0
+    if numpy is None:
+      return self.kind.count(kind_id)
+    return int(numpy.count_nonzero(self.column('kind') == kind_id))
+
+  def find_kind(self, kind):
+    """Return the indexes of the nodes of kind."""
+    kind_id = self.kind_ids.get(kind)
+    if kind_id is None:
+      return []
+    if numpy is None:
+      return [i for i, k in enumerate(self.kind) if k == kind_id]
+    return numpy.flatnonzero(self.column('kind') == kind_id)
+
+  def find_lines(self, first, last):
+    """Return the indexes of the nodes on lines first through last."""
+    if numpy is None:
+      return [i for i, line in enumerate(self.lineno) if first <= line <= last]
+    lineno = self.column('lineno')
+    return numpy.flatnonzero((lineno >= first) & (lineno <= last))
+
+  def find_static_type(self, type_name):
+    """Return the indexes of the expressions whose static type is type_name."""
+    type_id = self.names.find(type_name)
+    if type_id == -1:
+      return []
+    if numpy is None:
+      return [i for i, t in enumerate(self.static_type) if t == type_id]
+    return numpy.flatnonzero(self.column('static_type') == type_id)
+
+
+class NodeView(object):
+  """A node of a `class`:ColumnarAst, with the interface of ast.ASTNode.
+
+  Views are cheap and made on demand; two views of the same node are
+  equal.  Any tree with the schema, node_type, node_lineno, field and
+  set_field methods of `class`:ColumnarAst can be viewed this way.
+
+  """
+  __slots__ = ('tree', 'index')
+
+  def __init__(self, tree, index):
+    self.tree = tree
+    self.index = index
+
+  @property
+  def type(self):
+    return self.tree.node_type(self.index)
+
+  @property
+  def rule(self):
+    return self.tree.schema(self.index).rule
+
+  @property
+  def lineno(self):
+    return self.tree.node_lineno(self.index)
+
+  @property
+  def values(self):
+    tree = self.tree
+    return [tree.field(self.index, i)
+            for i in xrange(len(tree.schema(self.index).fields))]
+
+  @property
+  def items(self):
+    return zip(self.tree.schema(self.index).fields, self.values)
+
+  # Views have no fields beyond the schema.
+  schema_items = items
+
+  @property
+  def rule_vals(self):
+    """A copy of the fields of the node, by name."""
+    return dict(self.items)
+
+  def __getattr__(self, attr):
+    index = self.tree.schema(self.index).field_index.get(attr)
+    if index is None:
+      raise AttributeError('Unable to find %s' % attr)
+    return self.tree.field(self.index, index)
+
+  def set_val(self, name, val):
+    """Change a stored field other than a child.
+
+    Unlike ASTNode, new fields can't be added.
+
+    """
+    self.tree.set_field(self.index, name, val)
+
+  def __eq__(self, other):
+    return (isinstance(other, NodeView) and
+            self.tree is other.tree and self.index == other.index)
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash((id(self.tree), self.index))
+
+  def __repr__(self):
+    return '<NodeView %s #%d>' % (self.type, self.index)
@@ -0,0 +1,53 @@
+import gc
+import weakref
+
+from nose.tools import eq_
+
+import ast
+import astcolumns
+import astparse
+from fixtures import sample_text, plain
+
+
+def test_columnar_tree_matches_ast_nodes():
+  text = sample_text('program.ast')
+  tree = astcolumns.ColumnarAst()
+  program = astparse.parse_cool_ast(text, tree.action_dict, 'll')
+
+  eq_(plain(program), plain(astparse.parse_cool_ast(text, ast.tuple_action_dict)))
+  eq_(program.class_list[0].name, 'Main')
+  eq_(program.class_list[0].features[0].init.expr_aux.int_const, 5)
+  # Every line number starts a node, every ':' ends an expr, and there
+  # are 8 list fields.
+  eq_(len(tree), text.count('#') + text.count(': ') + 8)
+
+
+def test_parsed_trees_are_released():
+  text = sample_text('program.ast')
+  memos = len(astparse._memos)
+  refs = []
+  for i in range(10):
+    tree = astcolumns.ColumnarAst()
+    astparse.parse_cool_ast(text, tree.action_dict, 'll')
+    refs.append(weakref.ref(tree))
+  del tree
+  gc.collect()
+
+  eq_([ref() for ref in refs], [None] * 10)
+  eq_(len(astparse._memos), memos)
+
+
+def test_columnar_queries():
+  tree = astcolumns.ColumnarAst()
+  astparse.parse_cool_ast(sample_text('program.ast'), tree.action_dict, 'll')
+
+  eq_(tree.count_kind('_dispatch'), 1)
+  eq_(tree.count_kind('_int'), 10)
+  eq_(tree.count_kind('_missing'), 0)
+  eq_(sorted(tree.view(i).type for i in tree.find_lines(9, 9)),
+      ['_object', '_typcase'])
+  eq_(len(tree.find_static_type('Bool')), 8)
+
+  node = tree.view(tree.find_kind('_object')[0])
+  node.set_val('name', 'renamed')
+  eq_(node.name, 'renamed')
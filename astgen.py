@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+"""Generate large, well typed Cool AST dumps for tests and benchmarks.
+
+The programs are made of chains of classes, each overriding a method of
+the class it inherits from, with method bodies built from nested
+arithmetic, conditionals, lets, cases, loops, dispatches and string
+constants.  They are dumped with the static types semantic analysis
+gives them, so they can be checked against the type checker too.
+
+  python astgen.py --classes 1000 --depth 5 > big.ast
+
+"""
+
+import random
+import sys
+
+from cStringIO import StringIO
+
+import ast
+
+# Characters that string constants are made of, including some that
+# must be escaped.
+_string_chars = 'abcdefghij klmnopqrstuvwxyz,.!\n\t"\\'
+
+
+def _node(rule, *values):
+  return ast.slots_action_dict[rule](rule, [None] + list(values))
+
+
+def _expr(lineno, tag, static_type, *fields):
+  return _node('expr', _node('expr_aux', lineno, tag, *fields), ':', static_type)
+
+
+class ProgramGenerator(object):
+  """Makes the nodes of a synthetic program; see `func`:write_program.
+
+  The knobs are:
+
+    classes         how many classes, besides Main
+    depth           how many classes each inheritance chain holds
+    methods         methods each class defines, besides f
+    method_size     expressions in the block of each method body
+    nesting         how deeply each of those expressions nests
+    string_length   characters in each string constant
+
+  """
+
+  def __init__(self, classes=10, depth=3, methods=2, method_size=5, nesting=4,
+               string_length=16, seed=0):
+    self.classes = classes
+    self.depth = max(depth, 1)
+    self.methods = methods
+    self.method_size = method_size
+    self.nesting = nesting
+    self.string_length = string_length
+    self.random = random.Random(seed)
+    self.lineno = 0
+
+  def next_line(self):
+    self.lineno += 1
+    return self.lineno
+
+  def string(self):
+    return ''.join(self.random.choice(_string_chars)
+                   for _ in xrange(self.string_length))
+
+  def iter_classes(self):
+    """Yield Main and then every generated class node."""
+    yield self.main_class()
+    for i in xrange(self.classes):
+      yield self.make_class(i)
+
+  def main_class(self):
+    lineno = self.next_line()
+    out = _expr(lineno, '_dispatch', 'SELF_TYPE',
+                _expr(lineno, '_object', 'SELF_TYPE', 'self'), 'out_string',
+                [_expr(lineno, '_string', 'String', self.string())])
+    body = [out]
+    body_type = 'SELF_TYPE'
+    if self.classes:
+      body.append(_expr(lineno, '_dispatch', 'Int',
+                        _expr(lineno, '_new', 'C0', 'C0'), 'f',
+                        [_expr(lineno, '_int', 'Int', 1)]))
+      body_type = 'Int'
+    main = _node('feature', lineno, '_method', 'main', [], 'Object',
+                 _expr(lineno, '_block', body_type, body))
+    return _node('class', lineno, '_class', 'Main', 'IO', 'gen.cl', '(', [main], ')')
+
+  def make_class(self, index):
+    name = 'C%d' % index
+    parent = index % self.depth and 'C%d' % (index - 1) or 'Object'
+    lineno = self.next_line()
+    prefix = name.lower()
+    self.attrs = [prefix + '_n', prefix + '_s']
+    features = [
+      _node('feature', lineno, '_attr', self.attrs[0], 'Int',
+            _expr(lineno, '_int', 'Int', self.random.randrange(100))),
+      _node('feature', lineno, '_attr', self.attrs[1], 'String',
+            _expr(lineno, '_string', 'String', self.string())),
+    ]
+    names = ['f'] + ['%s_m%d' % (prefix, j) for j in xrange(self.methods)]
+    for method in names:
+      features.append(self.make_method(method))
+    return _node('class', lineno, '_class', name, parent, 'gen.cl', '(', features, ')')
+
+  def make_method(self, name):
+    lineno = self.next_line()
+    formals = [_node('formal', lineno, '_formal', 'x', 'Int')]
+    body = [self.statement() for _ in xrange(self.method_size - 1)]
+    body.append(self.int_expr(self.nesting))
+    block = _expr(lineno, '_block', 'Int', body)
+    return _node('feature', lineno, '_method', name, formals, 'Int', block)
+
+  def statement(self):
+    """Return an expression to run for its effect, of any type."""
+    choice = self.random.randrange(4)
+    lineno = self.next_line()
+    if choice == 0:
+      return _expr(lineno, '_assign', 'Int', self.attrs[0], self.int_expr(self.nesting))
+    elif choice == 1:
+      condition = _expr(lineno, '_lt', 'Bool', self.leaf(lineno),
+                        _expr(lineno, '_int', 'Int', 0))
+      step = _expr(lineno, '_assign', 'Int', 'x',
+                   _expr(lineno, '_plus', 'Int', _expr(lineno, '_object', 'Int', 'x'),
+                         _expr(lineno, '_int', 'Int', 1)))
+      return _expr(lineno, '_loop', 'Object', condition, step)
+    elif choice == 2:
+      return _expr(lineno, '_assign', 'String', self.attrs[1],
+                   _expr(lineno, '_string', 'String', self.string()))
+    return self.int_expr(self.nesting)
+
+  def leaf(self, lineno):
+    """Return a small expression of type Int."""
+    choice = self.random.randrange(5)
+    if choice == 0:
+      return _expr(lineno, '_int', 'Int', self.random.randrange(1000))
+    elif choice == 1:
+      return _expr(lineno, '_object', 'Int', 'x')
+    elif choice == 2:
+      return _expr(lineno, '_object', 'Int', self.attrs[0])
+    elif choice == 3:
+      return _expr(lineno, '_dispatch', 'Int',
+                   _expr(lineno, '_string', 'String', self.string()), 'length', [])
+    return _expr(lineno, '_dispatch', 'Int',
+                 _expr(lineno, '_object', 'SELF_TYPE', 'self'), 'f',
+                 [_expr(lineno, '_int', 'Int', 0)])
+
+  def int_expr(self, nesting):
+    """Return an expression of type Int that nests nesting deep.
+
+    It is built from the inside out, so nesting isn't limited by the
+    recursion limit.
+
+    """
+    lineno = self.lineno
+    expr = self.leaf(lineno)
+    for level in xrange(nesting):
+      choice = self.random.randrange(7)
+      if choice < 3:
+        tag = ('_plus', '_sub', '_mul')[choice]
+        expr = _expr(lineno, tag, 'Int', expr, self.leaf(lineno))
+      elif choice == 3:
+        expr = _expr(lineno, '_neg', 'Int', expr)
+      elif choice == 4:
+        condition = _expr(lineno, '_lt', 'Bool', self.leaf(lineno), self.leaf(lineno))
+        expr = _expr(lineno, '_cond', 'Int', condition, expr, self.leaf(lineno))
+      elif choice == 5:
+        expr = _expr(lineno, '_let', 'Int', 'v%d' % level, 'Int', self.leaf(lineno), expr)
+      else:
+        branches = [_node('simple_case', lineno, '_branch', 'i', 'Int', expr),
+                    _node('simple_case', lineno, '_branch', 'o', 'Object',
+                          self.leaf(lineno))]
+        expr = _expr(lineno, '_typcase', 'Int', self.leaf(lineno), branches)
+    return expr
+
+
+def write_program(out, **knobs):
+  """Write a synthetic program to the file-like out, one class at a time.
+
+  See `class`:ProgramGenerator for the knobs.
+
+  """
+  generator = ProgramGenerator(**knobs)
+  out.write('#1\n_program\n')
+  for cls in generator.iter_classes():
+    ast.write_ast(cls, out, indent=2)
+
+
+def generate_program(**knobs):
+  """Return the text of a synthetic program; see `func`:write_program."""
+  out = StringIO()
+  write_program(out, **knobs)
+  return out.getvalue()
+
+
+def main(argv):
+  knobs = {}
+  args = iter(argv)
+  for arg in args:
+    if not arg.startswith('--'):
+      raise SystemExit('usage: astgen.py [--knob value]...')
+    knobs[arg[2:].replace('-', '_')] = int(next(args))
+
+  write_program(sys.stdout, **knobs)
+
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,35 @@
+from nose.tools import eq_
+
+import ast
+import astgen
+import astparse
+import semant
+
+KNOBS = dict(classes=8, depth=3, methods=1, method_size=3, nesting=5,
+             string_length=12, seed=5)
+
+
+def test_parses_with_both_engines():
+  text = astgen.generate_program(**KNOBS)
+  for engine in ('lalr', 'll'):
+    program = astparse.parse_cool_ast(text, ast.tuple_action_dict, engine)
+    eq_(len(program.class_list), 9)
+    eq_(ast.ast_to_str(program), text)
+
+
+def test_types_match_type_checker():
+  text = astgen.generate_program(**KNOBS)
+  program = astparse.parse_cool_ast(text.replace(': Int\n', ': _no_type\n'),
+                                    ast.tuple_action_dict, 'll')
+  eq_(semant.check_program(program).errors, [])
+  eq_(ast.ast_to_str(program), text)
+
+
+def test_knobs():
+  eq_(astgen.generate_program(**KNOBS), astgen.generate_program(**KNOBS))
+  text = astgen.generate_program(classes=6, depth=3, nesting=2000, method_size=1,
+                                 methods=0, string_length=100)
+  program = astparse.parse_cool_ast(text, ast.slots_action_dict, 'll')
+  eq_([cls.parent for cls in program.class_list],
+      ['IO', 'Object', 'C0', 'C1', 'Object', 'C3', 'C4'])
+  eq_(len(program.class_list[1].features[1].init.expr_aux.str_const), 100)
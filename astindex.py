@@ -0,0 +1,147 @@
+"""
+An index of a parsed Cool AST for position queries.
+
+Nodes don't point to their parents, so questions like "which method is
+this node in" or "which nodes are on line 12" would each need a walk of
+the whole tree.  `class`:AstIndex walks it once and answers them from
+tables: parents and enclosing classes and methods by lookup, and line
+queries by bisecting sorted line numbers.
+
+The tree must not change while an index of it is in use.
+
+"""
+
+from bisect import bisect_left, bisect_right
+
+from traverse import children
+
+
+class AstIndex(object):
+  """Parents, enclosing classes and methods, and lines of the nodes under
+  root.
+
+  Nodes are looked up by identity.  lines holds the line numbers of the
+  nodes that have one, sorted, and line_nodes the nodes in the same
+  order; nodes on one line are in pre-order.  Nodes without a line
+  number, like those of the expr rule, are left out of line queries;
+  their expr_aux child has the line.
+
+  """
+
+  def __init__(self, root):
+    self.root = root
+    # id(node) -> (parent, enclosing class, enclosing method)
+    self._info = {}
+    located = []
+    # Line spans of classes and methods, as [first, last, node].
+    class_spans = []
+    method_spans = []
+
+    stack = [(root, None, None, None, None, None)]
+    order = 0
+    while stack:
+      node, parent, cls, method, cls_span, method_span = stack.pop()
+      kind = node.type
+      if kind == '_class':
+        cls = node
+        cls_span = [None, None, node]
+        class_spans.append(cls_span)
+      elif kind == '_method':
+        method = node
+        method_span = [None, None, node]
+        method_spans.append(method_span)
+      self._info[id(node)] = (parent, cls, method)
+
+      lineno = getattr(node, 'lineno', None)
+      if lineno is not None:
+        located.append((lineno, order, node))
+        for span in (cls_span, method_span):
+          if span is not None:
+            if span[0] is None or lineno < span[0]:
+              span[0] = lineno
+            if span[1] is None or lineno > span[1]:
+              span[1] = lineno
+      order += 1
+
+      stack.extend((child, node, cls, method, cls_span, method_span)
+                   for child in reversed(children(node)))
+
+    located.sort()
+    self.lines = [lineno for lineno, _, _ in located]
+    self.line_nodes = [node for _, _, node in located]
+    self._class_spans = self._sorted_spans(class_spans)
+    self._method_spans = self._sorted_spans(method_spans)
+
+  def _sorted_spans(self, spans):
+    """Return the starts of spans and the spans, sorted by start, and a
+    sparse table of the last line runs of them reach.
+
+    reach[j][i] is the last line of spans i to i + 2**j - 1.
+
+    """
+    spans = sorted((span for span in spans if span[0] is not None),
+                   key=lambda span: (span[0], span[1]))
+    reach = [[span[1] for span in spans]]
+    width = 1
+    while 2 * width <= len(spans):
+      last = reach[-1]
+      reach.append([max(last[i], last[i + width])
+                    for i in xrange(len(last) - width)])
+      width *= 2
+    return [span[0] for span in spans], spans, reach
+
+  def __len__(self):
+    return len(self._info)
+
+  def __contains__(self, node):
+    return id(node) in self._info
+
+  def parent(self, node):
+    """Return the node node is a child of, or None for the root."""
+    return self._info[id(node)][0]
+
+  def ancestors(self, node):
+    """Yield the parent of node, its parent, and so on up to the root."""
+    node = self.parent(node)
+    while node is not None:
+      yield node
+      node = self.parent(node)
+
+  def enclosing_class(self, node):
+    """Return the _class node node is in, or is."""
+    return self._info[id(node)][1]
+
+  def enclosing_method(self, node):
+    """Return the _method node node is in, or is, or None outside methods."""
+    return self._info[id(node)][2]
+
+  def nodes_on_line(self, lineno):
+    """Return the nodes on line lineno."""
+    return self.nodes_between(lineno, lineno)
+
+  def nodes_between(self, first, last):
+    """Return the nodes on lines first to last, inclusive, by line."""
+    return self.line_nodes[bisect_left(self.lines, first):
+                           bisect_right(self.lines, last)]
+
+  def class_at(self, lineno):
+    """Return the _class node whose lines hold lineno, or None."""
+    return self._span_at(self._class_spans, lineno)
+
+  def method_at(self, lineno):
+    """Return the _method node whose lines hold lineno, or None."""
+    return self._span_at(self._method_spans, lineno)
+
+  def _span_at(self, spans, lineno):
+    starts, spans, reach = spans
+    # The span is the last one starting at or before lineno that reaches
+    # it.  Skip back over the runs of spans that end too soon, largest
+    # first, so it takes O(log n) steps however the spans overlap.
+    end = bisect_right(starts, lineno)
+    for j in xrange(len(reach) - 1, -1, -1):
+      width = 1 << j
+      if end >= width and reach[j][end - width] < lineno:
+        end -= width
+    if end:
+      return spans[end - 1][2]
+    return None
@@ -0,0 +1,94 @@
+import random
+
+from nose.tools import eq_
+
+import ast
+import astgen
+import astindex
+import astparse
+import traverse
+from fixtures import sample_text
+
+
+def walk_enclosing(root, target):
+  """Find the class and method around target by searching from root."""
+  stack = [(root, None, None)]
+  while stack:
+    node, cls, method = stack.pop()
+    if node.type == '_class':
+      cls = node
+    elif node.type == '_method':
+      method = node
+    if node is target:
+      return cls, method
+    stack.extend((child, cls, method) for child in traverse.children(node))
+
+
+class TestAstIndex(object):
+
+  def setup(self):
+    self.program = astparse.parse_cool_ast(sample_text('program.ast'),
+                                           ast.tuple_action_dict)
+    self.index = astindex.AstIndex(self.program)
+
+  def test_parents(self):
+    nodes = list(traverse.preorder(self.program))
+    eq_(len(self.index), len(nodes))
+    eq_(self.index.parent(self.program), None)
+    for node in nodes:
+      for child in traverse.children(node):
+        assert self.index.parent(child) is node
+      assert node in self.index
+
+    leaf = self.index.nodes_on_line(5)[-1]
+    eq_([node.rule for node in self.index.ancestors(leaf)][-3:],
+        ['feature', 'class', 'program'])
+
+  def test_enclosing(self):
+    main = self.program.class_list[0]
+    method = main.features[2]
+    eq_(self.index.enclosing_class(main) is main, True)
+    eq_(self.index.enclosing_method(main.features[0]), None)
+    eq_(self.index.enclosing_method(method.expr) is method, True)
+    for node in traverse.preorder(self.program):
+      cls, method = walk_enclosing(self.program, node)
+      assert self.index.enclosing_class(node) is cls
+      assert self.index.enclosing_method(node) is method
+
+  def test_lines(self):
+    eq_([node.type for node in self.index.nodes_on_line(9)], ['_typcase', '_object'])
+    eq_([node.type for node in self.index.nodes_on_line(10)], ['_branch', '_bool'])
+    eq_(self.index.nodes_on_line(12), [])
+    eq_(len(self.index.nodes_between(9, 11)), 8)
+    eq_([node.lineno for node in self.index.line_nodes], sorted(self.index.lines))
+
+
+def test_spans():
+  program = astparse.parse_cool_ast(astgen.generate_program(classes=3),
+                                    ast.tuple_action_dict)
+  index = astindex.AstIndex(program)
+  for cls in program.class_list:
+    for feature in cls.features:
+      if feature.type == '_method':
+        lines = [node.lineno for node in traverse.preorder(feature)
+                 if getattr(node, 'lineno', None) is not None]
+        for lineno in lines:
+          assert index.method_at(lineno) is feature
+          assert index.class_at(lineno) is cls
+  eq_(index.method_at(10 ** 6), None)
+  eq_(index.class_at(0), None)
+
+
+def test_overlapping_spans():
+  index = astindex.AstIndex(astparse.parse_cool_ast(sample_text('program.ast'),
+                                                    ast.tuple_action_dict))
+  rand = random.Random(0)
+  spans = []
+  for i in range(200):
+    first = rand.randint(1, 500)
+    spans.append([first, first + rand.choice([0, 1, 5, 50, 400]), 'span%d' % i])
+  starts, ordered, reach = spans = index._sorted_spans(spans)
+
+  for lineno in range(0, 1000):
+    found = [span[2] for span in ordered if span[0] <= lineno <= span[1]]
+    eq_(index._span_at(spans, lineno), found and found[-1] or None)
@@ -9,6 +9,19 @@ analysis phase or the code generation phase.
 
 import sys
 import os
+import re
+import copy
+import gc
+import hashlib
+import itertools
+import marshal
+import multiprocessing
+import time
+import types
+
+from collections import defaultdict, deque
+
+from brownie.datastructures import OrderedDict
 
 import ply.lex as lex
 import ply.yacc as yacc
@@ -61,52 +74,166 @@ tokens = (
   'ID',
   )
 
+# Keywords of the AST dump and their token types.
+reserved_words = {
+  '_assign': 'ASSIGN',
+  '_attr': 'ATTR',
+  '_block': 'BLOCK',
+  '_bool': 'BOOL',
+  '_branch': 'BRANCH',
+  '_class': 'CLASS',
+  '_comp': 'COMP',
+  '_cond': 'COND',
+  '_dispatch': 'DISPATCH',
+  '_divide': 'DIVIDE',
+  '_eq': 'EQ',
+  '_formal': 'FORMAL',
+  '_int': 'INT',
+  '_isvoid': 'ISVOID',
+  '_leq': 'LEQ',
+  '_let': 'LET',
+  '_loop': 'LOOP',
+  '_lt': 'LT',
+  '_method': 'METHOD',
+  '_mul': 'MUL',
+  '_neg': 'NEG',
+  '_new': 'NEW',
+  '_no_expr': 'NO_EXPR',
+  '_no_type': 'NO_TYPE',
+  '_object': 'OBJECT',
+  '_plus': 'PLUS',
+  '_program': 'PROGRAM',
+  '_static_dispatch': 'STATIC_DISPATCH',
+  '_string': 'STR',
+  '_sub': 'SUB',
+  '_typcase': 'TYPCASE',
+}
+
+# Base name of the pickled LALR tables.  The PLY table version and a hash
+# of the grammar are appended, so stale tables are never picked up.
+TABLE_NAME = 'coolast_parsetab'
+
+# The LRParser built from the cached tables, shared by every parser.
+_lr_parser = None
+
+# The lexer every parser clones, so the master regex is compiled only once.
+_lexer = None
+
+# How many plain action dicts keep their memoized parsers and wrappers.
+CACHE_SIZE = 32
+
+# Objects memoized for plain dicts, keyed by the id of the dict and a name,
+# least recently used first.  An ActionDict keeps its own instead.
+_memos = OrderedDict()
+
+
+class ActionDict(dict):
+  """An action dict that carries the parsers and wrappers built for it.
+
+  They go away with the dict, so a dict built per tree or per run can be
+  passed to `func`:get_parser without being pinned by the module.  Plain
+  dicts share a cache of the `data`:CACHE_SIZE most recently used.
+
+  """
+
+  def __init__(self, *args, **kwargs):
+    dict.__init__(self, *args, **kwargs)
+    self.cache = {}
+
+
+def _memo(action_dict, name, make):
+  """Return the object memoized for action_dict under name.
+
+  make is called with no arguments to build it the first time.
+
+  """
+  cache = getattr(action_dict, 'cache', None)
+  if cache is not None:
+    if name not in cache:
+      cache[name] = make()
+    return cache[name]
+
+  key = (id(action_dict), name)
+  entry = _memos.pop(key, None)
+  # Holding on to the dict keeps its id from being reused.
+  if entry is None or entry[0] is not action_dict:
+    entry = (action_dict, make())
+  _memos[key] = entry
+  while len(_memos) > CACHE_SIZE:
+    del _memos[next(iter(_memos))]
+  return entry[1]
+
 
 ######################################################################
 # Lexer code.
 ######################################################################
 
-def build_ast_lexer():
+# Escapes coolc writes in string constants: the usual C ones, plus \ooo
+# octal for unprintable characters.  Any other escaped character stands for
+# itself, as in the Cool lexer.
+_escape_re = re.compile(r'\\([0-7]{3}|.|\n)')
+
+_escapes = {
+  'b': '\b',
+  't': '\t',
+  'n': '\n',
+  'f': '\f',
+}
+
+
+def _decode_escape(match):
+  escape = match.group(1)
+  if len(escape) == 3:
+    return chr(int(escape, 8))
+  return _escapes.get(escape, escape)
+
+
+def unescape_string(text):
+  """Decode the escapes in the body of a string constant."""
+  if '\\' not in text:
+    return text
+  return _escape_re.sub(_decode_escape, text)
+
+
+# Characters coolc escapes when it writes a string constant: everything
+# but the printable ASCII characters, and the quote and backslash.
+_escaped_re = re.compile(r'[^\x20\x21\x23-\x5b\x5d-\x7e]')
+
+_escaped_chars = {
+  '\\': '\\\\',
+  '"': '\\"',
+  '\n': '\\n',
+  '\t': '\\t',
+  '\b': '\\b',
+  '\f': '\\f',
+}
+
+
+def _encode_escape(match):
+  char = match.group(0)
+  return _escaped_chars.get(char) or '\\%03o' % ord(char)
+
+
+def escape_string(text):
+  """Escape text the way coolc's print_escaped_string does."""
+  return _escaped_re.sub(_encode_escape, text)
+
+
+def build_ast_lexer(fast_strings=True):
+  """Build a lexer for the Cool AST.
+
+  By default string constants are read with a single regular expression.
+  Pass fast_strings=False to use the older lexer state that reads them
+  one character at a time.  It only understands the \\b, \\t, \\n
+  and \\f escapes.
+
+  """
 
   # punctuation
   t_COLON = r':'
   t_LPAREN = r'\('
   t_RPAREN = r'\)'
 
-  reserved_words = {
-    '_assign': 'ASSIGN',
-    '_attr': 'ATTR',
-    '_block': 'BLOCK',
-    '_bool': 'BOOL',
-    '_branch': 'BRANCH',
-    '_class': 'CLASS',
-    '_comp': 'COMP',
-    '_cond': 'COND',
-    '_dispatch': 'DISPATCH',
-    '_divide': 'DIVIDE',
-    '_eq': 'EQ',
-    '_formal': 'FORMAL',
-    '_int': 'INT',
-    '_isvoid': 'ISVOID',
-    '_leq': 'LEQ',
-    '_let': 'LET',
-    '_loop': 'LOOP',
-    '_lt': 'LT',
-    '_method': 'METHOD',
-    '_mul': 'MUL',
-    '_neg': 'NEG',
-    '_new': 'NEW',
-    '_no_expr': 'NO_EXPR',
-    '_no_type': 'NO_TYPE',
-    '_object': 'OBJECT',
-    '_plus': 'PLUS',
-    '_program': 'PROGRAM',
-    '_static_dispatch': 'STATIC_DISPATCH',
-    '_string': 'STR',
-    '_sub': 'SUB',
-    '_typcase': 'TYPCASE',
-  }
-
   def t_newline(t):
     r'\n+'
     t.lexer.lineno += len(t.value)
@@ -115,6 +242,8 @@ def build_ast_lexer():
   def t_INT_CONST(t):
     r'[0-9]+'
     t.value = int(t.value)
+    if t.lexer.tables is not None:
+      t.value = t.lexer.tables.inttable.add(t.value)
     return t
 
   def t_LINENO(t):
@@ -125,40 +254,48 @@ def build_ast_lexer():
   def t_ID(t):
     r'[a-zA-Z0-9_]+'
     t.type = reserved_words.get(t.value, 'ID')
+    if t.lexer.tables is not None and (t.type == 'ID' or t.type == 'NO_TYPE'):
+      t.value = t.lexer.tables.idtable.add(t.value)
     return t
 
-  states = (
-    ('STRING', 'exclusive'),
-  )
-  def t_STR_CONST(t):
-    r'\"'
-    t.lexer.begin('STRING')
-
-  def t_STRING_escape_chars(t):
-    r'\\(.|\n)'
-    lexer.string_builder += {
-      'b': '\b',
-      't': '\t',
-      'n': '\n',
-      'f': '\f',
-    }[t.value[1]]
-
-  def t_STRING_end_quote(t):
-    r'\"'
-    t.lexer.begin('INITIAL')
-    t.type = 'STR_CONST'
-    t.value = lexer.string_builder
-    lexer.string_builder = ''
-    return t
+  if fast_strings:
+    # Match the whole constant at once and only decode it if it has escapes.
+    def t_STR_CONST(t):
+      r'\"(?:[^"\\\n]|\\(?:.|\n))*\"'
+      t.value = unescape_string(t.value[1:-1])
+      if t.lexer.tables is not None:
+        t.value = t.lexer.tables.stringtable.add(t.value)
+      return t
+  else:
+    states = (
+      ('STRING', 'exclusive'),
+    )
+    def t_begin_string(t):
+      r'\"'
+      t.lexer.begin('STRING')
 
-  def t_STRING_any_char(t):
-    r'.'
-    lexer.string_builder += t.value
+    def t_STRING_escape_chars(t):
+      r'\\(.|\n)'
+      t.lexer.string_builder += _escapes[t.value[1]]
 
-  t_STRING_ignore = ''
-  def t_STRING_error(t):
-    print 'ran into error char: %s' % t.value[0]
-    sys.exit(1)
+    def t_STRING_end_quote(t):
+      r'\"'
+      t.lexer.begin('INITIAL')
+      t.type = 'STR_CONST'
+      t.value = t.lexer.string_builder
+      t.lexer.string_builder = ''
+      if t.lexer.tables is not None:
+        t.value = t.lexer.tables.stringtable.add(t.value)
+      return t
+
+    def t_STRING_any_char(t):
+      r'.'
+      t.lexer.string_builder += t.value
+
+    t_STRING_ignore = ''
+    def t_STRING_error(t):
+      print 'ran into error char: %s' % t.value[0]
+      sys.exit(1)
 
   t_ignore = ' \t\r'
 
@@ -171,6 +308,8 @@ def build_ast_lexer():
 
   # Add any state variables needed
   lexer.string_builder = ''
+  # The stringtab.Tables to add identifiers and constants to, if any.
+  lexer.tables = None
 
   return lexer
 
@@ -305,16 +444,1233 @@ def build_ast_parser(action_dict):
   def p_error(p):
     print "Syntax error in input!: %s" % p
 
-  return yacc.yacc()
+  rules = dict((name, fn) for name, fn in locals().items()
+               if name.startswith('p_'))
+  return _bind_parser(rules)
+
+
+def table_cache_dir():
+  """Return the directory the pickled parse tables are cached in.
+
+  This is $COOLAST_CACHE_DIR if it is set, otherwise coolast under
+  $XDG_CACHE_HOME (~/.cache by default).
+
+  """
+  cache_dir = os.environ.get('COOLAST_CACHE_DIR')
+  if cache_dir:
+    return cache_dir
+
+  cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+  return os.path.join(cache_home, 'coolast')
+
+
+def _table_filename(signature):
+  return '%s-%s-%s.pickle' % (TABLE_NAME, yacc.__tabversion__,
+                              hashlib.md5(signature).hexdigest()[:12])
+
+
+def _grammar_module(rules):
+  """Wrap the grammar rules in a module object for yacc's reflection."""
+  module = types.ModuleType(TABLE_NAME)
+  module.__dict__.update(rules)
+  module.__file__ = __file__
+  module.tokens = tokens
+  return module
+
+
+def _grammar_signature(module):
+  pinfo = yacc.ParserReflect(dict((k, getattr(module, k)) for k in dir(module)),
+                             log=yacc.NullLogger())
+  pinfo.get_all()
+  return pinfo.signature()
+
+
+def _read_parse_table(path, signature):
+  """Load pickled tables from path, or None if they are missing or stale."""
+  if not os.path.exists(path):
+    return None
+
+  table = yacc.LRTable()
+  try:
+    if table.read_pickle(path) == signature:
+      return table
+  except Exception:
+    # A truncated or foreign file is treated like a missing one.
+    pass
+
+  return None
+
+
+def _writable_cache_dir():
+  cache_dir = table_cache_dir()
+  try:
+    os.makedirs(cache_dir)
+  except OSError:
+    if not os.path.isdir(cache_dir):
+      return None
+
+  return cache_dir
+
+
+def _load_lr_parser(rules):
+  """Build the shared LRParser, from cached tables when possible.
+
+  The tables are looked up next to this module first (so they can be
+  shipped with the package) and then in `func`:table_cache_dir.  If
+  neither has them, they are generated and written to the cache
+  directory.  Nothing is ever written to the current directory.
+
+  """
+  module = _grammar_module(rules)
+  signature = _grammar_signature(module)
+  filename = _table_filename(signature)
+
+  for table_dir in (os.path.dirname(os.path.abspath(__file__)), table_cache_dir()):
+    table = _read_parse_table(os.path.join(table_dir, filename), signature)
+    if table is not None:
+      return yacc.LRParser(table, None)
+
+  cache_dir = _writable_cache_dir()
+  path = tmp_path = None
+  if cache_dir:
+    path = os.path.join(cache_dir, filename)
+    # Write to a private file first so concurrent builds never see half a table.
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+
+  parser = yacc.yacc(module=module, tabmodule=TABLE_NAME, debug=False,
+                     write_tables=False, picklefile=tmp_path)
+
+  if tmp_path and os.path.exists(tmp_path):
+    try:
+      os.rename(tmp_path, path)
+    except OSError:
+      os.remove(tmp_path)
+
+  return parser
+
+
+def _bind_parser(rules):
+  """Return a new LRParser over the shared tables that calls rules."""
+  global _lr_parser
+  if _lr_parser is None:
+    _lr_parser = _load_lr_parser(rules)
+
+  parser = copy.copy(_lr_parser)
+  parser.productions = [copy.copy(prod) for prod in _lr_parser.productions]
+  for prod in parser.productions:
+    prod.bind(rules)
+  parser.errorfunc = rules['p_error']
+
+  return parser
+
+
+class AstParser(object):
+  """A reusable parser for the Cool AST.
+
+  The lexer and LALR tables are built once, when the parser is created,
+  and each call to `func`:parse only resets their state.  The parser is
+  bound to a single action dictionary for its whole life.
+
+  A parser is not thread safe; use one per thread.
+
+  """
+
+  def __init__(self, action_dict):
+    global _lexer
+    if _lexer is None:
+      _lexer = build_ast_lexer()
+
+    self.action_dict = action_dict
+    self.lexer = _lexer.clone()
+    self.parser = build_ast_parser(action_dict)
+
+  def parse(self, ast_text, tables=None):
+    """Parse ast_text and return the result of the program action.
+
+    If tables is a `class`:stringtab.Tables, the identifiers and
+    constants read are added to it, and the nodes get its copies.
+
+    """
+    self.lexer.lineno = 1
+    self.lexer.begin('INITIAL')
+    self.lexer.string_builder = ''
+    self.lexer.tables = tables
+    try:
+      return self.parser.parse(ast_text, lexer=self.lexer)
+    finally:
+      self.lexer.tables = None
+      # PLY keeps its stacks, and the tree on them, until the next parse.
+      self.parser.restart()
+
+
+######################################################################
+# Table-free parser
+######################################################################
+
+# The AST dump is in prefix form: every node starts with a line number and
+# a tag, and the tag fixes the fields that follow.  That makes it LL(1), so
+# it can be parsed by dispatching on the tag instead of with LALR tables.
+
+# One alternative per kind of token.  The last one catches any character
+# that can't start a token, so findall never skips over bad input.
+_token_re = re.compile(r'[ \t\r\n]*(?:'
+                       r'\#([0-9]+)|'
+                       r'("(?:[^"\\\n]|\\(?:.|\n))*")|'
+                       r'([0-9]+)|'
+                       r'([a-zA-Z0-9_]+)|'
+                       r'([:()])|'
+                       r'(\S))')
+
+# A raw token is the tuple of groups findall returns for it.  Exactly one
+# of them is non-empty.
+_LINENO_GROUP, _STR_GROUP, _INT_GROUP, _WORD_GROUP, _PUNCT_GROUP = range(5)
+
+_END = ('',) * 6
+
+# Scan text in pieces of about this many characters, so the raw tokens of
+# only one piece are held at a time.
+CHUNK_SIZE = 1 << 20
+
+
+def text_chunks(text, size=CHUNK_SIZE):
+  """Split text into pieces that end at line breaks outside of strings."""
+  start = 0
+  end = len(text)
+  while start < end:
+    stop = text.find('\n', start + size)
+    # A string constant can only span lines after a backslash.
+    while stop != -1 and text[stop - 1] == '\\':
+      stop = text.find('\n', stop + 1)
+    if stop == -1:
+      stop = end
+    yield text[start:stop + 1]
+    start = stop + 1
+
+
+def file_chunks(ast_file, size=CHUNK_SIZE):
+  """Read ast_file in pieces that end at line breaks outside of strings."""
+  while True:
+    chunk = ast_file.read(size)
+    if not chunk:
+      break
+    if not chunk.endswith('\n'):
+      chunk += ast_file.readline()
+    # A string constant can only span lines after a backslash.
+    while chunk.endswith('\\\n'):
+      line = ast_file.readline()
+      if not line:
+        break
+      chunk += line
+    yield chunk
+
+
+def buffer_chunks(data, size=CHUNK_SIZE):
+  """Split data into str pieces that end at line breaks outside of strings.
+
+  data is any buffer that slices: a str, bytearray, memoryview or mmap.
+  Only one piece is copied out of it at a time, so an mmap'ed dump is
+  never held in memory whole.
+
+  """
+  start = 0
+  end = len(data)
+  while start < end:
+    chunk = _buffer_slice(data, start, start + size)
+    stop = start + len(chunk)
+    # Read on to a line break; a string constant can only span lines
+    # after a backslash.
+    while stop < end and (not chunk.endswith('\n') or chunk.endswith('\\\n')):
+      piece = _buffer_slice(data, stop, stop + 256)
+      newline = piece.find('\n')
+      if newline != -1:
+        piece = piece[:newline + 1]
+      chunk += piece
+      stop += len(piece)
+    yield chunk
+    start = stop
+
+
+def _buffer_slice(data, start, stop):
+  piece = data[start:stop]
+  if hasattr(piece, 'tobytes'):
+    return piece.tobytes()
+  return str(piece)
+
+
+def raw_tokens(chunks):
+  """Return an iterator over the raw tokens of the chunks of an AST dump."""
+  return itertools.chain.from_iterable(itertools.imap(_token_re.findall, chunks))
+
+
+def token_value(token):
+  """Return the (type, value) pair the PLY lexer would give a raw token."""
+  lineno, string, integer, word, punct = token[:5]
+  if lineno:
+    return 'LINENO', int(lineno)
+  elif word:
+    return reserved_words.get(word, 'ID'), word
+  elif string:
+    return 'STR_CONST', unescape_string(string[1:-1])
+  elif integer:
+    return 'INT_CONST', int(integer)
+  elif punct:
+    return {':': 'COLON', '(': 'LPAREN', ')': 'RPAREN'}[punct], punct
+  elif token[5]:
+    raise SyntaxError('unexpected character %r' % token[5])
+  return '$end', None
+
+
+# Grammar steps.  Tokens are steps of their own:
+_ID, _TYPE, _INT_CONST, _STR_CONST, _COLON, _LPAREN, _RPAREN = range(7)
+# The others build a nonterminal, and are tuples starting with a kind:
+#   (_NODE, rule, tags)            LINENO, a tag, then the _SEQ in tags for it
+#   (_SEQ, rule, steps)            a fixed sequence of steps
+#   (_LIST, rule, item, optional)  items, left recursive, while LINENO follows
+_NODE, _SEQ, _LIST = range(3)
+
+_step_names = ['ID', 'type', 'INT_CONST', 'STR_CONST', "':'", "'('", "')'"]
+
+def _node(rule, specs):
+  """Return the step for a node of rule, given the steps for each tag."""
+  return (_NODE, rule, dict((tag, (_SEQ, rule, steps))
+                            for tag, steps in specs.items()))
+
+
+# Filled in below, since expressions nest.
+_expr_aux_tags = {}
+_EXPR = (_SEQ, 'expr', ((_NODE, 'expr_aux', _expr_aux_tags), _COLON, _TYPE))
+
+_EXPR_LIST = (_LIST, 'expr_list', _EXPR, False)
+_ACTUALS = (_SEQ, 'actuals', (_LPAREN, (_LIST, 'expr_list', _EXPR, True), _RPAREN))
+_CASE_LIST = (_LIST, 'case_list',
+              _node('simple_case', {'_branch': (_ID, _ID, _EXPR)}), False)
+
+_expr_aux_tags.update(_node('expr_aux', {
+  '_no_expr': (),
+  '_object': (_ID,),
+  '_bool': (_INT_CONST,),
+  '_string': (_STR_CONST,),
+  '_int': (_INT_CONST,),
+  '_comp': (_EXPR,),
+  '_leq': (_EXPR, _EXPR),
+  '_eq': (_EXPR, _EXPR),
+  '_lt': (_EXPR, _EXPR),
+  '_neg': (_EXPR,),
+  '_divide': (_EXPR, _EXPR),
+  '_mul': (_EXPR, _EXPR),
+  '_sub': (_EXPR, _EXPR),
+  '_plus': (_EXPR, _EXPR),
+  '_isvoid': (_EXPR,),
+  '_new': (_ID,),
+  '_typcase': (_EXPR, _CASE_LIST),
+  '_let': (_ID, _ID, _EXPR, _EXPR),
+  '_block': (_EXPR_LIST,),
+  '_loop': (_EXPR, _EXPR),
+  '_cond': (_EXPR, _EXPR, _EXPR),
+  '_dispatch': (_EXPR, _ID, _ACTUALS),
+  '_static_dispatch': (_EXPR, _ID, _ID, _ACTUALS),
+  '_assign': (_ID, _EXPR),
+})[2])
+
+_FORMALS = (_SEQ, 'formals',
+            ((_LIST, 'formal_list', _node('formal', {'_formal': (_ID, _ID)}), True),))
+
+_FEATURE = _node('feature', {'_attr': (_ID, _ID, _EXPR),
+                             '_method': (_ID, _FORMALS, _ID, _EXPR)})
+
+_CLASS = _node('class', {
+  '_class': (_ID, _ID, _STR_CONST, _LPAREN,
+             (_SEQ, 'optional_feature_list',
+              ((_LIST, 'feature_list', _FEATURE, True),)),
+             _RPAREN)})
+
+_PROGRAM = _node('program', {'_program': ((_LIST, 'class_list', _CLASS, False),)})
+
+
+class LLAstParser(object):
+  """A table-free parser for the Cool AST.
+
+  It dispatches on each node's tag instead of running PLY's LALR engine,
+  and keeps its own stack instead of recursing, so deeply nested
+  expressions can't hit the recursion limit.  It calls the actions of
+  action_dict with the same arguments, in the same order, as
+  `class`:AstParser, so both build identical trees.
+
+  Unlike `class`:AstParser, it raises SyntaxError on malformed input.
+
+  """
+
+  def __init__(self, action_dict):
+    self.action_dict = action_dict
+    # The stringtab.Tables of the parse in progress, if any.
+    self.tables = None
+
+  def parse(self, ast_text, tables=None):
+    """Parse ast_text and return the result of the program action.
+
+    tables is as for `func`:AstParser.parse.
+
+    """
+    return self.parse_chunks(text_chunks(ast_text), tables)
+
+  def parse_chunks(self, chunks, tables=None):
+    """Parse an AST dump given in pieces, as `func`:text_chunks,
+    `func`:file_chunks or `func`:buffer_chunks split it."""
+    self.tables = tables
+    try:
+      return self.parse_tokens(raw_tokens(chunks))
+    finally:
+      self.tables = None
+
+  def parse_tokens(self, tokens):
+    """Parse an iterator over the raw tokens of a whole AST dump."""
+    # Pad the input with end markers, so reading past the end is harmless.
+    tokens = itertools.chain(tokens, itertools.repeat(_END))
+    token = next(tokens)
+    if token == _END:
+      return self.action_dict['program']('program', [None])
+
+    root, token = self.parse_node(_PROGRAM, token, tokens)
+    if token != _END:
+      self.error(None, token, 'end of input')
+
+    return root
+
+  def iter_classes(self, tokens):
+    """Parse the raw tokens of an AST dump, yielding each class's value.
+
+    Only the class actions, and the actions for what they contain, are
+    run; the class_list and program actions are not.
+
+    """
+    tokens = itertools.chain(tokens, itertools.repeat(_END))
+    token = next(tokens)
+    if token == _END:
+      return
+
+    if not token[0]:
+      self.error(None, token, 'a line number')
+    token = next(tokens)
+    if token[3] != '_program':
+      self.error(None, token, 'a program tag')
+
+    token = next(tokens)
+    while True:
+      value, token = self.parse_node(_CLASS, token, tokens)
+      yield value
+      if not token[0]:
+        break
+
+    if token != _END:
+      self.error(None, token, 'end of input')
+
+  def parse_node(self, node_step, token, tokens):
+    """Parse one node of kind node_step, starting at token.
+
+    tokens must never run out; pad them with _END.  Returns the node's
+    value and the token that follows it.
+
+    """
+    actions = self.action_dict
+    keywords = reserved_words
+    unescape = unescape_string
+    next_token = tokens.next
+    tables = self.tables
+
+    # Frames are [step, values, index].  For lists, values holds the list
+    # built so far and index counts its items.
+    root = [(_SEQ, None, (node_step,)), [None], 0]
+    stack = [root]
+    lineno = None
+    while True:
+      frame = stack[-1]
+      step = frame[0]
+
+      if step[0] is _LIST:
+        if token[0] or not (frame[2] or step[3]):
+          child = step[2]
+        else:
+          stack.pop()
+          if not frame[2]:
+            continue
+          child = None
+          result = frame[1]
+      else:
+        # Read tokens until the next nonterminal, or the end of the frame.
+        steps = step[2]
+        values = frame[1]
+        index = frame[2]
+        count = len(steps)
+        child = None
+        while index < count:
+          child = steps[index]
+          index += 1
+          if child.__class__ is tuple:
+            break
+          elif child is _ID:
+            value = token[3]
+            if not value or value in keywords:
+              self.error(lineno, token, 'an identifier')
+            if tables is not None:
+              value = tables.idtable.add(value)
+          elif child is _TYPE:
+            value = token[3]
+            if not value or (value in keywords and value != '_no_type'):
+              self.error(lineno, token, 'a type')
+            if tables is not None:
+              value = tables.idtable.add(value)
+          elif child is _INT_CONST:
+            if not token[2]:
+              self.error(lineno, token, 'an integer')
+            value = int(token[2])
+            if tables is not None:
+              value = tables.inttable.add(value)
+          elif child is _STR_CONST:
+            if not token[1]:
+              self.error(lineno, token, 'a string')
+            value = unescape(token[1][1:-1])
+            if tables is not None:
+              value = tables.stringtable.add(value)
+          else:
+            value = token[4]
+            if value != _step_names[child][1]:
+              self.error(lineno, token, _step_names[child])
+          values.append(value)
+          token = next_token()
+          child = None
+        frame[2] = index
+
+        if child is None:
+          stack.pop()
+          if frame is root:
+            return values[1], token
+          rule = step[1]
+          result = actions[rule](rule, values)
+
+      if child is None:
+        parent = stack[-1]
+        if parent[0][0] is _LIST:
+          rule = parent[0][1]
+          if parent[2]:
+            parent[1] = actions[rule](rule, [None, parent[1], result])
+          else:
+            parent[1] = actions[rule](rule, [None, result])
+          parent[2] += 1
+        else:
+          parent[1].append(result)
+      elif child[0] is _NODE:
+        if not token[0]:
+          self.error(lineno, token, 'a line number')
+        lineno = int(token[0])
+        token = next_token()
+        tag = token[3]
+        seq = child[2].get(tag)
+        if seq is None:
+          self.error(lineno, token, 'a %s tag' % child[1])
+        stack.append([seq, [None, lineno, tag], 0])
+        token = next_token()
+      elif child[0] is _SEQ:
+        stack.append([child, [None], 0])
+      else:
+        stack.append([child, None, 0])
+
+  def error(self, lineno, token, expected):
+    if token == _END:
+      found = 'end of input'
+    else:
+      found = repr(''.join(token))
+    raise SyntaxError('near #%s: expected %s, got %s' % (lineno, expected, found))
+
+
+######################################################################
+# Parallel parsing
+######################################################################
+
+# Classes are independent, so a dump can be split where each one starts
+# and the pieces parsed in separate processes.  Strings can't hold raw
+# line breaks except after a backslash, so these lines really start one.
+_class_start_re = re.compile(r'^[ \t]*#\d+[ \t]*\r?\n[ \t]*_class\b', re.M)
+
+# Characters of classes handed to a worker at once, at the least.
+BATCH_SIZE = 1 << 16
+
+
+def class_chunks(ast_text):
+  """Split ast_text into the program header and the text of each class.
+
+  Returns None if the text has no classes.
+
+  """
+  starts = [m.start() for m in _class_start_re.finditer(ast_text)
+            if ast_text[m.start() - 2:m.start()] != '\\\n']
+  if not starts:
+    return None
+
+  starts.append(len(ast_text))
+  return ast_text[:starts[0]], [ast_text[start:stop]
+                                for start, stop in zip(starts, starts[1:])]
+
+
+def _record_actions(events):
+  """Return actions that append each call to events, for replay_events.
+
+  A call adds the rule, the number of values in p, how many of those
+  are the results of earlier calls, then the values themselves with the
+  results as None.  The actions return None, so results are easy to spot.
+
+  """
+  def record(rule, p):
+    values = p[1:]
+    events.extend((rule, len(values), values.count(None)))
+    events.extend(values)
+
+  return defaultdict(lambda: record)
+
+
+def replay_events(events, action_dict):
+  """Call the actions of action_dict as recorded by _record_actions.
+
+  Returns the results of the calls that weren't passed to later ones,
+  in order.
+
+  """
+  stack = []
+  index = 0
+  end = len(events)
+  while index < end:
+    rule = events[index]
+    count = events[index + 1]
+    results = events[index + 2]
+    index += 3
+    p = events[index - 1:index + count]
+    p[0] = None
+    index += count
+    if results:
+      children = iter(stack[-results:])
+      del stack[-results:]
+      for i in xrange(1, count + 1):
+        if p[i] is None:
+          p[i] = next(children)
+    stack.append(action_dict[rule](rule, p))
+
+  return stack
+
+
+def parse_events(ast_text):
+  """Parse the whole of ast_text into events for `func`:replay_events.
+
+  Replaying them calls the actions of the program, so the one result is
+  the program's value.
+
+  """
+  events = []
+  LLAstParser(_record_actions(events)).parse(ast_text)
+  return events
+
+
+def _parse_classes(text):
+  """Parse the classes in text, in the transfer format of _record_actions.
+
+  This runs in the worker processes; the events are marshalled, which
+  is far cheaper to send back than a pickled tree.
+
+  """
+  events = []
+  parser = LLAstParser(_record_actions(events))
+  for _ in parser.iter_classes(raw_tokens(['#1\n_program\n', text])):
+    pass
+
+  return marshal.dumps(events)
+
+
+def _batches(chunks, count):
+  """Join chunks into about count pieces, of at least BATCH_SIZE characters."""
+  size = max(BATCH_SIZE, sum(len(chunk) for chunk in chunks) // count)
+  batch = []
+  batch_size = 0
+  for chunk in chunks:
+    batch.append(chunk)
+    batch_size += len(chunk)
+    if batch_size >= size:
+      yield ''.join(batch)
+      batch = []
+      batch_size = 0
+  if batch:
+    yield ''.join(batch)
+
+
+# Worker pools by process count, made by get_pool for the process in
+# _pools_pid.  A forked child starts over rather than use its parent's.
+_pools = {}
+_pools_pid = None
+
+
+def get_pool(processes):
+  """Return a multiprocessing.Pool of processes workers.
+
+  The pool is made on first use and kept, so repeated parses don't pay
+  for starting workers each time.  multiprocessing stops the workers
+  when the program exits.
+
+  """
+  global _pools_pid
+  if _pools_pid != os.getpid():
+    _pools.clear()
+    _pools_pid = os.getpid()
+  pool = _pools.get(processes)
+  if pool is None:
+    pool = _pools[processes] = multiprocessing.Pool(processes)
+  return pool
+
+
+def parse_parallel(ast_text, action_dict, pool):
+  """Parse ast_text, splitting its classes among the workers of pool.
+
+  pool is a multiprocessing.Pool.  The workers parse the classes and
+  the actions of action_dict are run here, in order, so the result is
+  the same as `func`:parse_cool_ast's.  Starting workers costs far more
+  than parsing a small program, so code that parses repeatedly should
+  make a pool once and call this with it, or pass processes to
+  `func`:parse_cool_ast, which uses the pool of `func`:get_pool.
+
+  """
+  chunks = class_chunks(ast_text)
+  header = chunks and list(raw_tokens([chunks[0]]))
+  if not header or len(header) != 2 or not header[0][0] or header[1][3] != '_program':
+    # Let the serial parser make sense of it, or report the error.
+    return get_parser(action_dict, 'll').parse(ast_text)
+
+  class_list = None
+  actions = action_dict
+  for events in pool.imap(_parse_classes, _batches(chunks[1], multiprocessing.cpu_count() * 4)):
+    for value in replay_events(marshal.loads(events), actions):
+      if class_list is None:
+        class_list = actions['class_list']('class_list', [None, value])
+      else:
+        class_list = actions['class_list']('class_list', [None, class_list, value])
+
+  return actions['program']('program',
+                            [None, int(header[0][0]), '_program', class_list])
+
+
+######################################################################
+# Incremental parsing
+######################################################################
+
+# The name of a class, in its text from class_chunks.
+_class_name_re = re.compile(r'_class\s+([a-zA-Z0-9_]+)')
+
+
+class IncrementalParse(object):
+  """The result of `func`:parse_incremental.
+
+  program is the value of the program action, and classes the values of
+  the class actions, in order.  reused and rebuilt list the names of
+  the classes that were taken from the previous parse, and that were
+  parsed again.  digests maps the digest of the text of each class to
+  the values of the classes with that text.
+
+  """
+
+  def __init__(self, action_dict):
+    self.action_dict = action_dict
+    self.program = None
+    self.classes = []
+    self.digests = {}
+    self.reused = []
+    self.rebuilt = []
+
+
+def parse_incremental(ast_text, action_dict, previous=None):
+  """Parse ast_text, reusing the classes of an earlier parse.
+
+  previous is the `class`:IncrementalParse of an earlier call with the
+  same action_dict.  A class whose text, line numbers included, is
+  unchanged since then is not parsed again: its value is the very object
+  previous built, along with anything set on it since.  The others are
+  parsed with the table-free parser.  Returns an `class`:IncrementalParse.
+
+  """
+  result = IncrementalParse(action_dict)
+  chunks = class_chunks(ast_text)
+  header = chunks and list(raw_tokens([chunks[0]]))
+  if not header or len(header) != 2 or not header[0][0] or header[1][3] != '_program':
+    # Let the serial parser make sense of it, or report the error.
+    result.program = get_parser(action_dict, 'll').parse(ast_text)
+    return result
+
+  # The values previous has for each digest, not reused yet.
+  available = {}
+  if previous is not None and previous.action_dict is action_dict:
+    for digest, values in previous.digests.iteritems():
+      available[digest] = list(values)
+
+  digests = []
+  changed = []
+  for chunk in chunks[1]:
+    digest = hashlib.md5(chunk).digest()
+    digests.append(digest)
+    if not available.get(digest):
+      changed.append(chunk)
+
+  parser = get_parser(action_dict, 'll')
+  parsed = parser.iter_classes(raw_tokens(['#1\n_program\n'] + changed))
+  for chunk, digest in zip(chunks[1], digests):
+    name = _class_name_re.search(chunk).group(1)
+    if available.get(digest):
+      value = available[digest].pop(0)
+      result.reused.append(name)
+    else:
+      value = next(parsed)
+      result.rebuilt.append(name)
+    result.classes.append(value)
+    result.digests.setdefault(digest, []).append(value)
+
+  if changed:
+    # Check for anything after the last class.
+    for _ in parsed:
+      pass
+
+  class_list = None
+  for value in result.classes:
+    if class_list is None:
+      class_list = action_dict['class_list']('class_list', [None, value])
+    else:
+      class_list = action_dict['class_list']('class_list', [None, class_list, value])
+
+  result.program = action_dict['program'](
+    'program', [None, int(header[0][0]), '_program', class_list])
+  return result
+
+
+######################################################################
+# Lazy parsing
+######################################################################
+
+# Passes that only look at classes and the signatures of their features
+# needn't build the expressions of method bodies and attribute inits.  A
+# lazy parse cuts those expressions out of the dump, parses what is left,
+# and puts a `class`:LazyExpr in place of each, which parses its piece of
+# the dump when it's first used.  Like the class headers of parallel
+# parsing, feature headers are found by the lines they start on.
+_feature_start_re = re.compile(
+  r'^[ \t]*#\d+[ \t]*\r?\n[ \t]*(_class|_attr|_method)\b', re.M)
+
+# The expression of a feature starts at the first node after its formals.
+_feature_expr_re = re.compile(r'^[ \t]*#\d+[ \t]*\r?\n(?![ \t]*_formal\b)', re.M)
+
+# What stands in for each expression in the dump that is parsed.
+_PLACEHOLDER = '#0\n_no_expr\n: _no_type\n'
+
+
+class LazyExpr(object):
+  """An expression of a lazily parsed dump, parsed when first used.
+
+  ast_text[start:stop] is the dump of the expression.  Reading any field
+  of it parses the expression with action_dict, once, and passes the
+  read on to the result, which is also `func`:node.  Code that checks
+  the class of a value, such as isinstance(value, list) for
+  ast.simple_action_dict trees, should look at `func`:node instead.
+
+  """
+  __slots__ = ('ast_text', 'start', 'stop', 'action_dict', 'tables', '_node')
+
+  def __init__(self, ast_text, start, stop, action_dict, tables=None):
+    self.ast_text = ast_text
+    self.start = start
+    self.stop = stop
+    self.action_dict = action_dict
+    self.tables = tables
+    self._node = None
+
+  @property
+  def parsed(self):
+    """Has the expression been parsed yet?"""
+    return self._node is not None
+
+  @property
+  def node(self):
+    """The parsed expression."""
+    if self._node is None:
+      text = self.ast_text[self.start:self.stop]
+      parser = get_parser(self.action_dict, 'll')
+      tokens = itertools.chain(raw_tokens([text]), itertools.repeat(_END))
+      parser.tables = self.tables
+      try:
+        node, token = parser.parse_node(_EXPR, next(tokens), tokens)
+      finally:
+        parser.tables = None
+      if token != _END:
+        parser.error(None, token, 'end of expression')
+      self._node = node
+      # The text is no longer needed.
+      self.ast_text = None
+    return self._node
+
+  def __getattr__(self, attr):
+    # Unset slots, as in a fresh copy, and special methods looked up by
+    # copy and pickle aren't the node's to answer.
+    if attr in LazyExpr.__slots__ or attr.startswith('__'):
+      raise AttributeError(attr)
+    return getattr(self.node, attr)
+
+  def __deepcopy__(self, memo):
+    # Like an eagerly parsed tree, a deep copy is made of plain nodes.
+    return copy.deepcopy(self.node, memo)
+
+  def __getitem__(self, index):
+    return self.node[index]
+
+  def __len__(self):
+    return len(self.node)
+
+  def __iter__(self):
+    return iter(self.node)
+
+  def __nonzero__(self):
+    return True
+
+  def __eq__(self, other):
+    if isinstance(other, LazyExpr):
+      other = other.node
+    return self.node == other
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __repr__(self):
+    if self._node is None:
+      return '<LazyExpr %d:%d>' % (self.start, self.stop)
+    return repr(self._node)
+
+
+def expr_spans(ast_text):
+  """Return the (start, stop) spans of the expressions of every feature
+  in ast_text, in order."""
+  spans = []
+  headers = list(_feature_start_re.finditer(ast_text))
+  for i, header in enumerate(headers):
+    if header.group(1) == '_class':
+      continue
+    start = _feature_expr_re.search(ast_text, header.end()).start()
+    if i + 1 < len(headers) and headers[i + 1].group(1) != '_class':
+      stop = headers[i + 1].start()
+    else:
+      # The last feature of a class; leave out the class's ')'.
+      end = i + 1 < len(headers) and headers[i + 1].start() or len(ast_text)
+      stop = ast_text.rindex(')', start, end)
+    spans.append((start, stop))
+  return spans
+
+
+def _lazy_action_dict(action_dict):
+  """Return the actions for lazy parses with action_dict, and the queue
+  of `class`:LazyExpr objects their feature action takes from."""
+  return _memo(action_dict, 'lazy', lambda: _make_lazy_actions(action_dict))
+
+
+def _make_lazy_actions(action_dict):
+  pending = deque()
+  feature = action_dict['feature']
+
+  def lazy_feature(r, p):
+    p[-1] = pending.popleft()
+    return feature(r, p)
+
+  actions = ActionDict(action_dict)
+  # Only placeholders are parsed as expressions.
+  actions['expr'] = actions['expr_aux'] = lambda r, p: None
+  actions['feature'] = lazy_feature
+  return actions, pending
+
+
+def parse_lazy(ast_text, action_dict, engine='lalr', tables=None):
+  """Parse ast_text with action_dict, but leave the expressions of
+  features to be parsed when used; see `class`:LazyExpr.
+
+  Classes, features and formals are built as usual.  The dump that is
+  parsed now has the expressions cut out, so only the spans of the
+  expressions are kept until they are used.  If tables is given, each
+  expression adds to them when it is parsed.
+
+  """
+  actions, pending = _lazy_action_dict(action_dict)
+  pieces = []
+  position = 0
+  for start, stop in expr_spans(ast_text):
+    pieces.append(ast_text[position:start])
+    pieces.append(_PLACEHOLDER)
+    pending.append(LazyExpr(ast_text, start, stop, action_dict, tables))
+    position = stop
+  pieces.append(ast_text[position:])
+
+  try:
+    return get_parser(actions, engine).parse(''.join(pieces), tables)
+  finally:
+    pending.clear()
+
+
+######################################################################
+# Profiling
+######################################################################
+
+class RuleStats(object):
+  """What the action for one rule cost: calls, total and max seconds,
+  and net allocations of objects the garbage collector tracks."""
+
+  def __init__(self, rule):
+    self.rule = rule
+    self.calls = 0
+    self.total = 0.0
+    self.max = 0.0
+    self.allocations = 0
+
+  def __repr__(self):
+    return '<RuleStats %s: %d calls, %.6fs>' % (self.rule, self.calls, self.total)
+
+
+_punct_tokens = {':': 'COLON', '(': 'LPAREN', ')': 'RPAREN'}
+
+
+class ParseStats(object):
+  """Where the time of profiled parses goes.
+
+  Pass one to `func`:parse_cool_ast as stats, or parse with the actions
+  `func`:wrap returns.  Unprofiled parsers aren't touched, so they cost
+  nothing extra.
+
+  rules maps each rule to its `class`:RuleStats, tokens maps each token
+  type to how many were read, and elapsed is the total time of the
+  parses; what the actions didn't take went to the parser engine.
+
+  """
+
+  def __init__(self):
+    self.rules = {}
+    self.tokens = defaultdict(int)
+    self.parses = 0
+    self.elapsed = 0.0
+    self.engine = None
+    # (action dict, wrapped copy) pairs; a stats object sees only a few.
+    self._wrapped = []
+
+  def wrap(self, action_dict):
+    """Return a copy of action_dict whose actions record their costs here.
+
+    The copy is an `class`:ActionDict made once per action_dict, so its
+    parsers are reused by later profiled parses and dropped with the stats.
+
+    """
+    for original, wrapped in self._wrapped:
+      if original is action_dict:
+        return wrapped
+    wrapped = ActionDict((rule, self._timed(rule, action))
+                         for rule, action in action_dict.items())
+    self._wrapped.append((action_dict, wrapped))
+    return wrapped
+
+  def _timed(self, rule, action):
+    stats = self.rules.get(rule)
+    if stats is None:
+      stats = self.rules[rule] = RuleStats(rule)
+    clock = time.time
+    gc_count = gc.get_count
+
+    def timed(r, p):
+      allocations = gc_count()[0]
+      start = clock()
+      value = action(r, p)
+      elapsed = clock() - start
+      stats.calls += 1
+      stats.total += elapsed
+      if elapsed > stats.max:
+        stats.max = elapsed
+      stats.allocations += gc_count()[0] - allocations
+      return value
+
+    # Keep the schema, so node classes can still be made from it.
+    for name in ('elms_spec', 'type_index'):
+      if hasattr(action, name):
+        setattr(timed, name, getattr(action, name))
+    return timed
+
+  def count_tokens(self, ast_text):
+    """Count the tokens of ast_text by type, as the PLY lexer names them."""
+    tokens = self.tokens
+    for token in raw_tokens(text_chunks(ast_text)):
+      lineno, string, integer, word, punct = token[:5]
+      if lineno:
+        tokens['LINENO'] += 1
+      elif word:
+        tokens[reserved_words.get(word, 'ID')] += 1
+      elif string:
+        tokens['STR_CONST'] += 1
+      elif integer:
+        tokens['INT_CONST'] += 1
+      elif punct:
+        tokens[_punct_tokens[punct]] += 1
+
+  @property
+  def action_time(self):
+    return sum(stats.total for stats in self.rules.values())
+
+  @property
+  def engine_time(self):
+    return self.elapsed - self.action_time
+
+  def report(self):
+    """Return a table of the costs of each rule, the most expensive first."""
+    lines = ['%-22s %9s %10s %10s %10s %11s' % (
+      'rule', 'calls', 'total ms', 'mean us', 'max us', 'allocations')]
+    for stats in sorted(self.rules.values(), key=lambda stats: -stats.total):
+      if not stats.calls:
+        continue
+      lines.append('%-22s %9d %10.2f %10.2f %10.2f %11d' % (
+        stats.rule, stats.calls, stats.total * 1e3, stats.total / stats.calls * 1e6,
+        stats.max * 1e6, stats.allocations))
+    lines.append('%-22s %9d %10.2f' % ('(engine %s)' % self.engine, self.parses,
+                                       self.engine_time * 1e3))
+    lines.append('tokens: ' + ', '.join('%s %d' % item
+                                        for item in sorted(self.tokens.items())))
+    return '\n'.join(lines)
+
+  def dump_stats(self, path):
+    """Write the costs to path in the format of cProfile, for pstats."""
+    parser = ('astparse.py', 0, 'parse (%s)' % self.engine)
+    stats = {parser: (self.parses, self.parses, self.engine_time, self.elapsed, {})}
+    for rule in self.rules.values():
+      timing = (rule.calls, rule.calls, rule.total, rule.total)
+      stats[('<action>', 0, rule.rule)] = timing + ({parser: timing},)
+
+    with open(path, 'wb') as out:
+      marshal.dump(stats, out)
+
+  def dump_folded(self, out):
+    """Write the costs to out as folded stacks, in microseconds, for
+    flamegraph.pl and the like."""
+    out.write('parse;engine %d\n' % (self.engine_time * 1e6))
+    for rule in sorted(self.rules):
+      if self.rules[rule].calls:
+        out.write('parse;%s %d\n' % (rule, self.rules[rule].total * 1e6))
+
+
+def profile_parse(ast_text, action_dict, stats, engine='lalr', processes=None,
+                  lazy=False, tables=None):
+  """Parse ast_text as `func`:parse_cool_ast does, recording costs in stats.
+
+  The garbage collector is paused for the parse, so the allocation
+  counts are exact; the time it would take isn't counted.
+
+  """
+  actions = stats.wrap(action_dict)
+  stats.engine = processes and 'parallel' or engine
+  enabled = gc.isenabled()
+  gc.disable()
+  try:
+    start = time.time()
+    result = parse_cool_ast(ast_text, actions, engine, processes, lazy=lazy,
+                            tables=tables)
+    stats.elapsed += time.time() - start
+  finally:
+    if enabled:
+      gc.enable()
+
+  stats.parses += 1
+  stats.count_tokens(ast_text)
+  return result
+
+
+######################################################################
+# Simple interface
+######################################################################
+
+# Parser classes, by the engine names parse_cool_ast accepts.
+engines = {
+  'lalr': AstParser,
+  'll': LLAstParser,
+}
+
+
+def get_parser(action_dict, engine='lalr'):
+  """Return the memoized parser for action_dict.
+
+  engine is 'lalr' for `class`:AstParser, or 'll' for `class`:LLAstParser.
+
+  """
+  return _memo(action_dict, ('parser', engine),
+               lambda: engines[engine](action_dict))
+
+
+def iter_cool_classes(ast_file, action_dict, chunk_size=CHUNK_SIZE):
+  """Parse the Cool AST in ast_file, yielding each class as soon as it's read.
+
+  The file is read a piece at a time, and each class is built by the class
+  action of action_dict and handed over before the next one is parsed, so
+  memory stays bounded by the largest class rather than the whole program.
+  The program and class_list actions are not run.  This always uses the
+  'll' engine.
+
+  """
+  parser = get_parser(action_dict, 'll')
+  return parser.iter_classes(raw_tokens(file_chunks(ast_file, chunk_size)))
+
+
+def parse_cool_buffer(data, action_dict, tables=None):
+  """Parse the dump in the buffer data, a str, bytearray, memoryview or
+  mmap, without copying all of it; see `func`:buffer_chunks.
+
+  This always uses the 'll' engine.  tables is as for `func`:parse_cool_ast.
+
+  """
+  return get_parser(action_dict, 'll').parse_chunks(buffer_chunks(data), tables)
+
+
+def parse_cool_file(path, action_dict, tables=None):
+  """Parse the dump in the file at path, reading it a piece at a time.
+
+  Only one piece of the file is held at a time, so parsing needs little
+  more memory than the tree it builds.  Reading through an mmap with
+  `func`:parse_cool_buffer copies no more, but the mapped pages count
+  towards the process's resident size as they are touched.
+
+  This always uses the 'll' engine.  tables is as for `func`:parse_cool_ast.
+
+  """
+  with open(path, 'rb') as ast_file:
+    return get_parser(action_dict, 'll').parse_chunks(file_chunks(ast_file), tables)
 
 
 # XXX Maybe move me to ast.py?
-def parse_cool_ast(ast_text, action_dict):
+def parse_cool_ast(ast_text, action_dict, engine='lalr', processes=None,
+                   stats=None, lazy=False, tables=None):
   """Simple interface for parsing the Cool AST.
 
   Pass in a dictionary of actions for each parse rule,
-  it will perform them.
+  it will perform them.  The parser for each action dictionary
+  is built once and reused by later calls.  See `func`:get_parser
+  for the engines.
+
+  If processes is given, the classes are parsed by that many worker
+  processes instead, from the pool `func`:get_pool keeps for that
+  count; see `func`:parse_parallel.  If stats is given, the
+  costs of the parse are recorded in it; see `class`:ParseStats.
+
+  If lazy is true, the expressions of features are only parsed when
+  they are used, and processes is ignored; see `func`:parse_lazy.
+
+  If tables is a `class`:stringtab.Tables, the identifiers and constants
+  of the program are added to it as they are read, and the nodes share
+  its copies of them.  The parse is then always done in this process.
 
   """
-  parser = build_ast_parser(action_dict)
-  return parser.parse(ast_text, lexer=build_ast_lexer())
+  if stats is not None:
+    return profile_parse(ast_text, action_dict, stats, engine, processes, lazy,
+                         tables)
+
+  if lazy:
+    return parse_lazy(ast_text, action_dict, engine, tables)
+
+  if processes and tables is None:
+    return parse_parallel(ast_text, action_dict, get_pool(processes))
+
+  return get_parser(action_dict, engine).parse(ast_text, tables)
@@ -0,0 +1,425 @@
+import copy
+import gc
+import mmap
+import multiprocessing
+import os
+import pstats
+import shutil
+import tempfile
+import weakref
+
+from StringIO import StringIO
+
+from nose.tools import eq_
+
+import ast
+import astgen
+import astparse
+from fixtures import sample_path, sample_text
+
+try:
+  memoryview
+except NameError:
+  # memoryview is new in Python 2.7.
+  memoryview = None
+
+
+def test_parser_is_reusable():
+  text = sample_text('program.ast')
+  parser = astparse.AstParser(ast.simple_action_dict)
+
+  first = parser.parse(text)
+  eq_(first[0], 'program')
+  eq_(parser.parse(text), first)
+  eq_(parser.parse(text), astparse.parse_cool_ast(text, ast.simple_action_dict))
+
+
+def test_parse_resets_line_numbers():
+  text = sample_text('program.ast')
+  parser = astparse.AstParser(ast.simple_action_dict)
+
+  parser.parse(text)
+  eq_(parser.lexer.lineno, text.count('\n') + 1)
+  parser.parse(text)
+  eq_(parser.lexer.lineno, text.count('\n') + 1)
+
+
+def test_parser_drops_the_last_tree():
+  parser = astparse.AstParser(ast.tuple_action_dict)
+  program = weakref.ref(parser.parse(sample_text('program.ast')))
+  gc.collect()
+  eq_(program(), None)
+
+
+def test_get_parser_is_memoized():
+  eq_(astparse.get_parser(ast.tuple_action_dict) is
+      astparse.get_parser(ast.tuple_action_dict), True)
+  eq_(astparse.get_parser(ast.tuple_action_dict) is
+      astparse.get_parser(ast.simple_action_dict), False)
+
+
+def test_action_dict_parsers_are_released():
+  actions = astparse.ActionDict(ast.simple_action_dict)
+  parser = astparse.get_parser(actions, 'll')
+  eq_(astparse.get_parser(actions, 'll') is parser, True)
+  eq_(parser.parse(sample_text('program.ast')),
+      astparse.parse_cool_ast(sample_text('program.ast'),
+                              ast.simple_action_dict))
+
+  ref = weakref.ref(actions)
+  del actions, parser
+  gc.collect()
+  eq_(ref(), None)
+
+
+def test_plain_dict_memo_is_bounded():
+  dicts = [dict(ast.tuple_action_dict)
+           for i in range(astparse.CACHE_SIZE + 5)]
+  first = astparse.get_parser(dicts[0], 'll')
+  for actions in dicts:
+    astparse.get_parser(actions, 'll')
+  eq_(len(astparse._memos) <= astparse.CACHE_SIZE, True)
+  eq_(astparse.get_parser(dicts[0], 'll') is first, False)
+  eq_(astparse.get_parser(dicts[-1], 'll') is
+      astparse.get_parser(dicts[-1], 'll'), True)
+
+
+def test_tables_are_cached_outside_cwd():
+  cache_dir = tempfile.mkdtemp()
+  work_dir = tempfile.mkdtemp()
+  old_cwd = os.getcwd()
+  old_env = os.environ.get('COOLAST_CACHE_DIR')
+  old_parser = astparse._lr_parser
+  try:
+    os.environ['COOLAST_CACHE_DIR'] = cache_dir
+    os.chdir(work_dir)
+    astparse._lr_parser = None
+
+    text = sample_text('program.ast')
+    expected = astparse.AstParser(ast.simple_action_dict).parse(text)
+    eq_(os.listdir(work_dir), [])
+
+    cached = os.listdir(cache_dir)
+    eq_(len(cached), 1)
+    assert cached[0].startswith(astparse.TABLE_NAME)
+
+    # A fresh process loads the tables instead of generating them.
+    astparse._lr_parser = None
+    eq_(astparse.AstParser(ast.simple_action_dict).parse(text), expected)
+    eq_(os.listdir(cache_dir), cached)
+  finally:
+    astparse._lr_parser = old_parser
+    os.chdir(old_cwd)
+    if old_env is None:
+      del os.environ['COOLAST_CACHE_DIR']
+    else:
+      os.environ['COOLAST_CACHE_DIR'] = old_env
+    shutil.rmtree(cache_dir)
+    shutil.rmtree(work_dir)
+
+
+def lex_all(lexer, text):
+  lexer.input(text)
+  return [(tok.type, tok.value, tok.lineno) for tok in lexer]
+
+
+def test_fast_strings_match_legacy_lexer():
+  text = sample_text('program.ast')
+  fast = lex_all(astparse.build_ast_lexer(), text)
+  eq_(fast, lex_all(astparse.build_ast_lexer(fast_strings=False), text))
+  assert ('STR_CONST', 'hello\n\tw\borld\f', 48) in fast
+
+
+def test_fast_strings_decode_all_escapes():
+  lexer = astparse.build_ast_lexer()
+  eq_(lex_all(lexer, r'"a\\b\"c\033d\e" "" "x y"'),
+      [('STR_CONST', 'a\\b"c\033de', 1),
+       ('STR_CONST', '', 1),
+       ('STR_CONST', 'x y', 1)])
+
+
+def test_ll_parser_matches_lalr_parser():
+  text = sample_text('program.ast')
+  for action_dict in (ast.simple_action_dict, ast.tuple_action_dict):
+    eq_(ast.ast_to_str(astparse.parse_cool_ast(text, action_dict, 'll')),
+        ast.ast_to_str(astparse.parse_cool_ast(text, action_dict)))
+
+  eq_(astparse.parse_cool_ast(text, ast.simple_action_dict, 'll'),
+      astparse.parse_cool_ast(text, ast.simple_action_dict))
+  eq_(astparse.parse_cool_ast('', ast.simple_action_dict, 'll'),
+      astparse.parse_cool_ast('', ast.simple_action_dict))
+
+
+def nested_negations(depth):
+  return ('#1\n_program\n#1\n_class\nMain\nObject\n"a.cl"\n(\n'
+          '#1\n_attr\nx\nInt\n' + '#1\n_neg\n' * depth + '#1\n_int\n0\n: Int\n' +
+          ': Int\n' * depth + ')\n')
+
+
+def test_ll_parser_does_not_recurse():
+  program = astparse.parse_cool_ast(nested_negations(5000), ast.simple_action_dict, 'll')
+  expr = program[3][1][7][1][1][5]
+  depth = 0
+  while expr[1][2] == '_neg':
+    expr = expr[1][3]
+    depth += 1
+  eq_(depth, 5000)
+
+
+def test_ll_parser_rejects_bad_input():
+  text = sample_text('program.ast')
+  for bad in (text.replace('_plus', '_pluss'), text.replace(': Bool', ''),
+              text + '#1', text.replace('x\n', '$\n')):
+    try:
+      astparse.parse_cool_ast(bad, ast.simple_action_dict, 'll')
+    except SyntaxError:
+      pass
+    else:
+      assert False, 'parsed bad input'
+
+
+def test_iter_cool_classes():
+  text = sample_text('program.ast')
+  expected = astparse.parse_cool_ast(text, ast.tuple_action_dict).class_list
+
+  ast_file = StringIO(text)
+  classes = astparse.iter_cool_classes(ast_file, ast.tuple_action_dict, chunk_size=16)
+  first = next(classes)
+  eq_(first.name, 'Main')
+  # The second class hasn't been read yet.
+  assert ast_file.tell() < len(text)
+
+  rest = list(classes)
+  eq_(ast.ast_to_str([first] + rest), ast.ast_to_str(expected))
+
+  eq_(list(astparse.iter_cool_classes(StringIO(''), ast.tuple_action_dict)), [])
+
+
+def test_parse_parallel():
+  text = sample_text('program.ast')
+  pool = multiprocessing.Pool(2)
+  batch_size = astparse.BATCH_SIZE
+  # One class per batch.
+  astparse.BATCH_SIZE = 1
+  try:
+    for action_dict in (ast.simple_action_dict, ast.tuple_action_dict):
+      eq_(ast.ast_to_str(astparse.parse_parallel(text, action_dict, pool)),
+          ast.ast_to_str(astparse.parse_cool_ast(text, action_dict)))
+
+    eq_(astparse.parse_parallel(text, ast.simple_action_dict, pool),
+        astparse.parse_cool_ast(text, ast.simple_action_dict))
+    eq_(astparse.parse_parallel('', ast.simple_action_dict, pool),
+        astparse.parse_cool_ast('', ast.simple_action_dict))
+    eq_(astparse.parse_parallel(nested_negations(100), ast.simple_action_dict, pool),
+        astparse.parse_cool_ast(nested_negations(100), ast.simple_action_dict, 'll'))
+
+    for bad in (text.replace('_plus', '_pluss'), text + '#1'):
+      try:
+        astparse.parse_parallel(bad, ast.simple_action_dict, pool)
+      except SyntaxError:
+        pass
+      else:
+        assert False, 'parsed bad input'
+  finally:
+    astparse.BATCH_SIZE = batch_size
+    pool.terminate()
+    pool.join()
+
+
+def test_parse_cool_ast_reuses_pool():
+  text = sample_text('program.ast')
+  expected = astparse.parse_cool_ast(text, ast.simple_action_dict)
+  eq_(astparse.parse_cool_ast(text, ast.simple_action_dict, processes=2), expected)
+  pool = astparse.get_pool(2)
+  eq_(astparse.parse_cool_ast(text, ast.simple_action_dict, processes=2), expected)
+  assert astparse.get_pool(2) is pool
+  assert astparse.get_pool(1) is not pool
+
+
+def test_parse_stats():
+  text = sample_text('program.ast')
+  stats = astparse.ParseStats()
+  for engine in ('lalr', 'll'):
+    eq_(astparse.parse_cool_ast(text, ast.simple_action_dict, engine, stats=stats),
+        astparse.parse_cool_ast(text, ast.simple_action_dict, engine))
+
+  eq_(stats.parses, 2)
+  eq_(stats.rules['program'].calls, 2)
+  eq_(stats.rules['class'].calls, 2 * text.count('_class'))
+  eq_(stats.rules['expr'].calls, stats.rules['expr_aux'].calls)
+  eq_(stats.tokens['CLASS'], 2 * text.count('_class'))
+  eq_(stats.tokens['LINENO'], 2 * text.count('#'))
+  assert stats.rules['expr'].allocations > 0
+  assert 0 < stats.rules['expr'].max <= stats.rules['expr'].total
+  assert stats.engine_time >= 0
+  assert 'expr_aux' in stats.report()
+
+  # Profiled actions are made once per action dictionary.
+  eq_(stats.wrap(ast.simple_action_dict) is stats.wrap(ast.simple_action_dict), True)
+
+
+def test_parse_stats_are_released():
+  text = sample_text('program.ast')
+  memos = len(astparse._memos)
+  refs = []
+  for i in range(10):
+    stats = astparse.ParseStats()
+    astparse.parse_cool_ast(text, ast.simple_action_dict, 'll', stats=stats)
+    refs.append(weakref.ref(stats))
+  del stats
+  gc.collect()
+
+  eq_([ref() for ref in refs], [None] * 10)
+  eq_(len(astparse._memos), memos)
+
+
+def test_parse_stats_dumps():
+  stats = astparse.ParseStats()
+  astparse.parse_cool_ast(sample_text('program.ast'), ast.tuple_action_dict,
+                          stats=stats)
+
+  directory = tempfile.mkdtemp()
+  try:
+    path = os.path.join(directory, 'parse.prof')
+    stats.dump_stats(path)
+    profile = pstats.Stats(path)
+    eq_(profile.total_calls, 1 + sum(rule.calls for rule in stats.rules.values()))
+  finally:
+    shutil.rmtree(directory)
+
+  out = StringIO()
+  stats.dump_folded(out)
+  lines = out.getvalue().splitlines()
+  eq_(lines[0].split()[0], 'parse;engine')
+  assert 'parse;expr_aux' in [line.split()[0] for line in lines]
+
+
+def test_parse_lazy():
+  text = sample_text('program.ast')
+  for engine in ('lalr', 'll'):
+    for action_dict in (ast.simple_action_dict, ast.tuple_action_dict):
+      eq_(ast.ast_to_str(astparse.parse_cool_ast(text, action_dict, engine, lazy=True)),
+          ast.ast_to_str(astparse.parse_cool_ast(text, action_dict, engine)))
+
+  eq_(astparse.parse_cool_ast(text, ast.simple_action_dict, lazy=True),
+      astparse.parse_cool_ast(text, ast.simple_action_dict))
+
+
+def test_lazy_actions_are_released():
+  text = sample_text('program.ast')
+  expected = astparse.parse_cool_ast(text, ast.simple_action_dict)
+  memos = len(astparse._memos)
+  refs = []
+  for i in range(10):
+    actions = astparse.ActionDict(ast.simple_action_dict)
+    eq_(astparse.parse_cool_ast(text, actions, 'll', lazy=True), expected)
+    refs.append(weakref.ref(actions))
+  del actions
+  gc.collect()
+
+  eq_([ref() for ref in refs], [None] * 10)
+  eq_(len(astparse._memos), memos)
+
+
+def test_parse_lazy_defers_expressions():
+  text = sample_text('program.ast')
+  program = astparse.parse_cool_ast(text, ast.tuple_action_dict, lazy=True)
+  features = program.class_list[0].features
+  eq_([feature.name for feature in features], ['x', 's', 'main'])
+
+  exprs = [feature.init for feature in features[:2]] + [features[2].expr]
+  eq_([expr.parsed for expr in exprs], [False] * 3)
+  eq_(len(features[2].formals), 2)
+
+  eq_(exprs[0].expr_aux.int_const, 5)
+  eq_([expr.parsed for expr in exprs], [True, False, False])
+  eq_(exprs[2].expr_aux.type, '_block')
+  assert exprs[2].node is exprs[2].node
+
+
+def test_lazy_trees_copy():
+  text = sample_text('program.ast')
+  for action_dict in (ast.simple_action_dict, ast.tuple_action_dict):
+    expected = ast.ast_to_str(astparse.parse_cool_ast(text, action_dict))
+    program = astparse.parse_cool_ast(text, action_dict, lazy=True)
+    eq_(ast.ast_to_str(copy.copy(program)), expected)
+    eq_(ast.ast_to_str(copy.deepcopy(program)), expected)
+
+  expr = astparse.parse_cool_ast(text, ast.tuple_action_dict, lazy=True) \
+      .class_list[0].features[0].init
+  eq_(copy.copy(expr).parsed, False)
+  node = copy.deepcopy(expr)
+  assert not isinstance(node, astparse.LazyExpr)
+  assert node is not expr.node
+  eq_(node.expr_aux.int_const, 5)
+
+
+def test_parse_incremental():
+  text = astgen.generate_program(classes=4)
+  first = astparse.parse_incremental(text, ast.tuple_action_dict)
+  eq_(first.reused, [])
+  eq_(first.rebuilt, ['Main', 'C0', 'C1', 'C2', 'C3'])
+  eq_(ast.ast_to_str(first.program),
+      ast.ast_to_str(astparse.parse_cool_ast(text, ast.tuple_action_dict)))
+
+  # Change a string constant of C1.
+  start = text.index('"', text.index('_class\n    C1'))
+  edited = text[:start + 1] + 'edited ' + text[start + 1:]
+  second = astparse.parse_incremental(edited, ast.tuple_action_dict, first)
+  eq_(second.reused, ['Main', 'C0', 'C2', 'C3'])
+  eq_(second.rebuilt, ['C1'])
+  eq_(ast.ast_to_str(second.program),
+      ast.ast_to_str(astparse.parse_cool_ast(edited, ast.tuple_action_dict)))
+  assert second.classes[1] is first.classes[1]
+  assert second.classes[2] is not first.classes[2]
+
+  # Reused classes keep what was set on them.
+  second.classes[1].set_val('checked', True)
+  third = astparse.parse_incremental(edited, ast.tuple_action_dict, second)
+  eq_(len(third.reused), 5)
+  eq_(third.classes[1].checked, True)
+
+  # Classes aren't shared between action dictionaries.
+  other = astparse.parse_incremental(edited, ast.simple_action_dict, second)
+  eq_(len(other.rebuilt), 5)
+  eq_(other.program, astparse.parse_cool_ast(edited, ast.simple_action_dict))
+
+
+def test_buffer_chunks():
+  text = sample_text('program.ast')
+  buffers = [text, bytearray(text)]
+  if memoryview is not None:
+    buffers.append(memoryview(text))
+  for data in buffers:
+    for size in (1, 100, astparse.CHUNK_SIZE):
+      chunks = list(astparse.buffer_chunks(data, size))
+      eq_(''.join(chunks), text)
+      eq_([type(chunk) for chunk in chunks], [str] * len(chunks))
+      assert all(chunk.endswith('\n') for chunk in chunks)
+
+  # A string constant continued after a backslash isn't split.
+  eq_(list(astparse.buffer_chunks('"a\\\nb"\nc\n', 1)), ['"a\\\nb"\n', 'c\n'])
+
+
+def test_parse_cool_file():
+  text = sample_text('program.ast')
+  expected = astparse.parse_cool_ast(text, ast.simple_action_dict)
+  eq_(astparse.parse_cool_file(sample_path('program.ast'),
+                               ast.simple_action_dict), expected)
+  if memoryview is not None:
+    eq_(astparse.parse_cool_buffer(memoryview(text), ast.simple_action_dict),
+        expected)
+  with open(sample_path('program.ast'), 'rb') as ast_file:
+    data = mmap.mmap(ast_file.fileno(), 0, access=mmap.ACCESS_READ)
+  try:
+    eq_(astparse.parse_cool_buffer(data, ast.simple_action_dict), expected)
+  finally:
+    data.close()
+
+  directory = tempfile.mkdtemp()
+  try:
+    path = os.path.join(directory, 'empty.ast')
+    open(path, 'w').close()
+    eq_(astparse.parse_cool_file(path, ast.simple_action_dict), ['program'])
+  finally:
+    shutil.rmtree(directory)
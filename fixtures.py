@@ -0,0 +1,25 @@
+"""
+Sample data and helpers shared by the test modules.
+
+"""
+
+import os
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata')
+
+
+def sample_path(name):
+  return os.path.join(TESTDATA, name)
+
+
+def sample_text(name):
+  return open(sample_path(name)).read()
+
+
+def plain(value):
+  """Turn a tree of nodes into nested lists of (field, value) pairs."""
+  if isinstance(value, list):
+    return [plain(v) for v in value]
+  elif hasattr(value, 'items'):
+    return [value.type] + [(k, plain(v)) for k, v in value.items]
+  return value
@@ -0,0 +1,172 @@
+"""
+Sharing structurally identical leaf expressions of a parsed Cool AST.
+
+Generated code repeats the same small expressions over and over, like
+_int 0 : Int, _object self : SELF_TYPE and the _no_expr of attributes
+without an initializer.  `class`:HashConser wraps an action dict so that
+parsing builds each distinct leaf expression of a line once and hands
+the same node to every place on the line it appears.  Two leaves are
+then the same object exactly when they are equal, line numbers
+included, which makes identity a cheap common subexpression key.
+
+Only leaves are shared: larger expressions seldom repeat, and keeping a
+key for each of them costs more memory than sharing them saves.  As the
+line number is part of what makes two leaves equal, only the leaves of
+the line being parsed need to be remembered.
+
+The nodes are shared, so set_val on one raises ValueError instead of
+changing every place it appears.  Don't give shared trees to passes
+that annotate nodes, like semantic analysis.
+
+"""
+
+import astparse
+
+# The kinds of expression whose nodes are shared.
+shared_kinds = frozenset(['_no_expr', '_int', '_bool', '_string', '_object'])
+
+
+def structure_key(rule, values):
+  """Return the key of a node of rule with values, given that the nodes
+  among them are already shared.
+
+  Children are identified by id; that is safe because the node a key
+  belongs to keeps them alive.
+
+  """
+  key = [rule]
+  for value in values:
+    if value.__class__ is list:
+      key.append(tuple(map(id, value)))
+    elif isinstance(value, (str, int, long, float)):
+      key.append(value)
+    else:
+      key.append(id(value))
+  return tuple(key)
+
+
+def _kind(node):
+  """Return the kind of an expr_aux node, from any of the action dicts."""
+  if node.__class__ is list:
+    # ['expr_aux', lineno, kind, ...] from ast.simple_action_dict.
+    return node[2]
+  return getattr(node, 'type', None)
+
+
+# Read-only subclasses of node classes, by the class they derive from.
+_frozen_classes = {}
+
+
+def _refuse_set_val(self, name, val):
+  raise ValueError('Shared %s node is read only' % self.type)
+
+
+def freeze(node):
+  """Make set_val on node raise ValueError, by moving it to a subclass
+  of its class.  Nodes without set_val, like lists, are left alone."""
+  cls = node.__class__
+  if not hasattr(cls, 'set_val'):
+    return node
+  frozen = _frozen_classes.get(cls)
+  if frozen is None:
+    # No slots of its own, so the layout stays that of cls.
+    frozen = _frozen_classes[cls] = type(cls.__name__, (cls,), {
+      '__slots__': (),
+      '__module__': cls.__module__,
+      'set_val': _refuse_set_val,
+    })
+  node.__class__ = frozen
+  return node
+
+
+class HashConser(object):
+  """Shares the leaf expressions built by the action dicts it wraps.
+
+  nodes maps the `func`:structure_key of each leaf of the line being
+  parsed, and of the expr node around it, to the node.  It is emptied
+  when a leaf of another line comes along, and by `func`:clear, which
+  `func`:parse calls after each parse.  built counts the expr and
+  expr_aux nodes asked for and shared how many of those were already
+  there.
+
+  """
+
+  def __init__(self):
+    self.nodes = {}
+    self.lineno = None
+    self.built = 0
+    self.shared = 0
+    # (action dict, wrapped copy) pairs; a conser sees only a few.
+    self._wrapped = []
+
+  def wrap(self, action_dict):
+    """Return a copy of action_dict whose leaf expressions are shared;
+    pass it to astparse.parse_cool_ast."""
+    for original, wrapped in self._wrapped:
+      if original is action_dict:
+        return wrapped
+    wrapped = astparse.ActionDict(action_dict)
+    wrapped['expr_aux'] = self._shared_leaf(action_dict['expr_aux'])
+    wrapped['expr'] = self._shared_expr(action_dict['expr'])
+    self._wrapped.append((action_dict, wrapped))
+    return wrapped
+
+  def parse(self, ast_text, action_dict, engine='lalr'):
+    """Parse ast_text with action_dict, sharing leaves, and then forget
+    them."""
+    try:
+      return astparse.parse_cool_ast(ast_text, self.wrap(action_dict), engine)
+    finally:
+      self.clear()
+
+  def _share(self, action, r, p):
+    key = structure_key(r, p[1:])
+    node = self.nodes.get(key)
+    if node is not None:
+      self.shared += 1
+      return node
+    node = self.nodes[key] = freeze(action(r, p))
+    return node
+
+  def _shared_leaf(self, action):
+    # p is [None, lineno, kind, ...].
+    def shared(r, p):
+      self.built += 1
+      if p[2] not in shared_kinds:
+        return action(r, p)
+      if p[1] != self.lineno:
+        self.nodes.clear()
+        self.lineno = p[1]
+      return self._share(action, r, p)
+    return _keep_schema(action, shared)
+
+  def _shared_expr(self, action):
+    # p is [None, expr_aux, ':', type]; a shared expr_aux was just
+    # built, so it is in nodes.
+    def shared(r, p):
+      self.built += 1
+      if _kind(p[1]) not in shared_kinds:
+        return action(r, p)
+      return self._share(action, r, p)
+    return _keep_schema(action, shared)
+
+  def clear(self):
+    """Forget every node."""
+    self.nodes.clear()
+    self.lineno = None
+
+  def __len__(self):
+    return len(self.nodes)
+
+  def report(self):
+    """Return a line on how many nodes were shared."""
+    return '%d nodes built, %d shared (%.1f%%)' % (
+      self.built, self.shared, self.built and 100.0 * self.shared / self.built)
+
+
+def _keep_schema(action, wrapper):
+  # Keep the schema, so node classes can still be made from it.
+  for name in ('elms_spec', 'type_index'):
+    if hasattr(action, name):
+      setattr(wrapper, name, getattr(action, name))
+  return wrapper
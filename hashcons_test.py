@@ -0,0 +1,67 @@
+from nose.tools import eq_, raises
+
+import ast
+import astparse
+import hashcons
+import traverse
+from fixtures import sample_text
+
+
+def test_shared_tree_matches():
+  text = sample_text('program.ast')
+  for action_dict in (ast.simple_action_dict, ast.tuple_action_dict,
+                      ast.slots_action_dict):
+    conser = hashcons.HashConser()
+    for engine in ('lalr', 'll'):
+      eq_(ast.ast_to_str(astparse.parse_cool_ast(text, conser.wrap(action_dict), engine)),
+          ast.ast_to_str(astparse.parse_cool_ast(text, action_dict, engine)))
+
+
+def test_equal_leaves_are_shared():
+  text = sample_text('program.ast')
+  conser = hashcons.HashConser()
+  actions = conser.wrap(ast.tuple_action_dict)
+  eq_(conser.wrap(ast.tuple_action_dict) is actions, True)
+  program = astparse.parse_cool_ast(text, actions)
+
+  # Line 7 compares and uses y, and _object self appears twice on line 8.
+  objects = {}
+  for node in traverse.preorder(program):
+    if node.type == '_object':
+      objects.setdefault((node.lineno, node.name), set()).add(id(node))
+  eq_(len(objects[(7, 'y')]), 1)
+  eq_(len(objects[(8, 'self')]), 1)
+  eq_(conser.shared > 0, True)
+
+  # Larger expressions aren't shared, even when equal.
+  again = astparse.parse_cool_ast(text, actions)
+  assert (program.class_list[0].features[2].expr is not
+          again.class_list[0].features[2].expr)
+
+
+def test_only_one_line_is_kept():
+  text = sample_text('program.ast')
+  conser = hashcons.HashConser()
+  program = astparse.parse_cool_ast(text, conser.wrap(ast.slots_action_dict), 'll')
+  assert 0 < len(conser.nodes) <= 8
+  linenos = set(key[1] for key in conser.nodes if key[0] == 'expr_aux')
+  eq_(linenos, set([conser.lineno]))
+
+
+def test_parse_forgets_nodes():
+  text = sample_text('program.ast')
+  for action_dict in (ast.simple_action_dict, ast.slots_action_dict):
+    conser = hashcons.HashConser()
+    program = conser.parse(text, action_dict, 'll')
+    eq_(ast.ast_to_str(program),
+        ast.ast_to_str(astparse.parse_cool_ast(text, action_dict, 'll')))
+    eq_(len(conser), 0)
+
+
+@raises(ValueError)
+def test_shared_nodes_are_read_only():
+  conser = hashcons.HashConser()
+  program = conser.parse(sample_text('program.ast'), ast.slots_action_dict, 'll')
+  expr = program.class_list[0].features[0].init
+  eq_(isinstance(expr, ast.SlotsNode), True)
+  expr.set_val('static_type', 'Int')
@@ -0,0 +1,189 @@
+"""
+The class hierarchy of a Cool program.
+
+`class`:InheritanceGraph checks the hierarchy and answers the questions
+type checking asks of it: whether one class conforms to another, and
+the least upper bound of classes, each in constant time.
+
+"""
+
+# The basic classes every program can use, and their parents.
+basic_classes = (
+  ('Object', None),
+  ('IO', 'Object'),
+  ('Int', 'Object'),
+  ('String', 'Object'),
+  ('Bool', 'Object'),
+)
+
+ROOT = 'Object'
+
+
+class InheritanceError(ValueError):
+  """A problem with the class hierarchy, found at class node cls if known.
+
+  reason is the message without the line number.
+
+  """
+
+  def __init__(self, reason, cls=None):
+    self.reason = reason
+    self.cls = cls
+    self.lineno = getattr(cls, 'lineno', None)
+    message = reason
+    if self.lineno is not None:
+      message = '#%d: %s' % (self.lineno, reason)
+    ValueError.__init__(self, message)
+
+
+class InheritanceGraph(object):
+  """The inheritance tree of the classes of a program.
+
+  classes are nodes with name and parent fields, such as the class_list
+  of a parsed program; the basic classes are added unless basic is
+  false.  It raises `class`:InheritanceError if a class is defined
+  twice, inherits from an undefined class, or is part of a cycle.
+
+  order lists the classes parents first, starting with Object.  An
+  Euler tour of the tree lets `func`:conforms compare two intervals, and
+  a sparse table over it answers `func`:lub with two lookups.
+
+  """
+
+  def __init__(self, classes, basic=True):
+    self.parents = {}
+    self.nodes = {}
+    if basic:
+      for name, parent in basic_classes:
+        self.parents[name] = parent
+
+    for cls in classes:
+      name = cls.name
+      if name in self.parents:
+        raise InheritanceError('Class %s is already defined' % name, cls)
+      self.parents[name] = cls.parent
+      self.nodes[name] = cls
+
+    if ROOT not in self.parents:
+      raise InheritanceError('Class %s is not defined' % ROOT)
+
+    self.children = dict((name, []) for name in self.parents)
+    for name, parent in self.parents.items():
+      if parent is None:
+        if name != ROOT:
+          raise InheritanceError('Class %s has no parent' % name,
+                                 self.nodes.get(name))
+        continue
+      if parent not in self.children:
+        raise InheritanceError('Class %s inherits from undefined class %s' %
+                               (name, parent), self.nodes.get(name))
+      self.children[parent].append(name)
+
+    for names in self.children.values():
+      names.sort()
+
+    self._tour()
+
+    if len(self.order) != len(self.parents):
+      # Whatever Object doesn't reach is on, or under, a cycle.
+      cycle = sorted(set(self.parents) - set(self.depth))
+      raise InheritanceError('Inheritance cycle among %s' % ', '.join(cycle),
+                             self.nodes.get(cycle[0]))
+
+    self._sparse_table()
+
+  def _tour(self):
+    """Walk the tree from Object, numbering each class on the way in and
+    out, and listing the classes met, with their depths, in the tour."""
+    self.order = []
+    self.depth = {}
+    self.enter = {}
+    self.leave = {}
+    self.tour = []
+    self.tour_depths = []
+
+    # Items are (name, index of the next child to visit).
+    stack = [(ROOT, 0)]
+    self.depth[ROOT] = 0
+    while stack:
+      name, index = stack.pop()
+      depth = self.depth[name]
+      if index == 0:
+        self.enter[name] = len(self.tour)
+        self.order.append(name)
+      self.tour.append(name)
+      self.tour_depths.append(depth)
+
+      children = self.children[name]
+      if index < len(children):
+        child = children[index]
+        self.depth[child] = depth + 1
+        stack.append((name, index + 1))
+        stack.append((child, 0))
+      else:
+        self.leave[name] = len(self.tour) - 1
+
+  def _sparse_table(self):
+    """Build the tables of the shallowest tour entry in each power of two
+    long range, for `func`:lub."""
+    depths = self.tour_depths
+    level = range(len(depths))
+    self.levels = [level]
+    width = 1
+    while width * 2 <= len(depths):
+      next_level = []
+      for i in xrange(len(level) - width):
+        a = level[i]
+        b = level[i + width]
+        next_level.append(a if depths[a] <= depths[b] else b)
+      level = next_level
+      self.levels.append(level)
+      width *= 2
+
+    # log2[n] is the level whose ranges are the longest that fit in n.
+    self.log2 = [0, 0]
+    for n in xrange(2, len(depths) + 1):
+      self.log2.append(self.log2[n // 2] + 1)
+
+  def __contains__(self, name):
+    return name in self.parents
+
+  def __len__(self):
+    return len(self.parents)
+
+  def parent(self, name):
+    """Return the parent of class name, or None for Object."""
+    return self.parents[name]
+
+  def ancestors(self, name):
+    """Yield class name and then each of its ancestors up to Object."""
+    while name is not None:
+      yield name
+      name = self.parents[name]
+
+  def conforms(self, name, ancestor):
+    """Does class name inherit from class ancestor, or is it ancestor?"""
+    enter = self.enter[name]
+    return self.enter[ancestor] <= enter and enter <= self.leave[ancestor]
+
+  def lub(self, name, *names):
+    """Return the least upper bound of the classes: the closest class
+    they all conform to."""
+    for other in names:
+      name = self._lub(name, other)
+    return name
+
+  def _lub(self, a, b):
+    start = self.enter[a]
+    stop = self.enter[b]
+    if start > stop:
+      start, stop = stop, start
+
+    # Two overlapping power of two long ranges cover start to stop.
+    level = self.log2[stop - start + 1]
+    table = self.levels[level]
+    i = table[start]
+    j = table[stop - (1 << level) + 1]
+    if self.tour_depths[j] < self.tour_depths[i]:
+      i = j
+    return self.tour[i]
@@ -0,0 +1,70 @@
+from collections import namedtuple
+
+from nose.tools import eq_
+
+import ast
+import astparse
+from inheritance import InheritanceError, InheritanceGraph
+from fixtures import sample_text
+
+
+Class = namedtuple('Class', 'name parent lineno')
+
+
+def graph_of(pairs):
+  return InheritanceGraph([Class(name, parent, i + 1)
+                           for i, (name, parent) in enumerate(pairs)])
+
+
+def error_of(pairs):
+  try:
+    graph_of(pairs)
+  except InheritanceError, e:
+    return str(e)
+  assert False, 'accepted a bad hierarchy'
+
+
+def test_program():
+  text = sample_text('program.ast')
+  program = astparse.parse_cool_ast(text, ast.tuple_action_dict)
+  graph = InheritanceGraph(program.class_list)
+  eq_(graph.order[0], 'Object')
+  eq_(list(graph.ancestors('Main')), ['Main', 'IO', 'Object'])
+  assert graph.conforms('Main', 'IO')
+  assert not graph.conforms('IO', 'Main')
+  eq_(graph.lub('Main', 'A'), 'Object')
+
+
+def test_queries():
+  graph = graph_of([('A', 'Object'), ('B', 'A'), ('C', 'A'), ('D', 'B'),
+                    ('E', 'D'), ('F', 'IO')])
+  for name in graph.order:
+    assert graph.order.index(graph.parent(name) or 'Object') <= graph.order.index(name)
+
+  names = sorted(graph.parents)
+  for a in names:
+    for b in names:
+      eq_(graph.conforms(a, b), b in graph.ancestors(a))
+      ancestors = list(graph.ancestors(a))
+      expected = [c for c in graph.ancestors(b) if c in ancestors][0]
+      eq_(graph.lub(a, b), expected)
+
+  eq_(graph.lub('E', 'C', 'B'), 'A')
+  eq_(graph.lub('E'), 'E')
+
+
+def test_deep_hierarchy():
+  depth = 5000
+  graph = graph_of([('C0', 'Object')] +
+                   [('C%d' % i, 'C%d' % (i - 1)) for i in xrange(1, depth)])
+  assert graph.conforms('C4999', 'C0')
+  eq_(graph.lub('C4999', 'C2500'), 'C2500')
+  eq_(graph.depth['C4999'], depth)
+
+
+def test_errors():
+  eq_(error_of([('A', 'B')]), '#1: Class A inherits from undefined class B')
+  eq_(error_of([('A', 'Object'), ('A', 'IO')]), '#2: Class A is already defined')
+  eq_(error_of([('Int', 'Object')]), '#1: Class Int is already defined')
+  eq_(error_of([('A', 'B'), ('B', 'C'), ('C', 'A'), ('D', 'C')]),
+      '#1: Inheritance cycle among A, B, C, D')
@@ -0,0 +1,163 @@
+"""
+Object layouts and dispatch tables for Cool classes.
+
+`class`:ProgramLayout lays out every class of a program once, parents
+first, so each class starts from a copy of its parent's tables.  Pass a
+`class`:LayoutCache to reuse the layouts of classes that haven't changed
+since an earlier compilation.
+
+"""
+
+import hashlib
+
+from inheritance import InheritanceGraph
+
+# The methods of the basic classes, which the AST dump leaves out.
+basic_methods = {
+  'Object': ('abort', 'type_name', 'copy'),
+  'IO': ('out_string', 'out_int', 'in_string', 'in_int'),
+  'Int': (),
+  'String': ('length', 'concat', 'substr'),
+  'Bool': (),
+}
+
+
+class ClassLayout(object):
+  """The layout of the objects of one class, and its dispatch table.
+
+  attrs lists the attributes of an object, inherited ones first, and
+  attr_offsets gives the index of each in it.  vtable lists the
+  (method, defining class) pairs of the dispatch table: an override
+  keeps the slot of the method it overrides, and new methods go at the
+  end.  method_slots gives the index of each method in it.
+
+  Offsets count attributes, not bytes; code generators add their own
+  object header.
+
+  """
+
+  def __init__(self, name, parent, attrs, methods):
+    self.name = name
+    self.parent = parent
+    if parent is None:
+      self.attrs = []
+      self.attr_offsets = {}
+      self.vtable = []
+      self.method_slots = {}
+    else:
+      self.attrs = list(parent.attrs)
+      self.attr_offsets = parent.attr_offsets.copy()
+      self.vtable = list(parent.vtable)
+      self.method_slots = parent.method_slots.copy()
+
+    for attr in attrs:
+      if attr in self.attr_offsets:
+        raise ValueError('Class %s redefines attribute %s' % (name, attr))
+      self.attr_offsets[attr] = len(self.attrs)
+      self.attrs.append(attr)
+
+    seen = set()
+    for method in methods:
+      if method in seen:
+        raise ValueError('Class %s defines method %s twice' % (name, method))
+      seen.add(method)
+      slot = self.method_slots.get(method)
+      if slot is None:
+        self.method_slots[method] = len(self.vtable)
+        self.vtable.append((method, name))
+      else:
+        self.vtable[slot] = (method, name)
+
+    self.key = layout_key(name, parent, attrs, methods)
+
+
+def layout_key(name, parent, attrs, methods):
+  """Return a digest of everything the layout of a class depends on.
+
+  It covers the parent's key, so it changes when any ancestor does.
+
+  """
+  digest = hashlib.md5(parent and parent.key or '')
+  digest.update('\0'.join([name, ','.join(attrs), ','.join(methods)]))
+  return digest.digest()
+
+
+def class_features(cls):
+  """Return the attribute and method names of the class node cls."""
+  attrs = []
+  methods = []
+  for feature in cls.features:
+    if feature.type == '_attr':
+      attrs.append(feature.name)
+    else:
+      methods.append(feature.name)
+  return attrs, methods
+
+
+class LayoutCache(object):
+  """Class layouts by `func`:layout_key, kept across compilations."""
+
+  def __init__(self):
+    self.layouts = {}
+    self.hits = 0
+    self.misses = 0
+
+  def __len__(self):
+    return len(self.layouts)
+
+  def layout(self, name, parent, attrs, methods):
+    """Return the layout of the class, reusing a cached one if it's the same."""
+    key = layout_key(name, parent, attrs, methods)
+    layout = self.layouts.get(key)
+    if layout is None:
+      self.misses += 1
+      layout = self.layouts[key] = ClassLayout(name, parent, attrs, methods)
+    else:
+      self.hits += 1
+    return layout
+
+
+class ProgramLayout(object):
+  """The layouts of every class of a program, by name.
+
+  classes are class nodes, such as the class_list of a program parsed
+  with ast.tuple_action_dict.  graph is their
+  `class`:inheritance.InheritanceGraph, built if not given.
+
+  """
+
+  def __init__(self, classes, graph=None, cache=None):
+    if graph is None:
+      graph = InheritanceGraph(classes)
+    self.graph = graph
+    self.layouts = {}
+    for name in graph.order:
+      cls = graph.nodes.get(name)
+      if cls is None:
+        attrs, methods = (), basic_methods.get(name, ())
+      else:
+        attrs, methods = class_features(cls)
+
+      parent = graph.parents[name]
+      parent = parent and self.layouts[parent]
+      if cache is None:
+        layout = ClassLayout(name, parent, attrs, methods)
+      else:
+        layout = cache.layout(name, parent, attrs, methods)
+      self.layouts[name] = layout
+
+  def __getitem__(self, name):
+    return self.layouts[name]
+
+  def attr_offset(self, class_name, attr):
+    """Return the index of attr in objects of class class_name."""
+    return self.layouts[class_name].attr_offsets[attr]
+
+  def method_slot(self, class_name, method):
+    """Return the index of method in the dispatch table of class_name."""
+    return self.layouts[class_name].method_slots[method]
+
+  def method_owner(self, class_name, method):
+    """Return the class whose method class_name dispatches to."""
+    layout = self.layouts[class_name]
+    return layout.vtable[layout.method_slots[method]][1]
@@ -0,0 +1,114 @@
+from nose.tools import eq_, raises
+
+import ast
+import astparse
+from layout import LayoutCache, ProgramLayout
+from fixtures import sample_text
+
+
+PROGRAM = '''#1
+_program
+#1
+_class
+  A
+  Object
+  "a.cl"
+  (
+  #2
+  _attr
+    x
+    Int
+    #0
+    _no_expr
+    : _no_type
+  #3
+  _method
+    f
+    Int
+    #3
+    _int
+      1
+    : Int
+  #4
+  _method
+    g
+    Int
+    #4
+    _int
+      2
+    : Int
+  )
+#6
+_class
+  B
+  A
+  "a.cl"
+  (
+  #7
+  _method
+    g
+    Int
+    #7
+    _int
+      3
+    : Int
+  #8
+  _attr
+    y
+    Int
+    #0
+    _no_expr
+    : _no_type
+  #9
+  _method
+    h
+    Int
+    #9
+    _int
+      4
+    : Int
+  )
+'''
+
+
+def classes_of(text):
+  return astparse.parse_cool_ast(text, ast.tuple_action_dict).class_list
+
+
+def test_layout():
+  layouts = ProgramLayout(classes_of(PROGRAM))
+  eq_(layouts['B'].attrs, ['x', 'y'])
+  eq_(layouts.attr_offset('B', 'y'), 1)
+  eq_(layouts['B'].vtable, [('abort', 'Object'), ('type_name', 'Object'),
+                            ('copy', 'Object'), ('f', 'A'), ('g', 'B'), ('h', 'B')])
+  eq_(layouts.method_slot('A', 'g'), layouts.method_slot('B', 'g'))
+  eq_(layouts.method_owner('A', 'g'), 'A')
+  eq_(layouts.method_owner('B', 'g'), 'B')
+  eq_(layouts.method_owner('B', 'copy'), 'Object')
+
+
+def test_sample_program():
+  text = sample_text('program.ast')
+  layouts = ProgramLayout(classes_of(text))
+  eq_(layouts['Main'].attrs, ['x', 's'])
+  eq_(layouts.method_owner('Main', 'out_string'), 'IO')
+  eq_(layouts.method_slot('Main', 'main'), 7)
+
+
+def test_cache():
+  cache = LayoutCache()
+  first = ProgramLayout(classes_of(PROGRAM), cache=cache)
+  eq_((cache.hits, cache.misses), (0, 7))
+
+  second = ProgramLayout(classes_of(PROGRAM), cache=cache)
+  eq_((cache.hits, cache.misses), (7, 7))
+  assert second['B'] is first['B']
+
+  # Changing A lays out A and B again, but not the basic classes.
+  ProgramLayout(classes_of(PROGRAM.replace('    x\n', '    z\n')), cache=cache)
+  eq_((cache.hits, cache.misses), (12, 9))
+
+
+@raises(ValueError)
+def test_redefined_attribute():
+  ProgramLayout(classes_of(PROGRAM.replace('    y\n', '    x\n')))
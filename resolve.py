@@ -0,0 +1,130 @@
+"""
+Lexical addresses of the variables of a Cool program.
+
+`func`:resolve_program walks each class once and stores, with
+set_val('address', ...), where every variable that an _object or
+_assign node names lives: an attribute offset in self, a formal's
+index, or a local slot of a let or case branch.  The _let and _branch
+nodes get the slot of the variable they bind, and the resolver records
+how many local slots each method, and the attribute initializers of
+each class, need.  Code generators and interpreters can then keep
+variables in arrays and never look names up at run time.
+
+"""
+
+from collections import namedtuple
+
+from layout import ProgramLayout
+from symboltable import ShadowSymbolTable
+from traverse import ScopedVisitor
+
+# Kinds of address.
+SELF = 'self'
+ATTR = 'attr'
+FORMAL = 'formal'
+LOCAL = 'local'
+
+# Where a variable lives: index is the attribute offset, formal index or
+# local slot, by kind, and 0 for self.
+Address = namedtuple('Address', 'kind index')
+
+SELF_ADDRESS = Address(SELF, 0)
+
+
+class Resolver(ScopedVisitor):
+  """Stores the addresses of a program's variables; see
+  `func`:resolve_program.
+
+  layout is the `class`:layout.ProgramLayout the attribute offsets come
+  from.  unresolved lists the _object and _assign nodes whose names
+  aren't defined.  max_locals maps (class, method) to the local slots
+  the method needs at once, and (class, None) to those the attribute
+  initializers of the class need.
+
+  Local slots are reused: a let or case variable takes the lowest slot
+  free when it is bound, and frees it when its scope ends.
+
+  """
+
+  def __init__(self, layout):
+    ScopedVisitor.__init__(self, ShadowSymbolTable())
+    self.layout = layout
+    self.unresolved = []
+    self.max_locals = {}
+    self.cls = None
+    self.method = None
+    # Slots in use in the current method, or in the attribute
+    # initializers of the current class, and the most in use at once.
+    self.locals = 0
+    self.peak = 0
+    self.class_peak = 0
+
+  def bind(self, node):
+    symbols = self.symbols
+    kind = node.type
+    if kind == '_class':
+      for offset, attr in enumerate(self.layout[node.name].attrs):
+        symbols.add(attr, Address(ATTR, offset))
+      self.cls = node
+      self.locals = self.peak = 0
+    elif kind == '_method':
+      self.method = node
+      self.class_peak = self.peak
+      self.locals = self.peak = 0
+      for index, formal in enumerate(node.formals):
+        # Duplicates are semantic errors; the first one wins here.
+        if symbols.check_scope(formal.name) is None:
+          symbols.add(formal.name, Address(FORMAL, index))
+    else:
+      address = Address(LOCAL, self.locals)
+      self.locals += 1
+      self.peak = max(self.peak, self.locals)
+      symbols.add(kind == '_let' and node.id1 or node.name, address)
+      node.set_val('address', address)
+
+  def exit(self, node):
+    kind = node.type
+    if kind == '_class':
+      self.max_locals[node.name, None] = self.peak
+      self.cls = None
+    elif kind == '_method':
+      self.max_locals[self.cls.name, node.name] = self.peak
+      self.method = None
+      self.locals = 0
+      self.peak = self.class_peak
+    else:
+      self.locals -= 1
+    ScopedVisitor.exit(self, node)
+
+  def resolve(self, node, name):
+    if name == 'self':
+      address = SELF_ADDRESS
+    else:
+      address = self.symbols.find(name)
+      if address is None:
+        self.unresolved.append(node)
+    node.set_val('address', address)
+
+  def visit_object(self, node):
+    self.resolve(node, node.name)
+
+  def visit_assign(self, node):
+    self.resolve(node, node.id)
+
+
+def resolve_program(program, layout=None):
+  """Store the lexical address of every variable of program.
+
+  program is a parsed program whose class hierarchy is sound, such as
+  one semant.check_program passes.  layout is its
+  `class`:layout.ProgramLayout, made if not given.  Returns the
+  `class`:Resolver, whose unresolved lists any undefined names.
+
+  """
+  classes = program.class_list
+  if layout is None:
+    layout = ProgramLayout(classes)
+  resolver = Resolver(layout)
+  for cls in classes:
+    resolver.visit(cls)
+  return resolver
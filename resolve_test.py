@@ -0,0 +1,100 @@
+from nose.tools import eq_
+
+import ast
+import astgen
+import astparse
+import resolve
+import traverse
+from resolve import Address, ATTR, FORMAL, LOCAL, SELF_ADDRESS
+from fixtures import sample_text
+
+
+def addresses(program):
+  """Return the (kind, name, address) of every node with an address."""
+  result = []
+  for node in traverse.preorder(program):
+    if node.type in ('_object', '_branch'):
+      result.append((node.type, node.name, node.address))
+    elif node.type == '_assign':
+      result.append((node.type, node.id, node.address))
+    elif node.type == '_let':
+      result.append((node.type, node.id1, node.address))
+  return result
+
+
+def test_resolve_sample():
+  text = sample_text('program.ast')
+  for action_dict in (ast.tuple_action_dict, ast.slots_action_dict):
+    program = astparse.parse_cool_ast(text, action_dict)
+    resolver = resolve.resolve_program(program)
+    eq_(resolver.unresolved, [])
+    eq_(resolver.max_locals, {('Main', None): 0, ('Main', 'main'): 1, ('A', None): 0})
+    eq_(addresses(program), [
+      ('_object', 'self', SELF_ADDRESS),
+      ('_let', 'y', Address(LOCAL, 0)),
+      ('_object', 'x', Address(ATTR, 0)),
+      ('_object', 'y', Address(LOCAL, 0)),
+      ('_assign', 'y', Address(LOCAL, 0)),
+      ('_object', 'y', Address(LOCAL, 0)),
+      ('_object', 'self', SELF_ADDRESS),
+      ('_object', 'self', SELF_ADDRESS),
+      ('_branch', 'o', Address(LOCAL, 0)),
+      ('_branch', 'i', Address(LOCAL, 0)),
+      ('_object', 'i', Address(LOCAL, 0)),
+    ])
+    # The addresses aren't dumped.
+    eq_(ast.ast_to_str(program), ast.ast_to_str(astparse.parse_cool_ast(text, action_dict)))
+
+
+def test_resolve_generated():
+  program = astparse.parse_cool_ast(astgen.generate_program(classes=6, depth=3),
+                                    ast.slots_action_dict)
+  resolver = resolve.resolve_program(program)
+  eq_(resolver.unresolved, [])
+
+  # Attributes, inherited ones included, are at their layout offsets.
+  attrs = 0
+  for cls in program.class_list:
+    for node in traverse.preorder(cls):
+      if node.type == '_object' and node.address.kind == ATTR:
+        eq_(node.address.index, resolver.layout.attr_offset(cls.name, node.name))
+        attrs += 1
+      elif node.type == '_object' and node.name == 'x':
+        eq_(node.address, Address(FORMAL, 0))
+  assert attrs > 0
+  eq_(resolver.layout.attr_offset('C2', 'c2_n'), 4)
+
+  for (cls, method), count in resolver.max_locals.items():
+    assert count >= 0
+  assert max(resolver.max_locals.values()) > 0
+
+
+def test_resolved_dump():
+  text = astgen.generate_program(classes=6, depth=3)
+  for action_dict in (ast.tuple_action_dict, ast.slots_action_dict):
+    program = astparse.parse_cool_ast(text, action_dict, 'll')
+    resolve.resolve_program(program)
+    eq_(ast.ast_to_str(program), text)
+
+
+def test_nested_slots():
+  # let a in (let b in a + b) + (case a of c : Int => c esac)
+  def obj(name):
+    return ['#1', '_object', name, ': Int']
+
+  text = '\n'.join([
+    '#1', '_program', '#1', '_class', 'A', 'Object', '"a.cl"', '(',
+    '#1', '_method', 'f', 'Int',
+    '#1', '_let', 'a', 'Int', '#1', '_no_expr', ': _no_type',
+    '#1', '_plus',
+    '#1', '_let', 'b', 'Int', '#1', '_no_expr', ': _no_type',
+    '#1', '_plus'] + obj('a') + obj('b') + [': Int', ': Int',
+    '#1', '_typcase'] + obj('a') + [
+    '#1', '_branch', 'c', 'Int'] + obj('c') + [': Int',
+    ': Int', ': Int', ')', ''])
+  program = astparse.parse_cool_ast(text, ast.tuple_action_dict, 'll')
+  resolver = resolve.resolve_program(program)
+  eq_(resolver.max_locals[('A', 'f')], 2)
+  eq_([(name, address.index) for kind, name, address in addresses(program)
+       if kind != '_object'],
+      [('a', 0), ('b', 1), ('c', 1)])
@@ -0,0 +1,586 @@
+"""
+Semantic analysis of Cool programs.
+
+`func`:check_program does the work of the Cool compiler's semant phase
+on a parsed program: it checks the class hierarchy, the features of
+each class and the type of every expression, and stores the static type
+of each expr node with set_val('type', ...).  Errors are collected in
+the coolc format rather than raised, and the time each phase takes is
+kept so it is easy to see where the time goes on large programs.
+
+"""
+
+import time
+from collections import namedtuple
+
+from brownie.datastructures import OrderedDict
+
+from inheritance import InheritanceError, InheritanceGraph, ROOT
+from symboltable import ShadowSymbolTable
+
+SELF_TYPE = 'SELF_TYPE'
+NO_TYPE = '_no_type'
+
+# The methods of the basic classes, which the AST dump leaves out, as
+# (name, formal types, return type).
+basic_methods = {
+  'Object': (('abort', (), 'Object'),
+             ('type_name', (), 'String'),
+             ('copy', (), SELF_TYPE)),
+  'IO': (('out_string', ('String',), SELF_TYPE),
+         ('out_int', ('Int',), SELF_TYPE),
+         ('in_string', (), 'String'),
+         ('in_int', (), 'Int')),
+  'String': (('length', (), 'Int'),
+             ('concat', ('String',), 'String'),
+             ('substr', ('Int', 'Int'), 'String')),
+}
+
+# Basic classes that can't be inherited from, or compared with others.
+final_classes = frozenset(['Int', 'String', 'Bool'])
+
+_operators = {'_plus': '+', '_sub': '-', '_mul': '*', '_divide': '/',
+              '_lt': '<', '_leq': '<='}
+
+# The method a class dispatches to: where it is defined, and its types.
+Signature = namedtuple('Signature', 'owner formals formal_types return_type')
+
+
+def type_field(node):
+  """Return the field of node named type, which node.type doesn't give:
+  that is the kind of node."""
+  return node.rule_vals['type']
+
+
+class TypeChecker(object):
+  """Checks one program; see `func`:check_program.
+
+  errors lists the errors found, as 'file:line: message' strings.
+  timings maps each phase to the seconds it took.  graph is the
+  `class`:inheritance.InheritanceGraph of the program, or None if the
+  class hierarchy is broken.
+
+  """
+
+  def __init__(self, program):
+    self.program = program
+    self.errors = []
+    self.timings = OrderedDict()
+    self.graph = None
+    # Signatures of the methods each class defines, by (class, method).
+    self.methods = {}
+    # Signatures each class dispatches to, filled in as they're asked for.
+    self.signatures = {}
+    self.env = ShadowSymbolTable()
+    self.current = None
+    self.current_node = None
+
+    self.rules = {
+      '_no_expr': self.check_no_expr,
+      '_int': self.check_int,
+      '_string': self.check_string,
+      '_bool': self.check_bool,
+      '_object': self.check_object,
+      '_assign': self.check_assign,
+      '_new': self.check_new,
+      '_isvoid': self.check_isvoid,
+      '_plus': self.check_arith,
+      '_sub': self.check_arith,
+      '_mul': self.check_arith,
+      '_divide': self.check_arith,
+      '_lt': self.check_compare,
+      '_leq': self.check_compare,
+      '_eq': self.check_eq,
+      '_neg': self.check_neg,
+      '_comp': self.check_comp,
+      '_cond': self.check_cond,
+      '_loop': self.check_loop,
+      '_block': self.check_block,
+      '_let': self.check_let,
+      '_typcase': self.check_typcase,
+      '_dispatch': self.check_dispatch,
+      '_static_dispatch': self.check_static_dispatch,
+    }
+
+  def check(self):
+    """Run every phase, and return whether the program is free of errors."""
+    for phase, fn in (('class table', self.check_classes),
+                      ('features', self.check_features),
+                      ('expressions', self.check_expressions)):
+      start = time.time()
+      fn()
+      self.timings[phase] = time.time() - start
+      if self.graph is None:
+        break
+
+    return not self.errors
+
+  def error(self, lineno, message):
+    if self.current_node is None:
+      self.errors.append(message)
+    else:
+      self.errors.append('%s:%d: %s' % (self.current_node.filename, lineno, message))
+
+  ######################################################################
+  # Phases
+  ######################################################################
+
+  def check_classes(self):
+    """Build the class hierarchy, or report why it can't be."""
+    classes = self.program.class_list
+    for cls in classes:
+      self.current_node = cls
+      if cls.name == SELF_TYPE:
+        self.error(cls.lineno, 'Redefinition of basic class SELF_TYPE.')
+        return
+      if cls.parent in final_classes or cls.parent == SELF_TYPE:
+        self.error(cls.lineno, 'Class %s cannot inherit class %s.' %
+                   (cls.name, cls.parent))
+        return
+
+    try:
+      self.graph = InheritanceGraph(classes)
+    except InheritanceError, e:
+      self.current_node = e.cls
+      self.error(e.lineno, e.reason + '.')
+
+    self.current_node = None
+    if self.graph is not None and 'Main' not in self.graph.nodes:
+      self.error(0, 'Class Main is not defined.')
+
+  def check_features(self):
+    """Collect the signature of every method, parents first, checking
+    the types they use and how they override inherited methods."""
+    for name, methods in basic_methods.items():
+      for method, formal_types, return_type in methods:
+        self.methods[name, method] = Signature(name, (), formal_types, return_type)
+
+    graph = self.graph
+    for name in graph.order:
+      cls = self.current_node = graph.nodes.get(name)
+      if cls is None:
+        continue
+      self.current = name
+      for feature in cls.features:
+        if feature.type == '_method':
+          self.add_method(feature)
+
+    main = graph.nodes.get('Main')
+    if main is not None and ('Main', 'main') not in self.methods:
+      self.current_node = main
+      self.error(main.lineno, "No 'main' method in class Main.")
+
+  def add_method(self, method):
+    name = method.name
+    if (self.current, name) in self.methods:
+      self.error(method.lineno, 'Method %s is multiply defined.' % name)
+      return
+
+    formals = []
+    formal_types = []
+    for formal in method.formals:
+      formal_type = type_field(formal)
+      if formal.name == 'self':
+        self.error(formal.lineno, "'self' cannot be the name of a formal parameter.")
+      elif formal.name in formals:
+        self.error(formal.lineno, 'Formal parameter %s is multiply defined.' % formal.name)
+      if formal_type == SELF_TYPE:
+        self.error(formal.lineno, 'Formal parameter %s cannot have type SELF_TYPE.' %
+                   formal.name)
+        formal_type = 'Object'
+      elif formal_type not in self.graph:
+        self.error(formal.lineno, 'Class %s of formal parameter %s is undefined.' %
+                   (formal_type, formal.name))
+        formal_type = 'Object'
+      formals.append(formal.name)
+      formal_types.append(formal_type)
+
+    return_type = type_field(method)
+    if not self.known(return_type):
+      self.error(method.lineno, 'Undefined return type %s in method %s.' %
+                 (return_type, name))
+      return_type = 'Object'
+
+    inherited = self.method_signature(self.graph.parents[self.current], name)
+    if inherited is not None:
+      if len(formal_types) != len(inherited.formal_types):
+        self.error(method.lineno, 'Incompatible number of formal parameters in '
+                   'redefined method %s.' % name)
+      else:
+        for formal_type, original in zip(formal_types, inherited.formal_types):
+          if formal_type != original:
+            self.error(method.lineno, 'In redefined method %s, parameter type %s '
+                       'is different from original type %s' %
+                       (name, formal_type, original))
+      if return_type != inherited.return_type:
+        self.error(method.lineno, 'In redefined method %s, return type %s is '
+                   'different from original return type %s.' %
+                   (name, return_type, inherited.return_type))
+
+    self.methods[self.current, name] = Signature(self.current, tuple(formals),
+                                                 tuple(formal_types), return_type)
+
+  def check_expressions(self):
+    """Check the attributes and methods of each class, walking down the
+    class tree so each class's scope sits inside its parent's."""
+    graph = self.graph
+    # Items are (class, whether to leave its scope).
+    stack = [(ROOT, False)]
+    while stack:
+      name, leave = stack.pop()
+      if leave:
+        self.env.leave_scope()
+        continue
+
+      self.env.enter_scope()
+      stack.append((name, True))
+      cls = graph.nodes.get(name)
+      if cls is not None:
+        self.check_class(cls)
+      stack.extend((child, False) for child in reversed(graph.children[name]))
+
+  def check_class(self, cls):
+    self.current = cls.name
+    self.current_node = cls
+    env = self.env
+
+    attrs = []
+    for feature in cls.features:
+      if feature.type != '_attr':
+        continue
+      name = feature.name
+      declared = type_field(feature)
+      if not self.known(declared):
+        self.error(feature.lineno, 'Class %s of attribute %s is undefined.' %
+                   (declared, name))
+        declared = 'Object'
+      if name == 'self':
+        self.error(feature.lineno, "'self' cannot be the name of an attribute.")
+      elif env.check_scope(name) is not None:
+        self.error(feature.lineno, 'Attribute %s is multiply defined in class.' % name)
+      elif env.find(name) is not None:
+        self.error(feature.lineno, 'Attribute %s is an attribute of an inherited class.' %
+                   name)
+      else:
+        env.add(name, declared)
+      attrs.append((feature, declared))
+
+    for feature, declared in attrs:
+      init_type = self.check_expr(feature.init)
+      if init_type != NO_TYPE and not self.conforms(init_type, declared):
+        self.error(feature.lineno, 'Inferred type %s of initialization of attribute '
+                   '%s does not conform to declared type %s.' %
+                   (init_type, feature.name, declared))
+
+    for feature in cls.features:
+      if feature.type != '_method':
+        continue
+      signature = self.methods[self.current, feature.name]
+      with env.in_scope():
+        for formal, formal_type in zip(signature.formals, signature.formal_types):
+          if formal != 'self' and env.check_scope(formal) is None:
+            env.add(formal, formal_type)
+        body_type = self.check_expr(feature.expr)
+
+      return_type = signature.return_type
+      if signature.owner == self.current and not self.conforms(body_type, return_type):
+        self.error(feature.lineno, 'Inferred return type %s of method %s does not '
+                   'conform to declared return type %s.' %
+                   (body_type, feature.name, return_type))
+
+  ######################################################################
+  # Types
+  ######################################################################
+
+  def known(self, type_name):
+    return type_name == SELF_TYPE or type_name in self.graph
+
+  def conforms(self, type_name, ancestor):
+    """Does type_name conform to ancestor, in the current class?"""
+    if type_name == ancestor or type_name == NO_TYPE:
+      return True
+    elif ancestor == SELF_TYPE:
+      return False
+    elif type_name == SELF_TYPE:
+      type_name = self.current
+    return self.graph.conforms(type_name, ancestor)
+
+  def lub(self, a, b):
+    if a == b:
+      return a
+    if a == SELF_TYPE:
+      a = self.current
+    if b == SELF_TYPE:
+      b = self.current
+    return self.graph.lub(a, b)
+
+  def method_signature(self, class_name, method):
+    """Return the `class`:Signature class_name dispatches method to, or
+    None.  Answers are cached, along with those for the classes passed
+    on the way up to where the method is defined."""
+    key = (class_name, method)
+    signature = self.signatures.get(key, False)
+    if signature is not False:
+      return signature
+
+    missed = []
+    signature = None
+    while class_name is not None:
+      key = (class_name, method)
+      signature = self.signatures.get(key, False)
+      if signature is not False:
+        break
+      missed.append(key)
+      signature = self.methods.get(key)
+      if signature is not None:
+        break
+      class_name = self.graph.parents[class_name]
+
+    for key in missed:
+      self.signatures[key] = signature
+    return signature
+
+  ######################################################################
+  # Expressions
+  ######################################################################
+
+  def check_expr(self, expr):
+    """Check expr and every expression in it, storing their types.
+
+    Each rule is a generator that yields the expr nodes it needs the
+    types of, which are sent back, and then yields its own type.  The
+    generators are kept on a stack, so deep nesting can't hit the
+    recursion limit.
+
+    """
+    rules = self.rules
+    aux = expr.expr_aux
+    stack = [(expr, rules[aux.type](aux))]
+    value = None
+    while stack:
+      item = stack[-1][1].send(value)
+      if isinstance(item, basestring):
+        stack.pop()[0].set_val('type', item)
+        value = item
+      else:
+        aux = item.expr_aux
+        stack.append((item, rules[aux.type](aux)))
+        value = None
+
+    return value
+
+  def check_no_expr(self, aux):
+    yield NO_TYPE
+
+  def check_int(self, aux):
+    yield 'Int'
+
+  def check_string(self, aux):
+    yield 'String'
+
+  def check_bool(self, aux):
+    yield 'Bool'
+
+  def check_object(self, aux):
+    if aux.name == 'self':
+      yield SELF_TYPE
+    else:
+      object_type = self.env.find(aux.name)
+      if object_type is None:
+        self.error(aux.lineno, 'Undeclared identifier %s.' % aux.name)
+        object_type = 'Object'
+      yield object_type
+
+  def check_assign(self, aux):
+    expr_type = yield aux.expr
+    name = aux.id
+    declared = self.env.find(name)
+    if name == 'self':
+      self.error(aux.lineno, "Cannot assign to 'self'.")
+    elif declared is None:
+      self.error(aux.lineno, 'Assignment to undeclared variable %s.' % name)
+    elif not self.conforms(expr_type, declared):
+      self.error(aux.lineno, 'Type %s of assigned expression does not conform to '
+                 'declared type %s of identifier %s.' % (expr_type, declared, name))
+    yield expr_type
+
+  def check_new(self, aux):
+    new_type = aux.id
+    if not self.known(new_type):
+      self.error(aux.lineno, "'new' used with undefined class %s." % new_type)
+      new_type = 'Object'
+    yield new_type
+
+  def check_isvoid(self, aux):
+    yield aux.expr
+    yield 'Bool'
+
+  def check_arith(self, aux):
+    left = yield aux.expr1
+    right = yield aux.expr2
+    if left != 'Int' or right != 'Int':
+      self.error(aux.lineno, 'non-Int arguments: %s %s %s' %
+                 (left, _operators[aux.type], right))
+    yield 'Int'
+
+  def check_compare(self, aux):
+    left = yield aux.expr1
+    right = yield aux.expr2
+    if left != 'Int' or right != 'Int':
+      self.error(aux.lineno, 'non-Int arguments: %s %s %s' %
+                 (left, _operators[aux.type], right))
+    yield 'Bool'
+
+  def check_eq(self, aux):
+    left = yield aux.expr1
+    right = yield aux.expr2
+    if left != right and (left in final_classes or right in final_classes):
+      self.error(aux.lineno, 'Illegal comparison with a basic type.')
+    yield 'Bool'
+
+  def check_neg(self, aux):
+    expr_type = yield aux.expr
+    if expr_type != 'Int':
+      self.error(aux.lineno, "Argument of '~' has type %s instead of Int." % expr_type)
+    yield 'Int'
+
+  def check_comp(self, aux):
+    expr_type = yield aux.expr
+    if expr_type != 'Bool':
+      self.error(aux.lineno, "Argument of 'not' has type %s instead of Bool." % expr_type)
+    yield 'Bool'
+
+  def check_cond(self, aux):
+    predicate = yield aux.expr1
+    if predicate != 'Bool':
+      self.error(aux.lineno, "Predicate of 'if' does not have type Bool.")
+    then_type = yield aux.expr2
+    else_type = yield aux.expr3
+    yield self.lub(then_type, else_type)
+
+  def check_loop(self, aux):
+    predicate = yield aux.expr1
+    if predicate != 'Bool':
+      self.error(aux.lineno, 'Loop condition does not have type Bool.')
+    yield aux.expr2
+    yield 'Object'
+
+  def check_block(self, aux):
+    block_type = NO_TYPE
+    for expr in aux.expr_list:
+      block_type = yield expr
+    yield block_type
+
+  def check_let(self, aux):
+    name = aux.id1
+    declared = aux.id2
+    if not self.known(declared):
+      self.error(aux.lineno, 'Class %s of let-bound identifier %s is undefined.' %
+                 (declared, name))
+      declared = 'Object'
+
+    init_type = yield aux.expr1
+    if init_type != NO_TYPE and not self.conforms(init_type, declared):
+      self.error(aux.lineno, 'Inferred type %s of initialization of %s does not '
+                 "conform to identifier's declared type %s." %
+                 (init_type, name, declared))
+
+    self.env.enter_scope()
+    if name == 'self':
+      self.error(aux.lineno, "'self' cannot be bound in a 'let' expression.")
+    else:
+      self.env.add(name, declared)
+    body_type = yield aux.expr2
+    self.env.leave_scope()
+    yield body_type
+
+  def check_typcase(self, aux):
+    yield aux.expr
+    case_type = None
+    seen = set()
+    for branch in aux.case_list:
+      declared = type_field(branch)
+      if declared == SELF_TYPE:
+        self.error(branch.lineno, 'Identifier %s declared with type SELF_TYPE in '
+                   'case branch.' % branch.name)
+        declared = 'Object'
+      elif declared not in self.graph:
+        self.error(branch.lineno, 'Class %s of case branch is undefined.' % declared)
+        declared = 'Object'
+      elif declared in seen:
+        self.error(branch.lineno, 'Duplicate branch %s in case statement.' % declared)
+      seen.add(declared)
+
+      self.env.enter_scope()
+      if branch.name == 'self':
+        self.error(branch.lineno, "'self' bound in 'case'.")
+      else:
+        self.env.add(branch.name, declared)
+      branch_type = yield branch.expr
+      self.env.leave_scope()
+
+      case_type = case_type is None and branch_type or self.lub(case_type, branch_type)
+    yield case_type
+
+  def check_dispatch(self, aux):
+    expr_type = yield aux.expr
+    actual_types = []
+    for actual in aux.actuals:
+      actual_types.append((yield actual))
+
+    class_name = expr_type == SELF_TYPE and self.current or expr_type
+    yield self.check_call(aux, expr_type, class_name, aux.func_name, actual_types)
+
+  def check_static_dispatch(self, aux):
+    expr_type = yield aux.expr
+    actual_types = []
+    for actual in aux.actuals:
+      actual_types.append((yield actual))
+
+    class_name = aux.id1
+    if class_name == SELF_TYPE:
+      self.error(aux.lineno, 'Static dispatch to SELF_TYPE.')
+      yield 'Object'
+    elif class_name not in self.graph:
+      self.error(aux.lineno, 'Static dispatch to undefined class %s.' % class_name)
+      yield 'Object'
+    else:
+      if not self.conforms(expr_type, class_name):
+        self.error(aux.lineno, 'Expression type %s does not conform to declared '
+                   'static dispatch type %s.' % (expr_type, class_name))
+      yield self.check_call(aux, expr_type, class_name, aux.id2, actual_types)
+
+  def check_call(self, aux, expr_type, class_name, method, actual_types):
+    """Check a call of method on class_name, and return its type."""
+    signature = self.method_signature(class_name, method)
+    if signature is None:
+      self.error(aux.lineno, 'Dispatch to undefined method %s.' % method)
+      return 'Object'
+
+    if len(actual_types) != len(signature.formal_types):
+      self.error(aux.lineno, 'Method %s called with wrong number of arguments.' % method)
+    else:
+      for i, (actual_type, formal_type) in enumerate(zip(actual_types,
+                                                         signature.formal_types)):
+        if not self.conforms(actual_type, formal_type):
+          formal = signature.formals and signature.formals[i] or 'arg%d' % (i + 1)
+          self.error(aux.lineno, 'In call of method %s, type %s of parameter %s does '
+                     'not conform to declared type %s.' %
+                     (method, actual_type, formal, formal_type))
+
+    if signature.return_type == SELF_TYPE:
+      return expr_type
+    return signature.return_type
+
+
+def check_program(program):
+  """Type check program, a tree built with ast.tuple_action_dict or the
+  like, and return the `class`:TypeChecker with its errors and timings.
+
+  The static type of every expr node is stored in its type field, even
+  if there are errors, unless the class hierarchy itself is broken.
+
+  """
+  checker = TypeChecker(program)
+  checker.check()
+  return checker
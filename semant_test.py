@@ -0,0 +1,102 @@
+from nose.tools import eq_
+
+import ast
+import astparse
+import semant
+from fixtures import sample_text
+
+
+# The sample's call of out_int, and the same call without its argument.
+OUT_INT_CALL = '''              out_int
+              (
+              #7
+              _int
+                1
+              : Int
+              )'''
+NO_ARGUMENT_CALL = '''              out_int
+              (
+              )'''
+
+
+def errors_of(text, action_dict=ast.tuple_action_dict):
+  program = astparse.parse_cool_ast(text, action_dict, 'll')
+  return semant.check_program(program).errors
+
+
+def untyped(text):
+  lines = [line.startswith(':', len(line) - len(line.lstrip())) and
+           line[:len(line) - len(line.lstrip())] + ': _no_type\n' or line
+           for line in text.splitlines(True)]
+  return ''.join(lines)
+
+
+def test_annotates_types():
+  text = sample_text('program.ast')
+  for action_dict in (ast.tuple_action_dict, ast.slots_action_dict):
+    program = astparse.parse_cool_ast(untyped(text), action_dict, 'll')
+    checker = semant.check_program(program)
+    eq_(checker.errors, [])
+    eq_(checker.timings.keys(), ['class table', 'features', 'expressions'])
+    # The sample's static dispatch should have the type of new Main.
+    eq_(ast.ast_to_str(program),
+        text.replace(': SELF_TYPE\n          : Object', ': Main\n          : Object'))
+
+
+def test_errors():
+  text = sample_text('program.ast')
+  eq_(errors_of(text.replace('_int\n              1\n', '_bool\n              1\n')),
+      ['test.cl:6: non-Int arguments: Int + Bool'])
+  eq_(errors_of(text.replace('_object\n                    y', '_object\n                    z')),
+      ['test.cl:7: Undeclared identifier z.',
+       'test.cl:7: non-Int arguments: Object - Int'])
+  eq_(errors_of(text.replace(OUT_INT_CALL, NO_ARGUMENT_CALL)),
+      ['test.cl:7: Method out_int called with wrong number of arguments.'])
+  eq_(errors_of(text.replace('out_string', 'out_strin')),
+      ['test.cl:5: Dispatch to undefined method out_strin.'])
+  eq_(errors_of(text.replace('_int\n        5\n', '_string\n        "5"\n')),
+      ['test.cl:2: Inferred type String of initialization of attribute x does '
+       'not conform to declared type Int.'])
+  eq_(errors_of(text.replace('    A\n    Object\n', '    A\n    Main\n'
+                             ).replace('    Main\n    IO\n', '    Main\n    A\n')),
+      ['test.cl:20: Inheritance cycle among A, Main.'])
+  eq_(errors_of(text.replace('    A\n    Object\n', '    A\n    Int\n')),
+      ['test.cl:20: Class A cannot inherit class Int.'])
+  eq_(errors_of(text.replace('_method\n      main', '_method\n      mane')),
+      ["test.cl:1: No 'main' method in class Main."])
+
+
+def test_overrides():
+  text = sample_text('program.ast').replace('    A\n    Object\n', '    A\n    Main\n')
+  override = '''    #21
+    _method
+      main
+      #21
+      _formal
+        a
+        Int
+      Object
+      #21
+      _object
+        self
+      : _no_type
+'''
+  eq_(errors_of(text.replace('"test.cl"\n    (\n    )', '"test.cl"\n    (\n' + override + '    )')),
+      ['test.cl:21: Incompatible number of formal parameters in redefined method main.'])
+
+  # Dispatching through A finds Main's method.
+  program = astparse.parse_cool_ast(text, ast.tuple_action_dict, 'll')
+  checker = semant.check_program(program)
+  eq_(checker.method_signature('A', 'main').owner, 'Main')
+  eq_(checker.method_signature('A', 'copy').owner, 'Object')
+  eq_(checker.method_signature('A', 'missing'), None)
+
+
+def nested_negations(depth):
+  return ('#1\n_program\n#1\n_class\nMain\nObject\n"a.cl"\n(\n'
+          '#1\n_method\nmain\nInt\n' + '#1\n_neg\n' * depth +
+          '#1\n_int\n0\n: _no_type\n' + ': _no_type\n' * depth + ')\n')
+
+
+def test_deep_nesting():
+  eq_(errors_of(nested_negations(5000)), [])
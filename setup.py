@@ -10,7 +10,10 @@ setuptools.setup(
   url = 'http://github.com/mschein/coolast',
   platforms = 'any',
   install_requires = ['brownie', 'ply'],
-  py_modules = ['symboltable', 'astparse', 'ast'],
+  py_modules = ['symboltable', 'astparse', 'ast', 'astcolumns', 'astbinary',
+                'inheritance', 'layout', 'semant', 'traverse',
+                'astgen', 'astcache', 'stringtab',
+                'hashcons', 'astindex', 'resolve'],
   zip_safe = True,
   verbose = False,
 )
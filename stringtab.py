@@ -0,0 +1,88 @@
+"""
+Tables of the identifiers and constants of a Cool program.
+
+Like the idtable, stringtable and inttable of the reference compiler,
+they are filled in as the dump is read, if a `class`:Tables is passed
+to astparse.parse_cool_ast.  Each distinct value is then one object,
+shared by every node that has it, so symbols compare by identity, and
+each has a stable index: its place in the order values were first seen.
+
+Code generators can emit the string and integer constant pools
+straight from `func`:StringTable.constants, using `func`:label to
+refer to them.
+
+"""
+
+
+class StringTable(object):
+  """The distinct values added to it, each with an index.
+
+  `func`:add returns the table's own copy of a value, so values the
+  table returns compare equal only if they are the same object.
+
+  """
+
+  # The prefix of the labels of the constants, if the table has any.
+  prefix = None
+
+  def __init__(self):
+    self.values = []
+    self.indexes = {}
+
+  def add(self, value):
+    """Return the table's copy of value, adding it if it's new."""
+    index = self.indexes.get(value)
+    if index is None:
+      index = self.indexes[value] = len(self.values)
+      self.values.append(value)
+    return self.values[index]
+
+  def index(self, value):
+    """Return the index of value; raises KeyError if it isn't in the table."""
+    return self.indexes[value]
+
+  def lookup(self, index):
+    """Return the value with index."""
+    return self.values[index]
+
+  def label(self, value):
+    """Return the assembly label of the constant value."""
+    return '%s%d' % (self.prefix, self.indexes[value])
+
+  def constants(self):
+    """Return the (label, value) pair of every value, in index order."""
+    return [('%s%d' % (self.prefix, index), value)
+            for index, value in enumerate(self.values)]
+
+  def __contains__(self, value):
+    return value in self.indexes
+
+  def __iter__(self):
+    return iter(self.values)
+
+  def __len__(self):
+    return len(self.values)
+
+
+class IdTable(StringTable):
+  """Identifiers and type names."""
+
+
+class StrTable(StringTable):
+  """String constants, including the file names of classes."""
+  prefix = 'str_const'
+
+
+class IntTable(StringTable):
+  """Integer constants, and the boolean constants, which the dump writes
+  as 0 and 1."""
+  prefix = 'int_const'
+
+
+class Tables(object):
+  """The three tables a parse fills in."""
+
+  def __init__(self):
+    self.idtable = IdTable()
+    self.stringtable = StrTable()
+    self.inttable = IntTable()
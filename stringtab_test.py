@@ -0,0 +1,51 @@
+from nose.tools import eq_, raises
+
+import ast
+import astparse
+import stringtab
+import traverse
+from fixtures import sample_text
+
+
+def test_string_table():
+  table = stringtab.StrTable()
+  first = ''.join(['he', 'llo'])
+  eq_(table.add(first) is first, True)
+  eq_(table.add('hello') is first, True)
+  eq_(table.add('world'), 'world')
+  eq_(len(table), 2)
+  eq_(table.index('world'), 1)
+  eq_(table.lookup(0), 'hello')
+  eq_(table.label('world'), 'str_const1')
+  eq_(table.constants(), [('str_const0', 'hello'), ('str_const1', 'world')])
+  assert 'hello' in table and 'other' not in table
+
+
+@raises(KeyError)
+def test_missing_index():
+  stringtab.IdTable().index('Main')
+
+
+def test_parse_fills_tables():
+  text = sample_text('program.ast')
+  for engine in ('lalr', 'll'):
+    tables = stringtab.Tables()
+    program = astparse.parse_cool_ast(text, ast.tuple_action_dict, engine,
+                                      tables=tables)
+    eq_(ast.ast_to_str(program),
+        ast.ast_to_str(astparse.parse_cool_ast(text, ast.tuple_action_dict, engine)))
+
+    eq_(list(tables.stringtable), ['test.cl', 'hello\n\tw\borld\f'])
+    eq_(sorted(tables.inttable), [0, 1, 2, 3, 4, 5])
+    assert 'SELF_TYPE' in tables.idtable
+
+    # Every type in the tree is the table's copy.
+    types = [node.rule_vals['type'] for node in traverse.preorder(program)
+             if node.rule == 'expr']
+    for static_type in types:
+      assert static_type is tables.idtable.lookup(tables.idtable.index(static_type))
+
+    # Later parses add to the same tables.
+    count = len(tables.idtable)
+    astparse.parse_cool_ast(text, ast.tuple_action_dict, engine, tables=tables)
+    eq_(len(tables.idtable), count)
@@ -88,3 +88,228 @@ class SymbolTable(object):
       yield self
     finally:
       self.leave_scope()
+
+
+class ShadowSymbolTable(object):
+  """A `class`:SymbolTable whose lookups don't depend on scope depth.
+
+  Each symbol has a stack of its bindings, innermost last, so find only
+  looks at the top of one stack.  Each scope remembers the symbols it
+  defined, so leaving it only pops those.  It behaves exactly like
+  `class`:SymbolTable otherwise.
+
+  """
+
+  def __init__(self):
+    self.scopes = []
+    self.bindings = {}
+    self.enter_scope()
+
+  def current_scope(self):
+    """Return the dictionary representing the current scope.
+
+    It must not be changed, since the binding stacks wouldn't follow.
+
+    """
+    return self.scopes[-1]
+
+  def add(self, symbol_name, data):
+    """Add a symbol to the current scope.
+
+    Note that this will fail if the symbol is already defined
+    in the current scope.
+
+    """
+    scope = self.scopes[-1]
+    if symbol_name in scope:
+      raise ValueError('Symbol %s already defined' % symbol_name)
+
+    scope[symbol_name] = data
+    stack = self.bindings.get(symbol_name)
+    if stack is None:
+      self.bindings[symbol_name] = [data]
+    else:
+      stack.append(data)
+
+  def remove(self, symbol_name):
+    """Delete a symbol from the current scope.
+
+    It will throw an exception if the symbol doesn't exist.
+
+    """
+    del self.scopes[-1][symbol_name]
+    self._pop(symbol_name)
+
+  def _pop(self, symbol_name):
+    stack = self.bindings[symbol_name]
+    stack.pop()
+    if not stack:
+      del self.bindings[symbol_name]
+
+  def find(self, symbol_name):
+    """Search the current scope and all enclosing scopes for symbol_name.
+
+    Returns None if the symbol_name doesn't exist anywhere.
+
+    """
+    stack = self.bindings.get(symbol_name)
+    if stack is None:
+      return None
+
+    return stack[-1]
+
+  def enter_scope(self):
+    """Go into a new scope."""
+    self.scopes.append({})
+
+  def leave_scope(self):
+    """Pop out of the current scope.
+
+    Note that the current scope will be destroyed.
+
+    """
+    for symbol_name in self.scopes.pop():
+      self._pop(symbol_name)
+
+  def check_scope(self, symbol_name):
+    """Does the symbol exist in the current scope only?
+
+    Unlike find, this does not search through the enclosing scopes.
+
+    """
+    return self.scopes[-1].get(symbol_name, None)
+
+  @contextmanager
+  def in_scope(self):
+    try:
+      self.enter_scope()
+      yield self
+    finally:
+      self.leave_scope()
+
+
+class _Scope(object):
+  """One scope of a `class`:PersistentSymbolTable.
+
+  Only the table whose token is owner may change it.
+
+  """
+  __slots__ = ('symbols', 'parent', 'owner')
+
+  def __init__(self, symbols, parent, owner):
+    self.symbols = symbols
+    self.parent = parent
+    self.owner = owner
+
+
+class PersistentSymbolTable(object):
+  """A `class`:SymbolTable that can be snapshotted and forked cheaply.
+
+  The scopes form a chain that tables share.  snapshot takes O(1) time:
+  it just gives up ownership of the chain, so whichever scope is changed
+  next is copied first.  A table started from a snapshot, or made by
+  fork, shares every scope with it until it changes one.  Snapshots
+  never change, so forks of one can be used from different threads,
+  though each table should only be used by one thread at a time.
+
+  """
+
+  def __init__(self, snapshot=None):
+    self.token = object()
+    self.scope = snapshot
+    if snapshot is None:
+      self.enter_scope()
+
+  def snapshot(self):
+    """Return the current state of the table.
+
+    Later changes to the table won't affect it; pass it to
+    `class`:PersistentSymbolTable to start a new table from it.
+
+    """
+    self.token = object()
+    return self.scope
+
+  def fork(self):
+    """Return a new table that starts from the current state of this one."""
+    return PersistentSymbolTable(self.snapshot())
+
+  def _own(self):
+    """Return the symbols of the current scope, copying them if shared."""
+    scope = self.scope
+    if scope.owner is not self.token:
+      scope = self.scope = _Scope(dict(scope.symbols), scope.parent, self.token)
+    return scope.symbols
+
+  def current_scope(self):
+    """Return the dictionary representing the current scope.
+
+    It may be shared with snapshots, so it must not be changed.
+
+    """
+    return self.scope.symbols
+
+  def add(self, symbol_name, data):
+    """Add a symbol to the current scope.
+
+    Note that this will fail if the symbol is already defined
+    in the current scope.
+
+    """
+    if symbol_name in self.scope.symbols:
+      raise ValueError('Symbol %s already defined' % symbol_name)
+
+    self._own()[symbol_name] = data
+
+  def remove(self, symbol_name):
+    """Delete a symbol from the current scope.
+
+    It will throw an exception if the symbol doesn't exist.
+
+    """
+    if symbol_name not in self.scope.symbols:
+      raise KeyError(symbol_name)
+
+    del self._own()[symbol_name]
+
+  def find(self, symbol_name):
+    """Search the current scope and all enclosing scopes for symbol_name.
+
+    Returns None if the symbol_name doesn't exist anywhere.
+
+    """
+    scope = self.scope
+    while scope is not None:
+      if symbol_name in scope.symbols:
+        return scope.symbols[symbol_name]
+      scope = scope.parent
+
+    return None
+
+  def enter_scope(self):
+    """Go into a new scope."""
+    self.scope = _Scope({}, self.scope, self.token)
+
+  def leave_scope(self):
+    """Pop out of the current scope.
+
+    Snapshots that include it keep it.
+
+    """
+    self.scope = self.scope.parent
+
+  def check_scope(self, symbol_name):
+    """Does the symbol exist in the current scope only?
+
+    Unlike find, this does not search through the enclosing scopes.
+
+    """
+    return self.scope.symbols.get(symbol_name, None)
+
+  @contextmanager
+  def in_scope(self):
+    try:
+      self.enter_scope()
+      yield self
+    finally:
+      self.leave_scope()
@@ -0,0 +1,117 @@
+import random
+import threading
+
+from nose.tools import eq_, raises
+
+from symboltable import PersistentSymbolTable, SymbolTable
+
+
+def test_snapshot_is_unchanged():
+  st = PersistentSymbolTable()
+  st.add('a', 1)
+  st.enter_scope()
+  st.add('b', 2)
+  snapshot = st.snapshot()
+
+  st.add('c', 3)
+  st.remove('b')
+  st.leave_scope()
+  st.remove('a')
+  st.add('a', 4)
+
+  other = PersistentSymbolTable(snapshot)
+  eq_(other.find('a'), 1)
+  eq_(other.find('b'), 2)
+  eq_(other.find('c'), None)
+  other.leave_scope()
+  eq_(other.find('a'), 1)
+  eq_(other.find('b'), None)
+  eq_(st.find('a'), 4)
+
+
+def test_forks_are_independent():
+  st = PersistentSymbolTable()
+  st.add('x', 'class')
+  forks = [st.fork() for _ in xrange(3)]
+  for i, fork in enumerate(forks):
+    fork.add('y', i)
+    with fork.in_scope():
+      fork.add('x', i)
+      eq_(fork.find('x'), i)
+
+  st.add('y', 'class')
+  eq_([fork.find('y') for fork in forks], [0, 1, 2])
+  eq_([fork.find('x') for fork in forks], ['class'] * 3)
+  eq_(st.find('y'), 'class')
+
+
+@raises(KeyError)
+def test_remove_missing():
+  st = PersistentSymbolTable()
+  st.add('a', 1)
+  with st.in_scope():
+    st.remove('a')
+
+
+def test_matches_symbol_table():
+  rand = random.Random(11)
+  tables = SymbolTable(), PersistentSymbolTable()
+  snapshots = []
+  names = 'abcde'
+  for _ in xrange(2000):
+    op = rand.randrange(5)
+    name = rand.choice(names)
+    if op == 0:
+      for st in tables:
+        st.enter_scope()
+    elif op == 1 and len(tables[0].scopes) > 1:
+      for st in tables:
+        st.leave_scope()
+    elif op == 2 and name not in tables[0].current_scope():
+      value = rand.random()
+      for st in tables:
+        st.add(name, value)
+    elif op == 3 and name in tables[0].current_scope():
+      for st in tables:
+        st.remove(name)
+    elif op == 4:
+      expected = dict((name, tables[0].find(name)) for name in names)
+      snapshots.append((tables[1].snapshot(), expected))
+
+    for name in names:
+      eq_(tables[0].find(name), tables[1].find(name))
+      eq_(tables[0].check_scope(name), tables[1].check_scope(name))
+
+  for snapshot, expected in snapshots:
+    st = PersistentSymbolTable(snapshot)
+    eq_(dict((name, st.find(name)) for name in names), expected)
+
+
+def test_threads():
+  st = PersistentSymbolTable()
+  for i in xrange(100):
+    st.add('attr%d' % i, i)
+  snapshot = st.snapshot()
+  errors = []
+
+  def check_methods(offset):
+    try:
+      for method in xrange(200):
+        env = PersistentSymbolTable(snapshot)
+        env.enter_scope()
+        env.add('attr0', offset)
+        env.add('local', method)
+        assert env.find('attr0') == offset
+        assert env.find('attr99') == 99
+        assert env.find('local') == method
+    except AssertionError, e:
+      errors.append(e)
+
+  threads = [threading.Thread(target=check_methods, args=(i,)) for i in xrange(4)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  eq_(errors, [])
+  eq_(PersistentSymbolTable(snapshot).find('local'), None)
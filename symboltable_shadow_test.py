@@ -0,0 +1,66 @@
+import random
+
+from nose.tools import eq_, raises
+
+from symboltable import ShadowSymbolTable, SymbolTable
+
+
+def test_shadowing():
+  st = ShadowSymbolTable()
+  st.add('a', 1)
+
+  with st.in_scope():
+    eq_(st.find('a'), 1)
+    assert not st.check_scope('a')
+    st.add('a', 2)
+    eq_(st.find('a'), 2)
+    eq_(st.check_scope('a'), 2)
+    st.remove('a')
+    eq_(st.find('a'), 1)
+    st.add('a', 3)
+
+  eq_(st.find('a'), 1)
+  st.remove('a')
+  eq_(st.find('a'), None)
+  eq_(st.bindings, {})
+
+
+@raises(ValueError)
+def test_duplicate():
+  st = ShadowSymbolTable()
+  st.add('a', 1)
+  st.add('a', 2)
+
+
+@raises(KeyError)
+def test_remove_missing():
+  st = ShadowSymbolTable()
+  st.add('a', 1)
+  with st.in_scope():
+    st.remove('a')
+
+
+def test_matches_symbol_table():
+  rand = random.Random(7)
+  tables = SymbolTable(), ShadowSymbolTable()
+  names = 'abcde'
+  for _ in xrange(2000):
+    op = rand.randrange(4)
+    name = rand.choice(names)
+    if op == 0:
+      for st in tables:
+        st.enter_scope()
+    elif op == 1 and len(tables[0].scopes) > 1:
+      for st in tables:
+        st.leave_scope()
+    elif op == 2 and name not in tables[0].current_scope():
+      value = rand.random()
+      for st in tables:
+        st.add(name, value)
+    elif op == 3 and name in tables[0].current_scope():
+      for st in tables:
+        st.remove(name)
+
+    for name in names:
+      eq_(tables[0].find(name), tables[1].find(name))
+      eq_(tables[0].check_scope(name), tables[1].check_scope(name))
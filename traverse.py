@@ -0,0 +1,200 @@
+"""
+Walking Cool AST trees without recursion.
+
+`func`:preorder, `func`:postorder and `func`:bfs yield the nodes of a
+tree, and `class`:Visitor calls a method for each kind of node, looked
+up in a table built when the visitor class is defined.
+`class`:ScopedVisitor also keeps a symbol table in step with the
+scopes of the program as it walks.
+
+They work on trees of ASTNode, SlotsNode or astcolumns.NodeView nodes.
+
+"""
+
+from symboltable import SymbolTable
+
+
+def children(node):
+  """Return the child nodes of node, with list fields flattened."""
+  result = []
+  for value in node.values:
+    if isinstance(value, list):
+      result.extend(value)
+    elif hasattr(value, 'values'):
+      result.append(value)
+  return result
+
+
+def preorder(root):
+  """Yield the nodes of the tree under root, parents before children."""
+  stack = [root]
+  while stack:
+    node = stack.pop()
+    yield node
+    stack.extend(reversed(children(node)))
+
+
+def postorder(root):
+  """Yield the nodes of the tree under root, children before parents."""
+  # Items are (node, whether its children have been pushed).
+  stack = [(root, False)]
+  while stack:
+    node, expanded = stack.pop()
+    if expanded:
+      yield node
+    else:
+      stack.append((node, True))
+      stack.extend((child, False) for child in reversed(children(node)))
+
+
+def bfs(root):
+  """Yield the nodes of the tree under root, a level at a time."""
+  level = [root]
+  while level:
+    next_level = []
+    for node in level:
+      yield node
+      next_level.extend(children(node))
+    level = next_level
+
+
+# Events on the stack of Visitor.visit.
+ENTER, LEAVE, BIND, EXIT = range(4)
+
+
+class VisitorType(type):
+  """Builds the dispatch tables of a `class`:Visitor class.
+
+  A method visit_plus, or visit__plus, handles _plus nodes on the way
+  down, and leave_plus on the way back up.  Methods named after a rule,
+  like visit_expr, handle the nodes of that rule.
+
+  """
+
+  def __init__(cls, name, bases, namespace):
+    type.__init__(cls, name, bases, namespace)
+    cls._visit_table = cls._dispatch_table('visit_')
+    cls._leave_table = cls._dispatch_table('leave_')
+
+  def _dispatch_table(cls, prefix):
+    table = {}
+    for name in dir(cls):
+      if not name.startswith(prefix):
+        continue
+      fn = getattr(cls, name).__func__
+      kind = name[len(prefix):]
+      table[kind] = fn
+      if not kind.startswith('_'):
+        table.setdefault('_' + kind, fn)
+    return table
+
+
+class Visitor(object):
+  """Calls the visit_ and leave_ methods for each node of a tree.
+
+  A visit method that returns False skips the node's children, and its
+  leave method.  Nodes without a method go to generic_visit and
+  generic_leave, which do nothing.
+
+  """
+  __metaclass__ = VisitorType
+
+  def visit(self, root):
+    """Walk the tree under root, depth first."""
+    visit_table = self._visit_table
+    leave_table = self._leave_table
+    generic_visit = self.generic_visit.__func__
+    generic_leave = self.generic_leave.__func__
+
+    stack = [(ENTER, root)]
+    while stack:
+      event, node = stack.pop()
+      if event is ENTER:
+        if visit_table.get(node.type, generic_visit)(self, node) is not False:
+          self.push_node(node, stack)
+      elif event is LEAVE:
+        leave_table.get(node.type, generic_leave)(self, node)
+      elif event is BIND:
+        self.bind(node)
+      else:
+        self.exit(node)
+
+  def push_node(self, node, stack):
+    """Push the events for a visited node: its LEAVE, then the ENTER
+    events of its children, last first."""
+    stack.append((LEAVE, node))
+    stack.extend((ENTER, child) for child in reversed(children(node)))
+
+  def bind(self, node):
+    """Handle a BIND event pushed by push_node."""
+
+  def exit(self, node):
+    """Handle an EXIT event pushed by push_node."""
+
+  def generic_visit(self, node):
+    pass
+
+  def generic_leave(self, node):
+    pass
+
+
+# The nodes that open a scope.
+scope_kinds = frozenset(['_class', '_method', '_let', '_branch'])
+
+
+class ScopedVisitor(Visitor):
+  """A `class`:Visitor that keeps symbols in step with the program.
+
+  symbols is a `class`:symboltable.SymbolTable, or a table with the
+  same interface, made if not given.  A scope is entered after visiting
+  each _class, _method, _let and _branch node, and left after leaving it,
+  so only their visit methods see the enclosing scope.
+
+  The names they define are bound to their declared types by
+  `func`:bind: attributes throughout their class, formals in their
+  method, a let variable in the let's body but not its initializer, and
+  a case branch's variable in the branch.
+
+  """
+
+  def __init__(self, symbols=None):
+    if symbols is None:
+      symbols = SymbolTable()
+    self.symbols = symbols
+
+  def push_node(self, node, stack):
+    if node.type not in scope_kinds:
+      Visitor.push_node(self, node, stack)
+      return
+
+    self.symbols.enter_scope()
+    stack.append((EXIT, node))
+    if node.type == '_let':
+      # The variable is bound between the initializer and the body.
+      stack.extend(((LEAVE, node), (ENTER, node.expr2), (BIND, node),
+                    (ENTER, node.expr1)))
+    else:
+      self.bind(node)
+      Visitor.push_node(self, node, stack)
+
+  def bind(self, node):
+    """Add the names node defines to the current scope."""
+    symbols = self.symbols
+    kind = node.type
+    if kind == '_class':
+      names = [(feature.name, feature.rule_vals['type'])
+               for feature in node.features if feature.type == '_attr']
+    elif kind == '_method':
+      names = [(formal.name, formal.rule_vals['type']) for formal in node.formals]
+    elif kind == '_let':
+      names = [(node.id1, node.id2)]
+    else:
+      names = [(node.name, node.rule_vals['type'])]
+
+    for name, declared in names:
+      # Duplicates are semantic errors; the first one wins here.
+      if symbols.check_scope(name) is None:
+        symbols.add(name, declared)
+
+  def exit(self, node):
+    self.symbols.leave_scope()
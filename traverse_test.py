@@ -0,0 +1,97 @@
+from nose.tools import eq_
+
+import ast
+import astparse
+import traverse
+from fixtures import sample_text
+
+
+def sample_program(action_dict=ast.tuple_action_dict):
+  text = sample_text('program.ast')
+  return astparse.parse_cool_ast(text, action_dict, 'll')
+
+
+def test_orders():
+  program = sample_program()
+  pre = [node.type for node in traverse.preorder(program)]
+  eq_(pre[:5], ['_program', '_class', '_attr', 'expr', '_int'])
+  eq_(pre.count('_int'), 10)
+
+  post = [node.type for node in traverse.postorder(program)]
+  eq_(sorted(post), sorted(pre))
+  eq_(post[:3], ['_int', 'expr', '_attr'])
+  eq_(post[-1], '_program')
+
+  levels = [node.type for node in traverse.bfs(program)]
+  eq_(sorted(levels), sorted(pre))
+  eq_(levels[:3], ['_program', '_class', '_class'])
+
+
+class KindCounter(traverse.Visitor):
+
+  def __init__(self):
+    self.counts = {}
+    self.left = []
+
+  def generic_visit(self, node):
+    self.counts[node.type] = self.counts.get(node.type, 0) + 1
+
+  def visit_int(self, node):
+    self.counts['int'] = self.counts.get('int', 0) + 1
+
+  def visit_method(self, node):
+    # Skip method bodies.
+    return False
+
+  def leave_class(self, node):
+    self.left.append(node.name)
+
+
+def test_visitor():
+  counter = KindCounter()
+  counter.visit(sample_program())
+  eq_(counter.counts, {'_program': 1, '_class': 2, '_attr': 2, 'expr': 2,
+                       'int': 1, '_no_expr': 1})
+  eq_(counter.left, ['Main', 'A'])
+  eq_(KindCounter._visit_table['_int'], KindCounter.__dict__['visit_int'])
+
+
+class ObjectTypes(traverse.ScopedVisitor):
+
+  def __init__(self):
+    traverse.ScopedVisitor.__init__(self)
+    self.found = []
+
+  def visit_object(self, node):
+    self.found.append((node.name, self.symbols.find(node.name)))
+
+
+def test_scoped_visitor():
+  for action_dict in (ast.tuple_action_dict, ast.slots_action_dict):
+    visitor = ObjectTypes()
+    visitor.visit(sample_program(action_dict))
+    eq_(visitor.found, [('self', None), ('x', 'Int'), ('y', 'Int'), ('y', 'Int'),
+                        ('self', None), ('self', None), ('i', 'Int')])
+    eq_(len(visitor.symbols.scopes), 1)
+
+
+def test_let_initializer_scope():
+  text = sample_text('program.ast')
+  # let y : Int <- y + 1 refers to the attribute y in its initializer.
+  text = text.replace('_object\n              x', '_object\n              y')
+  text = text.replace('    s\n      String', '    y\n      Bool')
+  visitor = ObjectTypes()
+  visitor.visit(astparse.parse_cool_ast(text, ast.tuple_action_dict, 'll'))
+  eq_(visitor.found[1:3], [('y', 'Bool'), ('y', 'Int')])
+
+
+def test_deep_nesting():
+  depth = 5000
+  text = ('#1\n_program\n#1\n_class\nMain\nObject\n"a.cl"\n(\n'
+          '#1\n_attr\nx\nInt\n' + '#1\n_neg\n' * depth + '#1\n_int\n0\n: Int\n' +
+          ': Int\n' * depth + ')\n')
+  program = astparse.parse_cool_ast(text, ast.tuple_action_dict, 'll')
+  eq_(sum(1 for node in traverse.postorder(program) if node.type == '_neg'), depth)
+  counter = KindCounter()
+  counter.visit(program)
+  eq_(counter.counts['_neg'], depth)